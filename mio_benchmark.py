@@ -0,0 +1,72 @@
+from src.benchmark import Benchmark
+from src.config import Config
+from src.frame_recorder import FrameRecorder
+import getopt
+import sys
+
+
+def main(argv):
+    config = Config()
+    myo_amount = 1
+    seconds = 10
+    input_path = None
+    output_path = None
+
+    # Get options and arguments
+    try:
+        opts, args = getopt.getopt(argv, 'hn:s:i:o:', ['help', 'nmyo=', 'seconds=', 'input=', 'output='])
+    except getopt.GetoptError:
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print_usage()
+            sys.exit()
+        elif opt in ("-n", "--nmyo"):
+            myo_amount = int(arg)
+        elif opt in ("-s", "--seconds"):
+            seconds = float(arg)
+        elif opt in ("-i", "--input"):
+            input_path = arg
+        elif opt in ("-o", "--output"):
+            output_path = arg
+
+    # Input stream
+    if input_path is not None:
+        with open(input_path, 'rb') as f:
+            stream = f.read()
+        if stream.startswith(FrameRecorder.MAGIC):
+            # Frames of a recording (of its first dongle), back to back
+            stream = b''.join(frame for _, dongle, frame in FrameRecorder.read(input_path)[1] if dongle == 0)
+        print("Input: " + input_path)
+    else:
+        stream = Benchmark.synthetic_stream(myo_amount, seconds)
+        print("Input: synthetic, " + str(myo_amount) + " myo(s) for " + str(seconds) + " s")
+    print()
+
+    # Run
+    benchmark = Benchmark(config, stream)
+    report = benchmark.run()
+    print()
+    myos_per_core = report['myos_per_core']
+    print("Myos per core: " + ("%.1f" % myos_per_core if myos_per_core is not None else "n/a"))
+    if output_path is not None:
+        benchmark.save(output_path)
+        print("Results saved to " + output_path)
+
+
+def print_usage():
+    message = """usage: python mio_benchmark.py [-h | --help] [-n | --nmyo <amount>] [-s | --seconds <seconds>] [-i | \
+--input <file>] [-o | --output <file>]
+
+Options and arguments:
+    -h | --help: display this message
+    -n | --nmyo <amount>: set the amount of devices in the synthetic stream
+    -s | --seconds <seconds>: set the duration of the synthetic stream
+    -i | --input <file>: use a recording (see mio_connect.py -r) or raw BGAPI bytes instead of a synthetic stream
+    -o | --output <file>: save the results as JSON to given file
+"""
+    print(message)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
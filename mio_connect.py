@@ -10,7 +10,9 @@ def main(argv):
 
     # Get options and arguments
     try:
-        opts, args = getopt.getopt(argv, 'hsn:a:p:v', ['help', 'shutdown', 'nmyo', 'address', 'port', 'verbose'])
+        opts, args = getopt.getopt(argv, 'hsn:a:p:t:d:lm:r:o:S:b:v',
+                                   ['help', 'shutdown', 'nmyo', 'address', 'port', 'to=', 'dongle=', 'latency',
+                                    'metrics=', 'record=', 'samples=', 'shared=', 'bundle=', 'verbose'])
     except getopt.GetoptError:
         sys.exit(2)
     turnoff = False
@@ -26,6 +28,24 @@ def main(argv):
             config.OSC_ADDRESS = arg
         elif opt in ("-p", "--port"):
             config.OSC_PORT = arg
+        elif opt in ("-t", "--to"):
+            address, port, *channels = arg.split(':')
+            destination = (address, int(port), set(channels[0].split(','))) if channels else (address, int(port))
+            config.OSC_DESTINATIONS = (config.OSC_DESTINATIONS or []) + [destination]
+        elif opt in ("-d", "--dongle"):
+            config.SERIAL_PORTS = (config.SERIAL_PORTS or []) + [arg]
+        elif opt in ("-l", "--latency"):
+            config.LATENCY_STATS = True
+        elif opt in ("-m", "--metrics"):
+            config.METRICS_PORT = int(arg)
+        elif opt in ("-r", "--record"):
+            config.RECORD_FILE = arg
+        elif opt in ("-o", "--samples"):
+            config.SAMPLE_STORE_DIR = arg
+        elif opt in ("-S", "--shared"):
+            config.SHARED_MEMORY_NAME = arg
+        elif opt in ("-b", "--bundle"):
+            config.OSC_BUNDLE_INTERVAL = float(arg) / 1000
         elif opt in ("-v", "--verbose"):
             config.VERBOSE = True
 
@@ -50,9 +70,10 @@ def main(argv):
         print("Ready for data.")
         print()
 
-        # Receive and handle data
+        # Receive and handle data, reconnecting lost myos meanwhile
         while True:
             myo_driver.receive()
+            myo_driver.advance_connections()
 
     except KeyboardInterrupt:
         print("Interrupted.")
@@ -60,6 +81,9 @@ def main(argv):
     except serial.serialutil.SerialException:
         print("ERROR: Couldn't open port. Please close MyoConnect and any program using this serial port.")
 
+    except FileExistsError as e:
+        print("ERROR: " + str(e))
+
     finally:
         print("Disconnecting...")
         if myo_driver is not None:
@@ -67,12 +91,17 @@ def main(argv):
                 myo_driver.deep_sleep_all()
             else:
                 myo_driver.disconnect_all()
+            if myo_driver.latency is not None:
+                myo_driver.latency.print_report()
+            myo_driver.close()
         print("Disconnected")
 
 
 def print_usage():
     message = """usage: python mio_connect.py [-h | --help] [-s | --shutdown] [-n | --nmyo <amount>] [-a | --address \
-<address>] [-p | --port <port_number>] [-v | --verbose]
+<address>] [-p | --port <port_number>] [-t | --to <address>:<port>[:<channel>,...]] [-d | --dongle \
+<serial_port>] [-l | --latency] [-m | --metrics <http_port>] [-r | --record <file>] [-o | --samples <directory>] \
+[-S | --shared <name>] [-b | --bundle <ms>] [-v | --verbose]
 
 Options and arguments:
     -h | --help: display this message
@@ -80,6 +109,15 @@ Options and arguments:
     -n | --nmyo <amount>: set the amount of devices to expect
     -a | --address <address>: set OSC address
     -p | --port <port_number>: set OSC port
+    -t | --to <address>:<port>[:<channel>,...]: send OSC to given destination, only given channels if any, repeat
+    for several (replaces -a and -p)
+    -d | --dongle <serial_port>: use the dongle on given serial port instead of detecting it, repeat for several
+    -l | --latency: keep per-stage latency histograms and print them at exit
+    -m | --metrics <http_port>: serve runtime counters as JSON on http://localhost:<http_port>/metrics
+    -r | --record <file>: record every frame received from the dongles to given file
+    -o | --samples <directory>: store every EMG/IMU sample as memory-mapped .npy files in given directory
+    -S | --shared <name>: publish the latest EMG/IMU samples to shared memory blocks named after given name
+    -b | --bundle <ms>: pack the OSC messages of every given milliseconds into a single bundle
     -v | --verbose: get verbose output
 """
     print(message)
@@ -0,0 +1,99 @@
+from src.frame_replayer import FrameReplayer
+from src.config import Config
+from src.data_handler import DataHandler
+import getopt
+import sys
+
+
+def main(argv):
+    config = Config()
+    speed = 1.0
+    dispatch_only = False
+    loop = False
+
+    # Get options and arguments
+    try:
+        opts, args = getopt.getopt(argv, 'hs:fa:p:t:dlLo:', ['help', 'speed=', 'fast', 'address=', 'port=', 'to=',
+                                                             'dispatch', 'latency', 'loop', 'samples='])
+    except getopt.GetoptError:
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print_usage()
+            sys.exit()
+        elif opt in ("-s", "--speed"):
+            speed = float(arg)
+        elif opt in ("-f", "--fast"):
+            speed = 0
+        elif opt in ("-a", "--address"):
+            config.OSC_ADDRESS = arg
+        elif opt in ("-p", "--port"):
+            config.OSC_PORT = int(arg)
+        elif opt in ("-t", "--to"):
+            address, port, *channels = arg.split(':')
+            destination = (address, int(port), set(channels[0].split(','))) if channels else (address, int(port))
+            config.OSC_DESTINATIONS = (config.OSC_DESTINATIONS or []) + [destination]
+        elif opt in ("-d", "--dispatch"):
+            dispatch_only = True
+        elif opt in ("-l", "--latency"):
+            config.LATENCY_STATS = True
+        elif opt in ("-L", "--loop"):
+            loop = True
+        elif opt in ("-o", "--samples"):
+            config.SAMPLE_STORE_DIR = arg
+    if len(args) != 1:
+        print_usage()
+        sys.exit(2)
+
+    # Run
+    try:
+        replayer = FrameReplayer(config, args[0], speed, dispatch_only)
+    except FileExistsError as e:
+        print("ERROR: " + str(e))
+        sys.exit(1)
+    destinations = [str(address) + ":" + str(port) for address, port, _ in DataHandler.osc_destinations(config)]
+    print("Replaying " + args[0] + (" at %gx" % speed if speed else " as fast as possible") + " to " +
+          ", ".join(destinations))
+    try:
+        while True:
+            seconds = replayer.run()
+            print("Replayed %d frames in %.3f s (%.0f frames/s)" % (replayer.frames, seconds,
+                                                                   replayer.frames / seconds if seconds else 0))
+            if speed:
+                print("Max lag behind the recorded pace: %.3f ms" % (replayer.late_ns / 1e6))
+            if not loop:
+                break
+            replayer.frames = 0
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    finally:
+        replayer.close()
+        if replayer.latency is not None:
+            print()
+            replayer.latency.print_report()
+
+
+def print_usage():
+    message = """usage: python mio_replay.py [-h | --help] [-s | --speed <factor>] [-f | --fast] [-a | --address \
+<address>] [-p | --port <port_number>] [-t | --to <address>:<port>[:<channel>,...]] [-d | --dispatch] \
+[-l | --latency] [-L | --loop] [-o | --samples <directory>] <file>
+
+Options and arguments:
+    -h | --help: display this message
+    -s | --speed <factor>: replay given times faster than recorded (default 1, real time)
+    -f | --fast: replay as fast as possible
+    -a | --address <address>: set OSC address
+    -p | --port <port_number>: set OSC port
+    -t | --to <address>:<port>[:<channel>,...]: send OSC to given destination, only given channels if any, repeat
+    for several (replaces -a and -p)
+    -d | --dispatch: hand whole frames to dispatch instead of going through the byte parser
+    -l | --latency: keep per-stage latency histograms and print them at exit
+    -L | --loop: replay again and again until interrupted
+    -o | --samples <directory>: store every EMG/IMU sample as .npy files in given directory
+    <file>: recording made with mio_connect.py -r
+"""
+    print(message)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,56 @@
+from src.myo_simulator import MyoSimulator
+import getopt
+import sys
+import time
+
+
+def main(argv):
+    myo_amount = 1
+    emg_rate = 200
+    imu_rate = 50
+
+    # Get options and arguments
+    try:
+        opts, args = getopt.getopt(argv, 'hn:e:i:', ['help', 'nmyo=', 'emg-rate=', 'imu-rate='])
+    except getopt.GetoptError:
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print_usage()
+            sys.exit()
+        elif opt in ("-n", "--nmyo"):
+            myo_amount = int(arg)
+        elif opt in ("-e", "--emg-rate"):
+            emg_rate = float(arg)
+        elif opt in ("-i", "--imu-rate"):
+            imu_rate = float(arg)
+
+    # Run
+    simulator = MyoSimulator(myo_amount, emg_rate, imu_rate)
+    simulator.start()
+    print("Simulating " + str(myo_amount) + " myo(s) on " + simulator.port)
+    print("Connect with: python mio_connect.py -n " + str(myo_amount) + " -d " + simulator.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    finally:
+        simulator.stop()
+
+
+def print_usage():
+    message = """usage: python mio_simulator.py [-h | --help] [-n | --nmyo <amount>] [-e | --emg-rate <hz>] [-i | \
+--imu-rate <hz>]
+
+Options and arguments:
+    -h | --help: display this message
+    -n | --nmyo <amount>: set the amount of simulated devices
+    -e | --emg-rate <hz>: set EMG samples per second of each device, 0 disables EMG
+    -i | --imu-rate <hz>: set IMU samples per second of each device, 0 disables IMU
+"""
+    print(message)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
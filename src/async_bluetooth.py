@@ -0,0 +1,141 @@
+import asyncio
+import time
+from functools import partial
+from src.bluetooth import Bluetooth
+
+
+class AsyncBluetooth(Bluetooth, asyncio.Protocol):
+    """
+    Bluetooth on an asyncio event loop. The serial port is read through a read pipe transport with this object as its
+    protocol, and commands can be awaited until their matching BGAPI response or event arrives.
+    Requires a serial port with a file descriptor (i.e. not Windows).
+    """
+    def __init__(self, config, port=None):
+        super().__init__(config, port)
+        self.transport = None
+        self.closed = None
+        # Held during a GAP procedure (scan or direct connection), only one can run at a time on a dongle
+        self.gap_lock = None
+        # Called after every chunk of data received has been parsed
+        self.data_received_handler = None
+
+    def _create_reader(self, config, reader_condition):
+        """
+        The event loop reads the port, no reader thread.
+        """
+        return None
+
+    async def open(self):
+        """
+        Start reading the serial port from the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        self.closed = loop.create_future()
+        self.gap_lock = asyncio.Lock()
+        await loop.connect_read_pipe(lambda: self, self.serial)
+
+    async def wait_closed(self):
+        """
+        Wait until the serial port is closed or lost.
+        """
+        await self.closed
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        super().close()
+
+##############################################################################
+#                                  PROTOCOL                                  #
+##############################################################################
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.lib.timestamps:
+            self.lib.rx_ns = time.monotonic_ns()
+        self._parse(data)
+        if self.data_received_handler is not None:
+            self.data_received_handler()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+    def send(self, msg, connection=None):
+        """
+        Send given message through serial right away. Flow control comes from awaiting each response instead.
+        :param msg: packed message to send
+        :param connection: unused, see Bluetooth.send
+        """
+        self.lib.send_command(self.serial, msg)
+
+    def expect(self, event, predicate=None):
+        """
+        Start listening for an event, before sending the command that triggers it.
+        :param event: BGLib event, e.g. self.lib.ble_evt_connection_status
+        :param predicate: optional filter for the event payload
+        :return: future resolved with the first matching payload
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        def handler(_, payload):
+            if not future.done() and (predicate is None or predicate(payload)):
+                future.set_result(payload)
+
+        event.add(handler)
+        future.add_done_callback(lambda _: event.remove(handler))
+        return future
+
+    async def request(self, command, event, predicate=None, timeout=None):
+        """
+        Send a command and await its matching response or event.
+        :param command: callable sending the command, e.g. partial(self.disable_sleep, connection)
+        :param event: BGLib event answering the command
+        :param predicate: optional filter for the event payload
+        :param timeout: max seconds to wait, None waits forever
+        :return: payload of the matching event
+        """
+        future = self.expect(event, predicate)
+        command()
+        return await asyncio.wait_for(future, timeout)
+
+    async def request_answer(self, command, event, predicate=None):
+        """
+        Send a command and await its matching response or event for up to the response timeout. If it doesn't come,
+        warn and go on, as Bluetooth.send does.
+        :return: payload of the matching event, None if it timed out
+        """
+        try:
+            return await self.request(command, event, predicate, self.response_timeout)
+        except asyncio.TimeoutError:
+            print("WARNING: Dongle response timed out, sending next command anyway.")
+            return None
+
+    async def request_write(self, command, connection):
+        """
+        Send a command doing a single attribute write and await its completion.
+        """
+        return await self.request_answer(command,
+                                         self.lib.ble_evt_attclient_procedure_completed,
+                                         lambda payload: payload['connection'] == connection)
+
+    async def request_read(self, command, connection, atthandle):
+        """
+        Send a command reading an attribute and await its value.
+        """
+        return await self.request_answer(command,
+                                         self.lib.ble_evt_attclient_attribute_value,
+                                         lambda payload: payload['connection'] == connection and
+                                         payload['atthandle'] == atthandle)
+
+    async def disconnect_all(self):
+        """
+        Stop possible scanning and close all connections.
+        """
+        await self.request_answer(self.end_gap, self.lib.ble_rsp_gap_end_procedure)
+        for connection in range(self.max_connections):
+            await self.request_answer(partial(self.send, self.lib.ble_cmd_connection_disconnect(connection)),
+                                      self.lib.ble_rsp_connection_disconnect)
@@ -0,0 +1,250 @@
+import asyncio
+import sys
+import time
+from functools import partial
+from src.public.myohw import *
+from src.myo import Myo
+from src.myodriver import MyoDriver
+from src.async_bluetooth import AsyncBluetooth
+
+
+class AsyncMyoDriver(MyoDriver):
+    """
+    MyoDriver on an asyncio event loop. Connection procedures are coroutines awaiting the BGAPI responses and events
+    they depend on, instead of spinning on receive(). Data is handled as it arrives, while the loop runs.
+    """
+    # ble_evt_connection_disconnected reason of a disconnect requested by this host
+    DISCONNECTED_BY_LOCAL_HOST = 0x0216
+
+    def __init__(self, config):
+        super().__init__(config)
+        # Reconnection tasks in progress, cancelled on close
+        self.reconnects = set()
+        self.closing = False
+        # Timer sending the next OSC bundle when it's due, if no data arrives before
+        self.flush_handle = None
+
+    def _create_bluetooth(self, port):
+        bluetooth = AsyncBluetooth(self.config, port)
+        bluetooth.data_received_handler = self._drained
+        return bluetooth
+
+    def _drained(self):
+        """
+        Tell DataHandler everything received was handled, and time the sending of the bundle still pending, if any.
+        """
+        self.data_handler.drained()
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        flush_in = self.data_handler.osc.next_flush_in()
+        if flush_in is not None:
+            self.flush_handle = asyncio.get_running_loop().call_later(flush_in, self._drained)
+
+    async def run(self):
+        """
+        Main. Disconnects possible connections and starts as many connections as needed, concurrently. Dongles are
+        assigned round-robin, and each one runs a single scan or direct connection at a time.
+        """
+        for bluetooth in self.bluetooths:
+            await bluetooth.open()
+        await self.disconnect_all()
+        started = time.monotonic()
+        await asyncio.gather(*(self.add_myo_connection(self.bluetooths[i % len(self.bluetooths)])
+                               for i in range(self.config.MYO_AMOUNT)))
+        self._print_startup_time(started)
+
+    def receive(self):
+        """
+        Data is received by the event loop, nothing to do here.
+        """
+        pass
+
+    async def wait_closed(self):
+        """
+        Wait until the serial ports are closed or lost.
+        """
+        for bluetooth in self.bluetooths:
+            await bluetooth.wait_closed()
+
+    async def close(self):
+        """
+        Cancel reconnections in progress, then stop recording, storing samples and serving metrics, and close every
+        dongle.
+        """
+        self.closing = True
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        for task in self.reconnects:
+            task.cancel()
+        await asyncio.gather(*self.reconnects, return_exceptions=True)
+        super().close()
+
+
+##############################################################################
+#                                  CONNECT                                   #
+##############################################################################
+
+    async def add_myo_connection(self, bluetooth=None):
+        """
+        Procedure for connection with the Myo Armband. Scans, connects, disables sleep and starts EMG stream.
+        :param bluetooth: dongle to connect through, the least loaded one by default
+        """
+        bluetooth = bluetooth or self._least_loaded_bluetooth()
+        myo = None
+        while myo is None:
+            # Discover and await myo detection
+            async with bluetooth.gap_lock:
+                self._print_status("Scanning")
+                payload = await bluetooth.request(bluetooth.gap_discover,
+                                                  bluetooth.lib.ble_evt_gap_scan_response,
+                                                  self._is_new_myo)
+
+                # End gap
+                await bluetooth.request_answer(bluetooth.end_gap, bluetooth.lib.ble_rsp_gap_end_procedure)
+
+            # Another dongle may have found the same myo meanwhile
+            if not self._has_paired_with(payload['sender']):
+                myo = Myo(payload['sender']).set_bluetooth(bluetooth, self._connection_offset(bluetooth))
+        self._print_status("Myo found", myo.address)
+        self._print_status()
+
+        # Add handlers
+        bluetooth.add_connection_status_handler(self.create_connection_status_handle(myo))
+        bluetooth.add_disconnected_handler(self.create_disconnect_handle(myo))
+
+        # Direct connection. Reconnect implements the retry procedure.
+        self.myos.append(myo)
+        await self.connect_and_retry(myo, self.config.RETRY_CONNECTION_AFTER, self.config.MAX_RETRIES)
+
+    async def connect_and_retry(self, myo, timeout=None, max_retries=None):
+        """
+        Procedure for a reconnection.
+        :param myo: Myo object to connect. Should have its address set
+        :param timeout: Time to wait for response
+        :param max_retries: Max retries before exiting the program
+        :return: True if connection was successful, false otherwise.
+        """
+        retries = 0
+        while not await self.direct_connect(myo, timeout) and not myo.connected:
+            retries += 1
+            if max_retries is not None and retries > max_retries:
+                print("Max retries reached. Exiting")
+                sys.exit(1)
+            print()
+            print("Reconnection failed for connection " + str(myo.connection_id) + ". Retry " + str(retries) + "...")
+        myo.set_connected(True)
+        self._set_streaming(myo)
+        return True
+
+    async def direct_connect(self, myo_to_connect, timeout=None):
+        """
+        Procedure for a direct connection with the device.
+        :param myo_to_connect: Myo object to connect. Should have its address set
+        :param timeout: Time to wait for response
+        :return: True if connection was successful, false otherwise.
+        """
+        # Direct connection, await connection status
+        self._print_status("Connecting to", myo_to_connect.address)
+        bluetooth = myo_to_connect.bluetooth
+        async with bluetooth.gap_lock:
+            try:
+                await bluetooth.request(partial(bluetooth.direct_connect, myo_to_connect.address),
+                                        bluetooth.lib.ble_evt_connection_status,
+                                        lambda payload: payload['address'] == myo_to_connect.address and
+                                        payload['flags'] == 5,
+                                        timeout)
+            except asyncio.TimeoutError:
+                # Cancel the connection attempt, so the dongle accepts the next GAP procedure
+                await bluetooth.request_answer(bluetooth.end_gap, bluetooth.lib.ble_rsp_gap_end_procedure)
+                return False
+
+        # Notify successful connection with self.print_status and vibration
+        self._print_status("Connection successful. Setting up...")
+        self._print_status()
+        connection = myo_to_connect.connection_id
+        await bluetooth.request_write(partial(bluetooth.send_vibration_medium, connection), connection)
+
+        # Disable sleep
+        await bluetooth.request_write(partial(bluetooth.disable_sleep, connection), connection)
+
+        # Enable data and subscribe
+        for atthandle, data in bluetooth.enable_data_writes(self.config):
+            await bluetooth.request_write(partial(bluetooth.write_att, connection, atthandle, data), connection)
+
+        return True
+
+    def create_disconnect_handle(self, myo):
+        handle_disconnect = super().create_disconnect_handle(myo)
+
+        def handle_async_disconnect(sender, payload):
+            """
+            Handler for ble_evt_connection_disconnected event. Disconnects requested by this host, or happening while
+            closing, are not reconnected.
+            """
+            if self.closing or payload['reason'] == self.DISCONNECTED_BY_LOCAL_HOST:
+                if myo.connected and myo.connection_id == payload['connection']:
+                    myo.set_connected(False)
+                return
+            handle_disconnect(sender, payload)
+
+        return handle_async_disconnect
+
+    def reconnect(self, myo):
+        """
+        Reconnect procedure after an unexpected disconnect, scheduled on the event loop. The task is kept until done,
+        so close() can cancel it.
+        """
+        myo.setup_writes.clear()
+        myo.set_state(Myo.DISCOVERED)
+        task = asyncio.ensure_future(self.connect_and_retry(myo, self.config.RETRY_CONNECTION_AFTER,
+                                                            self.config.MAX_RETRIES))
+        self.reconnects.add(task)
+        task.add_done_callback(self.reconnects.discard)
+
+
+##############################################################################
+#                                    MYO                                     #
+##############################################################################
+
+    async def get_info(self):
+        """
+        Send read attribute messages and await answer.
+        """
+        if len(self.myos):
+            self._print_status("Getting myo info")
+            self._print_status()
+            for myo in self.myos:
+                bluetooth = myo.bluetooth
+                connection = myo.connection_id
+                await bluetooth.request_read(partial(bluetooth.read_device_name, connection),
+                                             connection, ServiceHandles.DeviceName)
+                await bluetooth.request_read(partial(bluetooth.read_firmware_version, connection),
+                                             connection, ServiceHandles.FirmwareVersionCharacteristic)
+                await bluetooth.request_read(partial(bluetooth.read_battery_level, connection),
+                                             connection, ServiceHandles.BatteryCharacteristic)
+            print("Myo list:")
+            for myo in self.myos:
+                print(" - " + str(myo))
+            print()
+
+    async def disconnect_all(self):
+        """
+        Stop possible scanning and close all connections.
+        """
+        for bluetooth in self.bluetooths:
+            await bluetooth.disconnect_all()
+
+    async def deep_sleep_all(self):
+        """
+        Send deep sleep (turn off) signal to every connected myo.
+        """
+        print("Turning off devices...")
+        self.closing = True
+        for m in self.myos:
+            # The armband turns off right away, only the write response can be awaited
+            connection = m.connection_id
+            await m.bluetooth.request_answer(partial(m.bluetooth.deep_sleep, connection),
+                                             m.bluetooth.lib.ble_rsp_attclient_attribute_write,
+                                             lambda payload: payload['connection'] == connection)
+        print("Disconnected.")
@@ -0,0 +1,269 @@
+import json
+import platform
+import random
+import struct
+import time
+from pythonosc import udp_client
+from src.public.bglib import BGLib, BGAPIEventHandler
+from src.public.myohw import *
+from src.data_handler import DataHandler
+from src.osc_output import OscOutput
+from src.myodriver import EMG_HANDLES, IMU_HANDLES
+
+
+class Benchmark:
+    """
+    Throughput of every stage between the serial port and OSC, measured separately and end to end on a BGAPI byte
+    stream: either recorded from a dongle or synthetic. Each stage runs a few times and keeps its best run.
+    """
+    EMG_FRAMES_PER_SECOND = 100  # Notifications streamed by a single myo, two samples each
+    IMU_FRAMES_PER_SECOND = 50
+    CHUNK_SIZE = 512  # Bytes handed to the chunked parser at once, as read from serial
+
+    def __init__(self, config, stream, repeat=3):
+        """
+        :param stream: BGAPI bytes to process, see synthetic_stream
+        :param repeat: runs of every stage, the fastest one is kept
+        """
+        self.config = config
+        self.stream = bytes(stream)
+        self.repeat = repeat
+        self.frames = self._split_frames(self.stream)
+        self.results = {}
+
+    @staticmethod
+    def synthetic_stream(myo_amount=1, seconds=10, seed=0):
+        """
+        BGAPI bytes of given amount of myos streaming EMG and IMU for given time, as a dongle would send them.
+        """
+        rng = random.Random(seed)
+        emg_handles = sorted(EMG_HANDLES)
+        stream = bytearray()
+        for tick in range(int(seconds * Benchmark.EMG_FRAMES_PER_SECOND)):
+            for connection in range(myo_amount):
+                emg = bytes(rng.randrange(256) for _ in range(16))
+                stream += Benchmark._attribute_value_frame(connection, emg_handles[tick % len(emg_handles)], emg)
+                if tick % (Benchmark.EMG_FRAMES_PER_SECOND // Benchmark.IMU_FRAMES_PER_SECOND) == 0:
+                    imu = struct.pack('<10h', *(rng.randrange(-16384, 16384) for _ in range(10)))
+                    stream += Benchmark._attribute_value_frame(connection, ServiceHandles.IMUDataCharacteristic, imu)
+        return bytes(stream)
+
+    def run(self):
+        """
+        Run every stage.
+        :return: results, as saved by save()
+        """
+        self.bench_parse()
+        self.bench_parse_chunk()
+        self.bench_dispatch()
+        self.bench_event_fire()
+        self.bench_handle_emg()
+        self.bench_handle_imu()
+        self.bench_osc_send()
+        self.bench_end_to_end()
+        self.bench_end_to_end(batch=True)
+        return self.report()
+
+    def report(self):
+        """
+        :return: dict with the environment, the input and the results of every stage run.
+        """
+        per_second = (self.results.get('end_to_end') or {}).get('per_second')
+        frames_per_myo = self.EMG_FRAMES_PER_SECOND + self.IMU_FRAMES_PER_SECOND
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'input': {'bytes': len(self.stream), 'frames': len(self.frames)},
+            'results': self.results,
+            # Myos a single core keeps up with, from the end to end frame rate. None without frames to measure it on
+            'myos_per_core': per_second / frames_per_myo if per_second is not None else None
+        }
+
+    def save(self, path):
+        """
+        Write the report to a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+##############################################################################
+#                                   STAGES                                   #
+##############################################################################
+
+    def bench_parse(self):
+        """
+        BGLib.parse, byte by byte, with a fast path consuming every attribute value.
+        """
+        def run():
+            lib = self._create_lib(lambda connection, atthandle, value: True)
+            for b in self.stream:
+                lib.parse(bytes([b]))
+        self._measure('parse', run, len(self.frames))
+
+    def bench_parse_chunk(self):
+        """
+        BGLib.parse_chunk, on serial-sized chunks, with a fast path consuming every attribute value.
+        """
+        def run():
+            lib = self._create_lib(lambda connection, atthandle, value: True)
+            for i in range(0, len(self.stream), self.CHUNK_SIZE):
+                lib.parse_chunk(self.stream[i:i + self.CHUNK_SIZE])
+        self._measure('parse_chunk', run, len(self.frames))
+
+    def bench_dispatch(self):
+        """
+        BGLib.parse_chunk without fast path: every frame unpacked into a payload dict and fired to a handler.
+        """
+        def run():
+            lib = self._create_lib(None)
+            lib.ble_evt_attclient_attribute_value.add(lambda sender, payload: None)
+            for i in range(0, len(self.stream), self.CHUNK_SIZE):
+                lib.parse_chunk(self.stream[i:i + self.CHUNK_SIZE])
+        self._measure('dispatch', run, len(self.frames))
+
+    def bench_event_fire(self):
+        """
+        BGAPIEventHandler.fire alone, on prebuilt payloads.
+        """
+        lib = BGLib()
+        lib.ble_evt_attclient_attribute_value.add(lambda sender, payload: None)
+        event = BGLib.__dict__['ble_evt_attclient_attribute_value']
+        payloads = [self._payload(frame) for frame in self.frames]
+
+        def run():
+            for payload in payloads:
+                BGAPIEventHandler(event, lib).fire(payload)
+        self._measure('event_fire', run, len(payloads))
+
+    def bench_handle_emg(self):
+        """
+        DataHandler.handle_emg encoding, messages built but not sent.
+        """
+        data_handler = self._create_data_handler(_NullClient())
+        values = [(f[4], f[5] | (f[6] << 8), f[9:]) for f in self.frames if f[5] | (f[6] << 8) in EMG_HANDLES]
+
+        def run():
+            for connection, atthandle, value in values:
+                data_handler.handle_emg(connection, atthandle, value)
+        self._measure('handle_emg', run, len(values))
+
+    def bench_handle_imu(self):
+        """
+        DataHandler.handle_imu encoding, messages built but not sent.
+        """
+        data_handler = self._create_data_handler(_NullClient())
+        values = [(f[4], f[5] | (f[6] << 8), f[9:]) for f in self.frames if f[5] | (f[6] << 8) in IMU_HANDLES]
+
+        def run():
+            for connection, atthandle, value in values:
+                data_handler.handle_imu(connection, atthandle, value)
+        self._measure('handle_imu', run, len(values))
+
+    def bench_osc_send(self):
+        """
+        OSC messages sent through UDP to the configured destinations, bundled as configured, per message.
+        """
+        osc = OscOutput([(address, port) for address, port, _ in DataHandler.osc_destinations(self.config)],
+                        self.config.OSC_BUNDLE_INTERVAL, self.config.OSC_BUNDLE_SIZE)
+        builder = udp_client.OscMessageBuilder("/myo/emg")
+        builder.add_arg("0", 's')
+        for _ in range(8):
+            builder.add_arg(0.5, 'f')
+        message = builder.build()
+        count = max(1, len(self.frames))
+
+        def run():
+            for _ in range(count):
+                osc.send(message)
+            osc.flush()
+        self._measure('osc_send', run, count)
+        osc.close()
+
+    def bench_end_to_end(self, batch=False):
+        """
+        Serial-sized chunks to OSC datagrams: parse, fast path, encoding and UDP send.
+        :param batch: decode the notifications of every chunk together (BATCH_DECODE)
+        """
+        def run():
+            data_handler = self._create_data_handler(None)
+            data_handler.batch_decode = batch
+            lib = self._create_lib(data_handler.handle_attribute_value)
+            for i in range(0, len(self.stream), self.CHUNK_SIZE):
+                lib.parse_chunk(self.stream[i:i + self.CHUNK_SIZE])
+                data_handler.drained()
+            data_handler.close()
+        self._measure('end_to_end_batch' if batch else 'end_to_end', run, len(self.frames))
+
+##############################################################################
+#                                   UTILS                                    #
+##############################################################################
+
+    def _measure(self, name, func, items):
+        """
+        Time the best of self.repeat runs of func and store it in the results.
+        :param items: amount of items (frames, messages...) processed by a run
+        """
+        best = None
+        for _ in range(self.repeat):
+            t0 = time.perf_counter_ns()
+            func()
+            elapsed = time.perf_counter_ns() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        seconds = best / 1e9
+        self.results[name] = {
+            'items': items,
+            'seconds': seconds,
+            'per_second': items / seconds if items and seconds else None,
+            'ns_per_item': best / items if items else None
+        }
+        print("%-16s %10d items %10.3f s %12.0f /s %10.0f ns/item" %
+              (name, items, seconds, self.results[name]['per_second'] or 0, self.results[name]['ns_per_item'] or 0))
+
+    @staticmethod
+    def _create_lib(attribute_value_handler):
+        lib = BGLib()
+        lib.chunked = True
+        lib.attribute_value_handler = attribute_value_handler
+        return lib
+
+    def _create_data_handler(self, osc):
+        data_handler = DataHandler(self.config)
+        if osc is not None:
+            data_handler.osc = osc
+        return data_handler
+
+    @staticmethod
+    def _split_frames(stream):
+        """
+        :return: list of the BGAPI attribute value frames in stream, as bytes.
+        """
+        frames = []
+
+        def handle_attribute_value(connection, atthandle, value):
+            frames.append(Benchmark._attribute_value_frame(connection, atthandle, bytes(value)))
+            return True
+
+        Benchmark._create_lib(handle_attribute_value).parse_chunk(stream)
+        return frames
+
+    @staticmethod
+    def _payload(frame):
+        connection, atthandle, value_type = struct.unpack_from('<BHB', frame, 4)
+        return {'connection': connection, 'atthandle': atthandle, 'type': value_type, 'value': frame[9:]}
+
+    @staticmethod
+    def _attribute_value_frame(connection, atthandle, value):
+        payload = struct.pack('<BHBB', connection, atthandle, 1, len(value)) + value
+        return bytes([0x80, len(payload), 4, 5]) + payload
+
+
+class _NullClient:
+    """
+    OSC client dropping every message, to time encoding alone.
+    """
+    def send(self, message, targets=None):
+        pass
+
+    def send_dgram(self, dgram, targets=None):
+        pass
@@ -2,8 +2,11 @@ from serial.tools.list_ports import comports
 import serial
 from src.public.bglib import BGLib
 import re
+import select
 import time
 from src.public.myohw import *
+from src.ring_buffer import RingBuffer
+from src.serial_reader import SerialReader
 
 
 class Bluetooth:
@@ -11,63 +14,232 @@ class Bluetooth:
     Responsible for serial comm and message encapsulation.
     New commands can be added using myohw.py and following provided commands.
     """
-    def __init__(self, message_delay):
+    def __init__(self, config, port=None, reader_condition=None):
         self.lib = BGLib()
-        self.message_delay = message_delay
-        self.serial = serial.Serial(port=self._detect_port(), baudrate=9600, dsrdtr=1)
+        self.lib.chunked = config.CHUNKED_PARSER
+        self.lib.timestamps = config.LATENCY_STATS
+        self.message_delay = config.MESSAGE_DELAY
+        self.response_timeout = config.RESPONSE_TIMEOUT
+        self.receive_timeout = config.RECEIVE_TIMEOUT
+        self.max_connections = config.MAX_CONNECTIONS
+        self.serial = serial.Serial(port=port or self._detect_port(), baudrate=9600, dsrdtr=1)
+        self.poller = self._create_poller()
+        self.reader = self._create_reader(config, reader_condition)
+        # Called instead of receive() while awaiting the dongle, e.g. MyoDriver.receive, which keeps every dongle and
+        # DataHandler going meanwhile
+        self.receive_handler = None
+
+        # Connections with a GATT procedure (attribute read/write) awaiting completion, and when it started
+        self.pending_procedures = {}
+        self.sent_at = 0
+        self.lib.ble_rsp_attclient_attribute_write.add(self._handle_procedure_response)
+        self.lib.ble_rsp_attclient_read_by_handle.add(self._handle_procedure_response)
+        self.lib.ble_evt_attclient_procedure_completed.add(self._handle_procedure_end)
+        self.lib.ble_evt_attclient_attribute_value.add(self._handle_read_value)
+        self.lib.ble_evt_connection_disconnected.add(self._handle_procedure_end)
 
     @staticmethod
-    def _detect_port():
+    def detect_ports():
         """
-        Detect COM port.
-        :return: COM port with the expected ID
+        Detect COM ports of every connected dongle.
+        :return: list of COM ports with the expected ID
         """
         print("Detecting available ports")
+        ports = []
         for p in comports():
             if re.search(r'PID=2458:0*1', p[2]):
                 print('Port detected: ', p[0])
-                print()
-                return p[0]
-        return None
+                ports.append(p[0])
+        print()
+        return ports
+
+    @staticmethod
+    def _detect_port():
+        """
+        Detect COM port.
+        :return: first COM port with the expected ID
+        """
+        ports = Bluetooth.detect_ports()
+        return ports[0] if ports else None
+
+    def _create_reader(self, config, reader_condition):
+        """
+        Threaded mode: a dedicated thread reads the port, receive() parses and dispatches what it buffered.
+        :param reader_condition: condition shared with the ring buffers of other dongles, enables threaded mode
+        :return: started SerialReader, None if not in threaded mode
+        """
+        if not config.THREADED_READER and reader_condition is None:
+            return None
+        reader = SerialReader(self.serial, RingBuffer(config.READER_BUFFER_SIZE, reader_condition))
+        reader.start()
+        return reader
+
+    def _create_poller(self):
+        """
+        Poll object watching the serial port for incoming data.
+        :return: poll object, or None if the port can't be polled (e.g. on Windows)
+        """
+        if not hasattr(select, 'poll') or not hasattr(self.serial, 'fileno'):
+            return None
+        poller = select.poll()
+        poller.register(self.serial.fileno(), select.POLLIN)
+        return poller
 
 ##############################################################################
 #                                  PROTOCOL                                  #
 ##############################################################################
 
-    def receive(self):
+    def receive(self, timeout=None):
         """
-        Check for received evens and handle them.
+        Check for received evens and handle them. If a receive timeout is set, block until data arrives or the timeout
+        is met, instead of returning right away.
+        :param timeout: max seconds to block, e.g. until an OSC bundle is due, the receive timeout if None
         """
+        if timeout is None:
+            timeout = self.receive_timeout
+        if self.reader is not None:
+            self._parse_buffered(timeout or 0)
+            return
+        if timeout is not None and not self.serial.in_waiting:
+            self._wait_for_data(timeout)
         self.lib.check_activity(self.serial)
 
-    def send(self, msg):
+    def drain(self):
         """
-        Send given message through serial. A small delay is required for the Myo to process them correctly
+        Handle whatever the serial reader thread has buffered, without waiting.
+        """
+        self._parse_buffered(0)
+
+    def _parse_buffered(self, timeout):
+        """
+        Parse what the serial reader thread has buffered, stamped with the time its oldest part was read.
+        """
+        data = self.reader.ring_buffer.read(timeout)
+        if self.lib.timestamps:
+            self.lib.rx_ns = self.reader.ring_buffer.last_read_ns
+        self._parse(data)
+
+    def reader_stats(self):
+        """
+        :return: ring buffer counters of the serial reader thread, None if it's not running.
+        """
+        if self.reader is None:
+            return None
+        return self.reader.ring_buffer.stats()
+
+    def close(self):
+        """
+        Stop the serial reader thread, if any, and close the port.
+        """
+        if self.reader is not None:
+            self.reader.stop()
+        self.serial.close()
+
+    def _wait_for_data(self, timeout):
+        """
+        Block until the serial port has data to read.
+        :param timeout: max time to wait, in seconds
+        """
+        if self.poller is not None:
+            self.poller.poll(timeout * 1000)
+            return
+        # Port can't be polled, block on a single byte read instead
+        self.serial.timeout = timeout
+        data = self.serial.read(1)
+        if self.lib.timestamps:
+            self.lib.rx_ns = time.monotonic_ns()
+        self._parse(data)
+
+    def _parse(self, data):
+        """
+        Feed bytes read outside of BGLib.check_activity to the parser.
+        """
+        if self.lib.chunked:
+            if data:
+                self.lib.parse_chunk(data)
+        else:
+            for b in data:
+                self.lib.parse(bytes([b]))
+
+    def send(self, msg, connection=None):
+        """
+        Send given message through serial, once the dongle has answered the previous command. Attribute reads and
+        writes also wait for the previous one on the same connection to complete, so the Myo can process them.
         :param msg: packed message to send
+        :param connection: connection the message starts an attribute read/write on, if it does
         """
-        time.sleep(self.message_delay)
+        if self.message_delay:
+            time.sleep(self.message_delay)
+        self._await_ready(connection)
+        self.sent_at = time.monotonic()
+        if connection is not None:
+            self.pending_procedures[connection] = self.sent_at
         self.lib.send_command(self.serial, msg)
 
+    def ready(self, connection=None):
+        """
+        :param connection: connection the next command would start an attribute read/write on, if it does
+        :return: True if the next command can be sent without waiting: the previous command has been answered and the
+        connection has no attribute read/write in progress, or the response timeout has been met.
+        """
+        now = time.monotonic()
+        if self.lib.busy and now < self.sent_at + self.response_timeout:
+            return False
+        started = self.pending_procedures.get(connection)
+        return started is None or now >= started + self.response_timeout
+
+    def _await_ready(self, connection):
+        """
+        Handle received events until the next command can be sent.
+        """
+        receive = self.receive_handler or self.receive
+        while not self.ready(connection):
+            receive()
+        if self.lib.busy or connection in self.pending_procedures:
+            print("WARNING: Dongle response timed out, sending next command anyway.")
+            self.lib.busy = False
+            self.pending_procedures.pop(connection, None)
+
+    def _handle_procedure_response(self, _, payload):
+        """
+        A failed attribute read/write command won't be followed by its completion.
+        """
+        if payload['result'] != 0:
+            self.pending_procedures.pop(payload['connection'], None)
+
+    def _handle_procedure_end(self, _, payload):
+        """
+        Handler for events ending an attribute read/write: procedure completed and disconnection.
+        """
+        self.pending_procedures.pop(payload['connection'], None)
+
+    def _handle_read_value(self, _, payload):
+        """
+        An attribute value answering a read (type 0: read, 3: read by type, 4: read blob) ends the read procedure,
+        notifications and indications don't.
+        """
+        if payload['type'] in (0, 3, 4):
+            self.pending_procedures.pop(payload['connection'], None)
+
     def write_att(self, connection, atthandle, data):
         """
         Wrapper for code readability.
         """
-        self.send(self.lib.ble_cmd_attclient_attribute_write(connection, atthandle, data))
+        self.send(self.lib.ble_cmd_attclient_attribute_write(connection, atthandle, data), connection)
 
     def read_att(self, connection, atthandle):
         """
         Wrapper for code readability.
         """
-        self.send(self.lib.ble_cmd_attclient_read_by_handle(connection, atthandle))
+        self.send(self.lib.ble_cmd_attclient_read_by_handle(connection, atthandle), connection)
 
     def disconnect_all(self):
         """
         Stop possible scanning and close all connections.
         """
         self.send(self.lib.ble_cmd_gap_end_procedure())
-        self.send(self.lib.ble_cmd_connection_disconnect(0))
-        self.send(self.lib.ble_cmd_connection_disconnect(1))
-        self.send(self.lib.ble_cmd_connection_disconnect(2))
+        for connection in range(self.max_connections):
+            self.send(self.lib.ble_cmd_connection_disconnect(connection))
 
 
 ##############################################################################
@@ -125,35 +297,51 @@ class Bluetooth:
                        [MyoCommand.myohw_command_deep_sleep])
 
     def enable_data(self, connection, config):
-        # TODO: Subscribe to classifier events.
-
-        # Start EMG
-        self.write_att(connection,
-                       ServiceHandles.CommandCharacteristic,
-                       [MyoCommand.myohw_command_set_mode,
-                        0x03,
-                        config.EMG_MODE,
-                        config.IMU_MODE,
-                        config.CLASSIFIER_MODE])
+        for atthandle, data in self.enable_data_writes(config):
+            self.write_att(connection, atthandle, data)
 
-        # Subscribe for IMU
-        self.write_att(connection,
-                       ServiceHandles.IMUDataDescriptor,
-                       Final.subscribe_payload)
+    @staticmethod
+    def setup_writes(config):
+        """
+        Attribute writes that set up a new connection: vibrate, disable sleep, then start and subscribe to data.
+        :return: list of (atthandle, data) to write in order
+        """
+        return [
+            (ServiceHandles.CommandCharacteristic,
+             [MyoCommand.myohw_command_vibrate,
+              0x01,
+              VibrationType.myohw_vibration_medium]),
+            (ServiceHandles.CommandCharacteristic,
+             [MyoCommand.myohw_command_set_sleep_mode,
+              0x01,
+              SleepMode.myohw_sleep_mode_never_sleep])
+        ] + Bluetooth.enable_data_writes(config)
 
-        # Subscribe for EMG
-        self.write_att(connection,
-                       ServiceHandles.EmgData0Descriptor,
-                       Final.subscribe_payload)
-        self.write_att(connection,
-                       ServiceHandles.EmgData1Descriptor,
-                       Final.subscribe_payload)
-        self.write_att(connection,
-                       ServiceHandles.EmgData2Descriptor,
-                       Final.subscribe_payload)
-        self.write_att(connection,
-                       ServiceHandles.EmgData3Descriptor,
-                       Final.subscribe_payload)
+    @staticmethod
+    def enable_data_writes(config):
+        """
+        Attribute writes that start EMG/IMU streaming and subscribe to it.
+        :return: list of (atthandle, data) to write in order
+        """
+        # TODO: Subscribe to classifier events.
+        return [
+            # Start EMG
+            (ServiceHandles.CommandCharacteristic,
+             [MyoCommand.myohw_command_set_mode,
+              0x03,
+              config.EMG_MODE,
+              config.IMU_MODE,
+              config.CLASSIFIER_MODE]),
+
+            # Subscribe for IMU
+            (ServiceHandles.IMUDataDescriptor, Final.subscribe_payload),
+
+            # Subscribe for EMG
+            (ServiceHandles.EmgData0Descriptor, Final.subscribe_payload),
+            (ServiceHandles.EmgData1Descriptor, Final.subscribe_payload),
+            (ServiceHandles.EmgData2Descriptor, Final.subscribe_payload),
+            (ServiceHandles.EmgData3Descriptor, Final.subscribe_payload)
+        ]
 
 
 ##############################################################################
@@ -169,6 +357,9 @@ class Bluetooth:
     def add_attribute_value_handler(self, handler):
         self.lib.ble_evt_attclient_attribute_value.add(handler)
 
+    def set_attribute_value_fast_handler(self, handler):
+        self.lib.attribute_value_handler = handler
+
     def add_disconnected_handler(self, handler):
         self.lib.ble_evt_connection_disconnected.add(handler)
 
@@ -19,10 +19,40 @@ class Config:
     VERBOSE = False  # Verbose console
     GET_MYO_INFO = True  # Get and display myo info at sync
 
-    MESSAGE_DELAY = 0.1  # Added delay before every message sent to the myo
+    MESSAGE_DELAY = 0  # Added delay before every message sent to the myo, on top of awaiting the previous response
+    RESPONSE_TIMEOUT = 1  # Max seconds to await the dongle's answer to a command before sending the next one
+    CHUNKED_PARSER = True  # Read every available serial byte at once and parse whole frames
+    BATCH_DECODE = False  # Decode the EMG/IMU notifications of every serial read together, vectorized with NumPy
+    RECEIVE_TIMEOUT = 0.1  # Max seconds to block waiting for serial data, None to busy-poll
+    THREADED_READER = False  # Read serial on a dedicated thread, always enabled when using several dongles
+    READER_BUFFER_SIZE = 65536  # Ring buffer bytes between the serial reader thread and the parser
+    LATENCY_STATS = False  # Keep per-stage latency histograms, from serial read to OSC send
+    RECORD_FILE = None  # File recording every BGAPI frame received, timestamped, None: off
+    SAMPLE_STORE_DIR = None  # Directory of memory-mapped .npy files storing every EMG/IMU sample, None: off
+    HISTORY_SECONDS = None  # Seconds of EMG/IMU samples kept in memory per myo for MyoDriver.window, None: off
+    SHARED_MEMORY_NAME = None  # Publish the sample history (5 s if HISTORY_SECONDS is None) to shared memory blocks
+    # named <name>_<connection>_<emg|imu>, read with SharedSampleReader, None: off
+    METRICS_PORT = None  # Local HTTP port serving runtime counters as JSON (http://localhost:<port>/metrics), None: off
+    MAX_CONNECTIONS = 3  # Connections supported by each dongle
+    SERIAL_PORTS = None  # Serial ports of the dongles (e.g. ['COM3'] or a simulator's pty), None to detect them
+
+    EMG_LOSS_FILL = None  # Lost EMG notifications: None only counts them, 'marker' sends the amount of lost samples on
+    # the emg_loss channel (see OSC_CHANNELS), 'nan' sends NaN samples and 'hold' repeats the last sample in their place
 
     OSC_ADDRESS = 'localhost'  # Address for OSC
     OSC_PORT = 3000  # Port for OSC
+    OSC_DESTINATIONS = None  # Destinations sent every OSC message instead, as (address, port) or (address, port,
+    # channels) to only send given channels, e.g. [('localhost', 3000), ('10.0.0.2', 9000, {'emg'})]
+    OSC_BUNDLE_INTERVAL = None  # Pack OSC messages into bundles sent every given seconds (e.g. 0.005), None: off
+    OSC_BUNDLE_SIZE = None  # Max OSC messages per bundle, None: no limit (bundles of every serial read if no interval)
+    OSC_CHANNELS = {  # Channels sent for every myo, at given OSC addresses (see DataHandler.CHANNELS for the options)
+        'emg': '/myo/emg',
+        'orientation': '/myo/orientation',
+        'accel_magnitude': '/myo/accel',
+        'gyro_magnitude': '/myo/gyro',
+        'emg_loss': '/myo/emg/loss'
+    }
+    OSC_CHANNELS_PER_MYO = {}  # Channels sent for given connection ids instead, e.g. {0: {'quaternion': '/myo/quat'}}
 
     RETRY_CONNECTION_AFTER = 2  # Reconnection timeout in seconds
     MAX_RETRIES = None  # Max amount of retries after unexpected disconnect
@@ -1,67 +1,425 @@
-from pythonosc import udp_client
+from src.public.myohw import *
+from src.osc_encoder import OscEncoder
+from src.osc_output import OscOutput
+from src.sample_history import SampleHistory
+from src.sample_store import SampleStore
+from src.shared_sample_history import SharedSampleHistory
 import struct
 import math
+import numpy as np
+
+# Position of every EMG characteristic in the order the firmware sends them
+EMG_SEQUENCE = {
+    ServiceHandles.EmgData0Characteristic: 0,
+    ServiceHandles.EmgData1Characteristic: 1,
+    ServiceHandles.EmgData2Characteristic: 2,
+    ServiceHandles.EmgData3Characteristic: 3
+}
+EMG_SAMPLE = struct.Struct('<8b')
+QUATERNION = struct.Struct('<4h')
+VECTOR = struct.Struct('<3h')
+
+# Units of the IMU values sent by the armband, from myohw.h
+ORIENTATION_SCALE = 16384.0  # Per unit of quaternion
+ACCELEROMETER_SCALE = 2048.0  # Per g
+GYROSCOPE_SCALE = 16.0  # Per deg/s
 
 
 class DataHandler:
     """
     EMG/IMU/Classifier data handler.
     """
-    def __init__(self, config):
-        self.osc = udp_client.SimpleUDPClient(config.OSC_ADDRESS, config.OSC_PORT)
+    # Channels that can be sent, see Config.OSC_CHANNELS: stream they're decoded from, and OSC type tags of their
+    # arguments after the connection id
+    CHANNELS = {
+        'emg': ('emg', 'ffffffff'),  # EMG sample normalized to [-1, 1]
+        'emg_raw': ('emg', 'iiiiiiii'),  # EMG sample as sent, -128 to 127
+        'quaternion': ('imu', 'ffff'),  # Orientation as a unit quaternion, w, x, y, z
+        'orientation': ('imu', 'fff'),  # Orientation as roll, pitch and yaw normalized to [-1, 1]
+        'accel': ('imu', 'fff'),  # Accelerometer vector, in g
+        'accel_magnitude': ('imu', 'f'),  # Accelerometer magnitude, in raw units (2048 per g)
+        'gyro': ('imu', 'fff'),  # Gyroscope vector, in deg/s
+        'gyro_magnitude': ('imu', 'f'),  # Gyroscope magnitude, in raw units (16 per deg/s)
+        'emg_loss': ('emg_loss', 'i')  # Amount of EMG samples lost, sent when EMG_LOSS_FILL is 'marker'
+    }
+
+    def __init__(self, config, latency=None, metrics=None):
+        """
+        :param latency: LatencyMonitor told when each notification has been sent, if any
+        :param metrics: Metrics counting packets and messages sent, if any
+        """
+        destinations = self.osc_destinations(config)
+        self.osc = OscOutput([(address, port) for address, port, _ in destinations], config.OSC_BUNDLE_INTERVAL,
+                             config.OSC_BUNDLE_SIZE, latency)
+        self.latency = latency
+        self.metrics = metrics
         self.printEmg = config.PRINT_EMG
         self.printImu = config.PRINT_IMU
 
-    def handle_emg(self, payload):
+        # Channels sent for every connection, or for given ones, as {channel: address}
+        self.channels = config.OSC_CHANNELS
+        self.channels_per_myo = config.OSC_CHANNELS_PER_MYO
+        # Channels each destination receives, None for all of them
+        self.destination_channels = [channels for _, _, channels in destinations]
+        for schema in [self.channels] + list(self.channels_per_myo.values()) + \
+                [channels for channels in self.destination_channels if channels is not None]:
+            for channel in schema:
+                if channel not in self.CHANNELS:
+                    raise ValueError("Unknown OSC channel: " + str(channel))
+        self.channel_functions = {
+            'emg': (self._emg, self._emg_batch),
+            'emg_raw': (self._emg_raw, self._emg_raw_batch),
+            'quaternion': (self._quaternion, self._quaternion_batch),
+            'orientation': (self._orientation, self._orientation_batch),
+            'accel': (self._accel, self._accel_batch),
+            'accel_magnitude': (self._accel_magnitude, self._accel_magnitude_batch),
+            'gyro': (self._gyro, self._gyro_batch),
+            'gyro_magnitude': (self._gyro_magnitude, self._gyro_magnitude_batch),
+            'emg_loss': (None, None)  # Not decoded, encoded by _handle_emg_loss
+        }
+        # Per (connection, stream): list of (channel, encoder, function, batch function, destinations) to send
+        self.outputs = {}
+        # OSC messages, encoded behind their cached address, type tags and connection, per (address, tags)
+        self.encoders = {}
+
+        # Objects receiving every raw EMG/IMU value along OSC, through their emg and imu methods, closed by close()
+        self.sample_sinks = []
+        if config.SAMPLE_STORE_DIR is not None:
+            self.sample_sinks.append(SampleStore(config.SAMPLE_STORE_DIR))
+        if config.SHARED_MEMORY_NAME is not None:
+            self.history = SharedSampleHistory(config.HISTORY_SECONDS or SampleHistory.DEFAULT_SECONDS,
+                                               config.SHARED_MEMORY_NAME)
+        elif config.HISTORY_SECONDS:
+            self.history = SampleHistory(config.HISTORY_SECONDS)
+        else:
+            self.history = None
+        if self.history is not None:
+            self.sample_sinks.append(self.history)
+
+        # EMG loss detection, per connection: next expected position in EMG_SEQUENCE, lost notifications, last sample
+        self.emg_loss_fill = config.EMG_LOSS_FILL
+        self.emg_expected = {}
+        self.emg_lost = {}
+        self.emg_last = {}
+
+        # Notifications waiting to be decoded together at the end of the drain, when batching
+        self.batch_decode = config.BATCH_DECODE
+        self.emg_batch = []
+        self.imu_batch = []
+
+    def handle_attribute_value(self, connection, atthandle, value):
+        """
+        Route an attribute value to the EMG or IMU handler, or to the batch decoded by drained() when batching.
+        :return: True if the value was EMG/IMU data and got handled, False otherwise.
+        """
+        if atthandle in EMG_SEQUENCE:
+            if self.batch_decode:
+                self._add_to_batch(self.emg_batch, connection, atthandle, value, self.printEmg and "EMG")
+            else:
+                self.handle_emg(connection, atthandle, value)
+            return True
+        if atthandle == ServiceHandles.IMUDataCharacteristic:
+            if self.batch_decode:
+                self._add_to_batch(self.imu_batch, connection, atthandle, value, self.printImu and "IMU")
+            else:
+                self.handle_imu(connection, atthandle, value)
+            return True
+        return False
+
+    def drained(self):
+        """
+        Called after every drain of the serial port: decode the batch, if any, and send the OSC bundle if it's due.
+        """
+        if self.emg_batch:
+            self._handle_emg_batch()
+        if self.imu_batch:
+            self._handle_imu_batch()
+        self.osc.flush_due()
+
+    def _add_to_batch(self, batch, connection, atthandle, value, label):
+        if label:
+            print(label, connection, atthandle, bytes(value))
+        # The value points into the parser's buffer
+        batch.append((connection, atthandle, bytes(value), self.latency.take() if self.latency is not None else None))
+
+    def handle_emg(self, connection, atthandle, value):
         """
         Handle EMG data.
-        :param payload: emg data as two samples in a single pack.
+        :param connection: connection id of the myo
+        :param atthandle: EMG characteristic handle
+        :param value: emg data as two samples in a single pack.
         """
         if self.printEmg:
-            print("EMG", payload['connection'], payload['atthandle'], payload['value'])
+            print("EMG", connection, atthandle, bytes(value))
+        outputs = self._outputs(connection, 'emg')
+        messages = self._check_emg_sequence(connection, atthandle, outputs)
 
         # Send both samples
-        self._send_single_emg(payload['connection'], payload['value'][0:8])
-        self._send_single_emg(payload['connection'], payload['value'][8:16])
+        self._send_single_emg(connection, value[0:8], outputs)
+        self._send_single_emg(connection, value[8:16], outputs)
+        self._emg_handled(connection, value, messages + 2 * len(outputs))
+
+    def _handle_emg_batch(self):
+        """
+        Handle the EMG notifications of a drain: the samples of every channel sent are decoded and encoded at once,
+        only sending is left per notification.
+        """
+        batch = self.emg_batch
+        self.emg_batch = []
+        arguments = self._decode_batch(batch, 'emg', lambda data: np.frombuffer(data, np.int8).reshape(-1, 8))
+        send = self.osc.send_dgram
+        for i, (connection, atthandle, value, stamps) in enumerate(batch):
+            outputs = self._outputs(connection, 'emg')
+            messages = self._check_emg_sequence(connection, atthandle, outputs)
+            for row in (2 * i, 2 * i + 1):
+                for channel, encoder, _, _, targets in outputs:
+                    size = encoder.arguments.size
+                    send(encoder.prefix(connection) + arguments[channel][row * size:(row + 1) * size], targets)
+            self._emg_handled(connection, value, messages + 2 * len(outputs), stamps)
+
+    def _check_emg_sequence(self, connection, atthandle, outputs):
+        """
+        A characteristic skipped in the rotation is a lost notification.
+        :return: amount of OSC messages sent to fill in for lost notifications
+        """
+        position = EMG_SEQUENCE[atthandle]
+        expected = self.emg_expected.get(connection)
+        self.emg_expected[connection] = (position + 1) % 4
+        if expected is not None and position != expected:
+            return self._handle_emg_loss(connection, (position - expected) % 4, outputs)
+        return 0
 
-    def _send_single_emg(self, conn, data):
-        builder = udp_client.OscMessageBuilder("/myo/emg")
-        builder.add_arg(str(conn), 's')
-        for i in struct.unpack('<8b ', data):
-            builder.add_arg(i / 127, 'i')  # Normalize
-        self.osc.send(builder.build())
+    def _emg_handled(self, connection, value, messages, stamps=None):
+        """
+        Book an EMG notification once its samples are sent.
+        :param stamps: latency stamps taken when batched
+        """
+        if self.emg_loss_fill == 'hold':
+            self.emg_last[connection] = bytes(value[8:16])
+        for sink in self.sample_sinks:
+            sink.emg(connection, value)
+        if self.latency is not None:
+            self.osc.sent(stamps)
+        if self.metrics is not None:
+            self.metrics.emg(connection, messages)
+
+    def _handle_emg_loss(self, connection, lost, outputs):
+        """
+        Count lost EMG notifications (two samples each) and fill in for them according to EMG_LOSS_FILL. NaN samples
+        are only sent on float channels, and markers on the emg_loss channel.
+        :return: amount of OSC messages sent
+        """
+        self.emg_lost[connection] = self.emg_lost.get(connection, 0) + lost
+        if self.metrics is not None:
+            self.metrics.emg_loss(connection, lost)
+        if self.emg_loss_fill == 'marker':
+            markers = self._outputs(connection, 'emg_loss')
+            for _, encoder, _, _, targets in markers:
+                self.osc.send_dgram(encoder.encode(connection, 2 * lost), targets)
+            return len(markers)
+        if self.emg_loss_fill == 'nan':
+            outputs = [output for output in outputs if output[1].tags[0] == 'f']
+            for _ in range(2 * lost):
+                for _, encoder, _, _, targets in outputs:
+                    self.osc.send_dgram(encoder.encode(connection, *(math.nan,) * 8), targets)
+        elif self.emg_loss_fill == 'hold' and connection in self.emg_last:
+            for _ in range(2 * lost):
+                self._send_single_emg(connection, self.emg_last[connection], outputs)
+        else:
+            return 0
+        return 2 * lost * len(outputs)
 
-    def handle_imu(self, payload):
+    def close(self):
+        """
+        Send pending OSC messages and close the sample sinks.
+        """
+        self.drained()
+        self.osc.close()
+        for sink in self.sample_sinks:
+            sink.close()
+
+    def reset_emg_sequence(self, connection):
+        """
+        Forget the EMG rotation of a connection, e.g. after a reconnection, so its first notification isn't a loss.
+        """
+        self.emg_expected.pop(connection, None)
+        self.emg_last.pop(connection, None)
+
+    def _send_single_emg(self, conn, data, outputs):
+        for _, encoder, function, _, targets in outputs:
+            self.osc.send_dgram(encoder.encode(conn, *function(data)), targets)
+
+    def handle_imu(self, connection, atthandle, value):
         """
         Handle IMU data.
-        :param payload: imu data in a single byte array.
+        :param connection: connection id of the myo
+        :param atthandle: IMU characteristic handle
+        :param value: imu data in a single byte array.
         """
         if self.printImu:
-            print("IMU", payload['connection'], payload['atthandle'], payload['value'])
-        # Send orientation
-        data = payload['value'][0:8]
-        builder = udp_client.OscMessageBuilder("/myo/orientation")
-        builder.add_arg(str(payload['connection']), 's')
-        roll, pitch, yaw = self._euler_angle(*(struct.unpack('hhhh', data)))
+            print("IMU", connection, atthandle, bytes(value))
+        outputs = self._outputs(connection, 'imu')
+        for _, encoder, function, _, targets in outputs:
+            self.osc.send_dgram(encoder.encode(connection, *function(value)), targets)
+        self._imu_handled(connection, value, len(outputs))
+
+    def _handle_imu_batch(self):
+        """
+        Handle the IMU notifications of a drain: every channel sent is computed and encoded at once, only sending is
+        left per notification.
+        """
+        batch = self.imu_batch
+        self.imu_batch = []
+        arguments = self._decode_batch(batch, 'imu',
+                                       lambda data: np.frombuffer(data, np.int16).reshape(-1, 10).astype(np.float64))
+        send = self.osc.send_dgram
+        for i, (connection, atthandle, value, stamps) in enumerate(batch):
+            outputs = self._outputs(connection, 'imu')
+            for channel, encoder, _, _, targets in outputs:
+                size = encoder.arguments.size
+                send(encoder.prefix(connection) + arguments[channel][i * size:(i + 1) * size], targets)
+            self._imu_handled(connection, value, len(outputs), stamps)
+
+    def _imu_handled(self, connection, value, messages, stamps=None):
+        """
+        Book an IMU notification once its messages are sent.
+        :param stamps: latency stamps taken when batched
+        """
+        for sink in self.sample_sinks:
+            sink.imu(connection, value)
+        if self.latency is not None:
+            self.osc.sent(stamps)
+        if self.metrics is not None:
+            self.metrics.imu(connection, messages)
+
+##############################################################################
+#                                  CHANNELS                                  #
+##############################################################################
+
+    def _outputs(self, connection, stream):
+        """
+        :param stream: 'emg', 'imu' or 'emg_loss'
+        :return: list of (channel, encoder, function, batch function, destinations) to send for a stream of a
+        connection, leaving out channels no destination receives.
+        """
+        outputs = self.outputs.get((connection, stream))
+        if outputs is None:
+            schema = self.channels_per_myo.get(connection, self.channels)
+            outputs = self.outputs[(connection, stream)] = []
+            for channel, address in schema.items():
+                targets = self._targets(channel)
+                if self.CHANNELS[channel][0] == stream and targets != ():
+                    outputs.append((channel, self._encoder(address, self.CHANNELS[channel][1])) +
+                                   self.channel_functions[channel] + (targets,))
+        return outputs
+
+    def _targets(self, channel):
+        """
+        :return: indexes of the destinations receiving a channel, None if all of them do.
+        """
+        destinations = self.destination_channels
+        targets = tuple(i for i, channels in enumerate(destinations) if channels is None or channel in channels)
+        return None if len(targets) == len(destinations) else targets
+
+    @staticmethod
+    def osc_destinations(config):
+        """
+        :return: list of (address, port, channels) to send OSC to, channels being None for all of them: the
+        OSC_DESTINATIONS of a config, or its OSC_ADDRESS and OSC_PORT.
+        """
+        if not config.OSC_DESTINATIONS:
+            return [(config.OSC_ADDRESS, config.OSC_PORT, None)]
+        return [(address, port, set(channels[0]) if channels and channels[0] is not None else None)
+                for address, port, *channels in config.OSC_DESTINATIONS]
+
+    def _encoder(self, address, tags):
+        encoder = self.encoders.get((address, tags))
+        if encoder is None:
+            encoder = self.encoders[(address, tags)] = OscEncoder(address, tags)
+        return encoder
+
+    def _decode_batch(self, batch, stream, decode):
+        """
+        Decode the values of a batch, for the channels sent by any of its connections only.
+        :param decode: function turning the joined values into an array of samples
+        :return: dict of channel: arguments of every sample, encoded back to back
+        """
+        channels = {}
+        for connection in set(item[0] for item in batch):
+            for channel, encoder, _, batch_function, _ in self._outputs(connection, stream):
+                channels[channel] = (encoder.tags, batch_function)
+        if not channels:
+            return {}
+        samples = decode(b''.join(item[2] for item in batch))
+        return {channel: batch_function(samples).astype('>f4' if tags[0] == 'f' else '>i4').tobytes()
+                for channel, (tags, batch_function) in channels.items()}
+
+    @staticmethod
+    def _emg(sample):
+        # Normalize
+        return [i / 127 for i in EMG_SAMPLE.unpack(sample)]
+
+    @staticmethod
+    def _emg_batch(samples):
+        return samples / 127
+
+    @staticmethod
+    def _emg_raw(sample):
+        return EMG_SAMPLE.unpack(sample)
+
+    @staticmethod
+    def _emg_raw_batch(samples):
+        return samples
+
+    @staticmethod
+    def _quaternion(value):
+        return [q / ORIENTATION_SCALE for q in QUATERNION.unpack_from(value, 0)]
+
+    @staticmethod
+    def _quaternion_batch(samples):
+        return samples[:, 0:4] / ORIENTATION_SCALE
+
+    @classmethod
+    def _orientation(cls, value):
+        roll, pitch, yaw = cls._euler_angle(*cls._quaternion(value))
         # Normalize to [-1, 1]
-        builder.add_arg(roll / math.pi, 'f')
-        builder.add_arg(pitch / math.pi, 'f')
-        builder.add_arg(yaw / math.pi, 'f')
-        self.osc.send(builder.build())
-
-        # Send accelerometer
-        data = payload['value'][8:14]
-        builder = udp_client.OscMessageBuilder("/myo/accel")
-        builder.add_arg(str(payload['connection']), 's')
-        builder.add_arg(self._vector_magnitude(*(struct.unpack('hhh', data))), 'f')
-        self.osc.send(builder.build())
-
-        # Send gyroscope
-        data = payload['value'][14:20]
-        builder = udp_client.OscMessageBuilder("/myo/gyro")
-        builder.add_arg(str(payload['connection']), 's')
-        builder.add_arg(self._vector_magnitude(*(struct.unpack('hhh', data))), 'f')
-        self.osc.send(builder.build())
+        return roll / math.pi, pitch / math.pi, yaw / math.pi
+
+    @classmethod
+    def _orientation_batch(cls, samples):
+        return cls._euler_angles(samples[:, 0:4] / ORIENTATION_SCALE) / math.pi
+
+    @staticmethod
+    def _accel(value):
+        return [a / ACCELEROMETER_SCALE for a in VECTOR.unpack_from(value, 8)]
+
+    @staticmethod
+    def _accel_batch(samples):
+        return samples[:, 4:7] / ACCELEROMETER_SCALE
+
+    @classmethod
+    def _accel_magnitude(cls, value):
+        return cls._vector_magnitude(*VECTOR.unpack_from(value, 8)),
+
+    @classmethod
+    def _accel_magnitude_batch(cls, samples):
+        return cls._vector_magnitudes(samples[:, 4:7])
+
+    @staticmethod
+    def _gyro(value):
+        return [g / GYROSCOPE_SCALE for g in VECTOR.unpack_from(value, 14)]
+
+    @staticmethod
+    def _gyro_batch(samples):
+        return samples[:, 7:10] / GYROSCOPE_SCALE
+
+    @classmethod
+    def _gyro_magnitude(cls, value):
+        return cls._vector_magnitude(*VECTOR.unpack_from(value, 14)),
+
+    @classmethod
+    def _gyro_magnitude_batch(cls, samples):
+        return cls._vector_magnitudes(samples[:, 7:10])
 
     @staticmethod
     def _euler_angle(w, x, y, z):
@@ -90,3 +448,25 @@ class DataHandler:
     @staticmethod
     def _vector_magnitude(x, y, z):
         return math.sqrt(x * x + y * y + z * z)
+
+    @staticmethod
+    def _euler_angles(quaternions):
+        """
+        _euler_angle over an array of quaternions.
+        :param quaternions: float array [N, 4] of w, x, y, z
+        :return: float array [N, 3] of roll, pitch, yaw
+        """
+        w, x, y, z = quaternions.T
+        roll = np.arctan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y))
+        sinp = 2.0 * (w * y - z * x)
+        pitch = np.where(np.abs(sinp) >= 1, np.copysign(math.pi / 2, sinp), np.arcsin(np.clip(sinp, -1, 1)))
+        yaw = np.arctan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+        return np.stack((roll, pitch, yaw), axis=1)
+
+    @staticmethod
+    def _vector_magnitudes(vectors):
+        """
+        :param vectors: float array [N, 3]
+        :return: float array [N] of their magnitudes
+        """
+        return np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
@@ -0,0 +1,106 @@
+import struct
+import threading
+import time
+from collections import deque
+
+
+class FrameRecorder(threading.Thread):
+    """
+    Records every BGAPI frame received, timestamped, to a binary file. The hot path only packs a record and queues it,
+    a background thread writes the queue to disk every flush interval. An existing file is never overwritten.
+
+    File format, little endian:
+    * Header: magic b'MIOBGAPI', format version (uint16), wall clock time of the start in ns since the epoch (uint64)
+    * Records: ns since the start (uint64, monotonic), dongle index (uint8), frame length (uint16), frame bytes
+    """
+    MAGIC = b'MIOBGAPI'
+    VERSION = 1
+    HEADER = struct.Struct('<8sHQ')
+    RECORD = struct.Struct('<QBH')
+
+    def __init__(self, path, flush_interval=0.5):
+        super().__init__(name="FrameRecorder", daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        try:
+            self.file = open(path, 'xb')
+        except FileExistsError:
+            raise FileExistsError("Recording " + str(path) + " already exists, choose another file") from None
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, time.time_ns()))
+        self.started_ns = time.monotonic_ns()
+        self.frames = 0
+        self.written_bytes = self.HEADER.size
+        self._queue = deque()
+        self._stop_event = threading.Event()
+
+    def create_frame_handler(self, dongle):
+        """
+        :param dongle: index of the dongle whose frames are recorded
+        :return: function to set as BGLib.frame_handler
+        """
+        queue = self._queue
+        pack = self.RECORD.pack
+        started_ns = self.started_ns
+
+        def handle_frame(frame):
+            queue.append(pack(time.monotonic_ns() - started_ns, dongle, len(frame)) + frame)
+
+        return handle_frame
+
+    def run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self._flush()
+
+    def close(self):
+        """
+        Stop the background thread, write what is left and close the file.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self._flush()
+        self.file.close()
+
+    def _flush(self):
+        queue = self._queue
+        records = [queue.popleft() for _ in range(len(queue))]
+        if records:
+            data = b''.join(records)
+            self.file.write(data)
+            self.file.flush()
+            self.frames += len(records)
+            self.written_bytes += len(data)
+
+    @staticmethod
+    def read(path):
+        """
+        Read a recording, one record at a time, so recordings of any length can be replayed.
+        :return: (start wall clock time in ns, iterator of (ns since the start, dongle index, frame bytes)). The file is
+        closed once the iterator is exhausted or closed.
+        """
+        f = open(path, 'rb')
+        header = f.read(FrameRecorder.HEADER.size)
+        if len(header) < FrameRecorder.HEADER.size:
+            f.close()
+            raise ValueError("Not a frame recording: " + str(path))
+        magic, version, started_ns = FrameRecorder.HEADER.unpack(header)
+        if magic != FrameRecorder.MAGIC or version != FrameRecorder.VERSION:
+            f.close()
+            raise ValueError("Not a frame recording: " + str(path))
+
+        def records():
+            record_size = FrameRecorder.RECORD.size
+            unpack = FrameRecorder.RECORD.unpack
+            with f:
+                while True:
+                    record = f.read(record_size)
+                    if len(record) < record_size:
+                        return
+                    timestamp, dongle, length = unpack(record)
+                    frame = f.read(length)
+                    if len(frame) < length:
+                        # Cut short, e.g. by a crash while recording
+                        return
+                    yield timestamp, dongle, frame
+
+        return started_ns, records()
@@ -0,0 +1,112 @@
+import time
+from src.public.bglib import BGLib
+from src.data_handler import DataHandler
+from src.frame_recorder import FrameRecorder
+from src.latency_monitor import LatencyMonitor
+
+
+class FrameReplayer:
+    """
+    Replays a recording of FrameRecorder through the same pipeline as a live session: every frame goes through the
+    parser of its dongle (or straight to dispatch), and EMG/IMU data through DataHandler, which sends OSC as it would
+    live. Disconnects reset the EMG rotation of their connection, as MyoDriver does. Frames are paced on their recorded
+    timestamps, scaled by speed, or sent as fast as possible.
+    """
+    def __init__(self, config, path, speed=1.0, dispatch_only=False):
+        """
+        :param path: recording to replay, see FrameRecorder
+        :param speed: pace relative to the recording (2 is twice as fast), 0 or None for as fast as possible
+        :param dispatch_only: hand whole frames to BGLib.parse_packet, skipping the byte parser
+        """
+        self.config = config
+        self.path = path
+        self.speed = speed
+        self.dispatch_only = dispatch_only
+        self.latency = LatencyMonitor() if config.LATENCY_STATS else None
+        self.data_handler = DataHandler(config, self.latency)
+        self.libs = {}
+        self.frames = 0
+        self.late_ns = 0
+
+    def run(self):
+        """
+        Replay the whole recording. Each pass starts anew: the EMG rotation of every connection is forgotten, so the seam
+        between passes isn't a loss, and late_ns only covers this pass.
+        :return: seconds it took
+        """
+        for connection in list(self.data_handler.emg_expected):
+            self.data_handler.reset_emg_sequence(connection)
+        self.late_ns = 0
+        _, records = FrameRecorder.read(self.path)
+        speed = self.speed
+        started = time.monotonic_ns()
+        for timestamp, dongle, frame in records:
+            if speed:
+                delay = started + timestamp / speed - time.monotonic_ns()
+                if delay > 0:
+                    self._sleep(delay / 1e9)
+                else:
+                    self.late_ns = max(self.late_ns, -delay)
+            self._feed(self.libs.get(dongle) or self._create_lib(dongle), frame)
+            self.data_handler.drained()
+            self.frames += 1
+        return (time.monotonic_ns() - started) / 1e9
+
+    def _sleep(self, seconds):
+        """
+        Wait for the next frame, sending the OSC bundles falling due meanwhile, as the live receive wait does.
+        """
+        end = time.monotonic() + seconds
+        while True:
+            left = end - time.monotonic()
+            flush_in = self.data_handler.osc.next_flush_in()
+            if flush_in is None or flush_in >= left:
+                if left > 0:
+                    time.sleep(left)
+                return
+            time.sleep(flush_in)
+            self.data_handler.drained()
+
+    def close(self):
+        """
+        Send pending OSC messages and close what DataHandler writes to, e.g. its SampleStore.
+        """
+        self.data_handler.close()
+
+    def _feed(self, lib, frame):
+        if lib.timestamps:
+            lib.rx_ns = time.monotonic_ns()
+        if self.dispatch_only:
+            if lib.timestamps:
+                lib.frame_ns = lib.rx_ns
+            lib.parse_packet(frame)
+        elif lib.chunked:
+            lib.parse_chunk(frame)
+        else:
+            for byte in frame:
+                lib.parse(bytes([byte]))
+
+    def _create_lib(self, dongle):
+        """
+        :return: BGLib parsing the frames of given dongle, with its connection ids made unique as MyoDriver does.
+        """
+        lib = self.libs[dongle] = BGLib()
+        lib.chunked = self.config.CHUNKED_PARSER
+        offset = dongle * self.config.MAX_CONNECTIONS
+        handle = self.data_handler.handle_attribute_value
+        latency = self.latency
+
+        def handle_attribute_value(connection, atthandle, value):
+            if latency is not None:
+                latency.dispatched(lib.rx_ns, lib.frame_ns)
+            return handle(connection + offset, atthandle, value)
+
+        lib.attribute_value_handler = handle_attribute_value
+
+        def handle_disconnect(_, payload):
+            # A reconnected myo starts a new EMG rotation, not a loss
+            self.data_handler.reset_emg_sequence(payload['connection'] + offset)
+
+        lib.ble_evt_connection_disconnected.add(handle_disconnect)
+        lib.timestamps = latency is not None
+        return lib
@@ -0,0 +1,85 @@
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond latencies over fixed log-linear buckets: values below SUB_BUCKETS are kept exact,
+    and every power of two above is split in HALF linear buckets, so values are kept with a relative error below
+    1 / HALF (12.5%) at a constant cost and size.
+    """
+    SUB_BUCKET_BITS = 4
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    HALF = SUB_BUCKETS >> 1  # Buckets per power of two, from SUB_BUCKETS on
+
+    def __init__(self, max_bits=48):
+        """
+        :param max_bits: values up to 2 ** max_bits ns are kept apart (~3 days at 48), larger ones share the last bucket
+        """
+        self.counts = [0] * self._index((1 << max_bits) - 1, max_bits) + [0]
+        self.max_bits = max_bits
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """
+        Add a latency.
+        :param value: latency in nanoseconds, negative values are taken as 0
+        """
+        value = max(0, value)
+        self.counts[min(self._index(value, self.max_bits), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """
+        :param percent: percentile to get, 0 to 100
+        :return: upper bound of the bucket holding given percentile, in nanoseconds. None if empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(round(self.count * percent / 100)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        :return: dict with count, mean, min, percentiles and max, in milliseconds.
+        """
+        to_ms = (lambda ns: None if ns is None else ns / 1e6)
+        return {
+            'count': self.count,
+            'mean': to_ms(self.total / self.count if self.count else None),
+            'min': to_ms(self.min),
+            'p50': to_ms(self.percentile(50)),
+            'p90': to_ms(self.percentile(90)),
+            'p99': to_ms(self.percentile(99)),
+            'p99.9': to_ms(self.percentile(99.9)),
+            'max': to_ms(self.max)
+        }
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _index(cls, value, max_bits):
+        shift = min(max(0, value.bit_length() - cls.SUB_BUCKET_BITS), max_bits)
+        # value >> shift is in [HALF, SUB_BUCKETS) once shifted, in [0, SUB_BUCKETS) otherwise
+        return shift * cls.HALF + (value >> shift)
+
+    @classmethod
+    def _upper_bound(cls, index):
+        if index < cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.HALF - 1
+        return ((index - shift * cls.HALF + 1) << shift) - 1
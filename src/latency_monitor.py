@@ -0,0 +1,78 @@
+import time
+from src.latency_histogram import LatencyHistogram
+
+
+class LatencyMonitor:
+    """
+    Per-stage latency of EMG/IMU notifications, from the serial read to the OSC send. The stamps of the notification
+    being handled are taken when MyoDriver dispatches it, and turned into latencies once its OSC messages are on the
+    wire, which is when their bundle is sent when bundling (see OscOutput.sent):
+    * read_to_frame: serial read until the frame is complete in the parser
+    * frame_to_dispatch: parser until MyoDriver's handler
+    * dispatch_to_send: handler until the OSC messages are sent, waiting in a bundle included
+    * read_to_send: the whole path
+    """
+    STAGES = ('read_to_frame', 'frame_to_dispatch', 'dispatch_to_send', 'read_to_send')
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.read_ns = 0
+        self.frame_ns = 0
+        self.dispatch_ns = None
+
+    def dispatched(self, read_ns, frame_ns):
+        """
+        Stamp a notification reaching MyoDriver's handler.
+        :param read_ns: time.monotonic_ns() of the serial read it came in, 0 if unknown
+        :param frame_ns: time.monotonic_ns() of its frame completion, 0 if unknown
+        """
+        self.read_ns = read_ns
+        self.frame_ns = frame_ns
+        self.dispatch_ns = time.monotonic_ns()
+
+    def take(self):
+        """
+        Take the stamps of the notification being handled, to be given to sent() once it's sent, e.g. after the rest of
+        its batch arrived.
+        :return: (read_ns, frame_ns, dispatch_ns)
+        """
+        stamps = (self.read_ns, self.frame_ns, self.dispatch_ns)
+        self.dispatch_ns = None
+        return stamps
+
+    def sent(self, stamps=None):
+        """
+        Stamp a notification as sent, and record its latencies.
+        :param stamps: stamps of the notification from take(), the notification being handled if None
+        """
+        if stamps is None:
+            stamps = self.take()
+        read_ns, frame_ns, dispatch_ns = stamps
+        if dispatch_ns is None:
+            return
+        now = time.monotonic_ns()
+        histograms = self.histograms
+        histograms['dispatch_to_send'].record(now - dispatch_ns)
+        if frame_ns:
+            histograms['frame_to_dispatch'].record(dispatch_ns - frame_ns)
+        if read_ns:
+            histograms['read_to_send'].record(now - read_ns)
+            if frame_ns:
+                histograms['read_to_frame'].record(frame_ns - read_ns)
+
+    def report(self):
+        """
+        :return: dict with the summary of every stage, in milliseconds.
+        """
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    def print_report(self):
+        print("%-18s %7s %7s %7s %7s %7s %7s" % ("Latency (ms)", "count", "p50", "p90", "p99", "p99.9", "max"))
+        for stage, summary in self.report().items():
+            if summary['count']:
+                print("%-18s %7d %7.3f %7.3f %7.3f %7.3f %7.3f" %
+                      (stage, summary['count'], summary['p50'], summary['p90'], summary['p99'], summary['p99.9'],
+                       summary['max']))
+            else:
+                print("%-18s %7d" % (stage, 0))
+        print()
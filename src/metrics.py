@@ -0,0 +1,109 @@
+import time
+
+
+class Metrics:
+    """
+    Runtime counters of a MyoDriver, cheap enough to always be kept: per connection EMG/IMU packets and OSC messages
+    sent, counted by DataHandler, and per dongle the parser counters of BGLib. Packet rates are updated by tick().
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.connections = {}
+        self.started = time.monotonic()
+        self.rates = {}
+        self._last_tick = None
+
+    def emg(self, connection, osc_messages):
+        """
+        Count an EMG packet of given connection, and the OSC messages sent for it.
+        """
+        counters = self.connections.get(connection) or self._add_connection(connection)
+        counters.emg += 1
+        counters.osc += osc_messages
+        counters.last_sample_ns = time.monotonic_ns()
+
+    def emg_loss(self, connection, lost):
+        """
+        Count EMG notifications of given connection detected as lost.
+        """
+        counters = self.connections.get(connection) or self._add_connection(connection)
+        counters.emg_lost += lost
+
+    def imu(self, connection, osc_messages):
+        """
+        Count an IMU packet of given connection, and the OSC messages sent for it.
+        """
+        counters = self.connections.get(connection) or self._add_connection(connection)
+        counters.imu += 1
+        counters.osc += osc_messages
+        counters.last_sample_ns = time.monotonic_ns()
+
+    def tick(self):
+        """
+        Update the packet rates with the packets counted since the previous tick.
+        """
+        now = time.monotonic()
+        counts = {connection: (c.emg, c.imu, c.osc) for connection, c in list(self.connections.items())}
+        if self._last_tick is not None and now > self._last_tick[0]:
+            last_time, last_counts = self._last_tick
+            rates = {}
+            for connection, count in counts.items():
+                last = last_counts.get(connection, (0, 0, 0))
+                rates[connection] = tuple((n - m) / (now - last_time) for n, m in zip(count, last))
+            self.rates = rates
+        self._last_tick = (now, counts)
+
+    def snapshot(self):
+        """
+        :return: dict with the counters of every connection and dongle.
+        """
+        now_ns = time.monotonic_ns()
+        myos = {m.global_id(): m for m in list(self.driver.myos) if m.connection_id is not None}
+        connections = {}
+        for connection, c in sorted(list(self.connections.items())):
+            emg_rate, imu_rate, osc_rate = self.rates.get(connection, (0, 0, 0))
+            myo = myos.get(connection)
+            connections[str(connection)] = {
+                'address': myo.address.hex() if myo else None,
+                'state': myo.state if myo else None,
+                'emg_packets': c.emg,
+                'imu_packets': c.imu,
+                'emg_per_second': emg_rate,
+                'emg_lost': c.emg_lost,
+                'imu_per_second': imu_rate,
+                'osc_messages': c.osc,
+                'osc_per_second': osc_rate,
+                'seconds_since_last_sample': (now_ns - c.last_sample_ns) / 1e9,
+                'reconnects': len(myo.reconnect_latencies) if myo else None
+            }
+        dongles = []
+        for bluetooth in self.driver.bluetooths:
+            dongles.append({
+                'port': bluetooth.serial.port,
+                'bytes_read': bluetooth.lib.rx_bytes,
+                'discarded_bytes': bluetooth.lib.discarded_bytes,
+                'bad_frames': bluetooth.lib.bad_frames,
+                'reader': bluetooth.reader_stats()
+            })
+        return {
+            'uptime': time.monotonic() - self.started,
+            'connections': connections,
+            'dongles': dongles,
+            'osc_datagrams': self.driver.data_handler.osc.datagrams,
+            'latency': self.driver.latency.report() if self.driver.latency is not None else None
+        }
+
+    def _add_connection(self, connection):
+        counters = self.connections[connection] = _ConnectionCounters()
+        return counters
+
+
+class _ConnectionCounters:
+    __slots__ = ('emg', 'emg_lost', 'imu', 'osc', 'last_sample_ns')
+
+    def __init__(self):
+        self.emg = 0
+        self.emg_lost = 0
+        self.imu = 0
+        self.osc = 0
+        self.last_sample_ns = 0
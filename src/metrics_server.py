@@ -0,0 +1,50 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsServer(threading.Thread):
+    """
+    Serves a Metrics snapshot as JSON over local HTTP (GET /metrics), and ticks its packet rates every second.
+    """
+    def __init__(self, metrics, port, address='127.0.0.1', tick_interval=1):
+        super().__init__(name="MetricsServer", daemon=True)
+        self.metrics = metrics
+        self.tick_interval = tick_interval
+        self.server = ThreadingHTTPServer((address, port), self._create_request_handler())
+        self.server.daemon_threads = True
+        self._stop_event = threading.Event()
+        self._server_thread = threading.Thread(target=self.server.serve_forever, name="MetricsHTTP", daemon=True)
+
+    def run(self):
+        self._server_thread.start()
+        while not self._stop_event.wait(self.tick_interval):
+            self.metrics.tick()
+
+    def stop(self):
+        """
+        Stop serving and ticking.
+        """
+        self._stop_event.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create_request_handler(self):
+        metrics = self.metrics
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot(), indent=2).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return MetricsRequestHandler
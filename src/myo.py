@@ -1,5 +1,7 @@
 from src.public.myohw import *
+from collections import deque
 import struct
+import time
 
 
 class Myo:
@@ -7,13 +9,27 @@ class Myo:
     Wrapper for a Myo, its name, address, firmware and most importantly, connection id.
     """
 
+    # Connection states, advanced by MyoDriver
+    DISCOVERED = 'discovered'  # Found by a scan, awaiting its turn to connect
+    CONNECTING = 'connecting'  # Direct connection requested, awaiting connection status
+    CONFIGURING = 'configuring'  # Connected, setup writes in progress
+    STREAMING = 'streaming'  # Set up, sending EMG/IMU
+
     def __init__(self, address):
         self.address = address
+        self.bluetooth = None
+        self.connection_offset = 0
         self.connection_id = None
         self.device_name = None
         self.firmware_version = None
         self.battery_level = None
         self.connected = False
+        self.state = Myo.DISCOVERED
+        self.state_since = time.monotonic()
+        self.setup_writes = deque()
+        self.retries = 0
+        self.disconnected_at = None
+        self.reconnect_latencies = []  # Seconds from each unexpected disconnect until streaming again
 
     def set_id(self, connection_id):
         """
@@ -22,9 +38,33 @@ class Myo:
         self.connection_id = connection_id
         return self
 
+    def set_bluetooth(self, bluetooth, connection_offset):
+        """
+        Set the dongle this myo connects through.
+        :param connection_offset: added to the connection id to keep it unique across dongles
+        """
+        self.bluetooth = bluetooth
+        self.connection_offset = connection_offset
+        return self
+
     def set_connected(self, connected):
         self.connected = connected
 
+    def set_state(self, state):
+        """
+        Move to given connection state, timestamping the transition.
+        """
+        self.state = state
+        self.state_since = time.monotonic()
+
+    def global_id(self):
+        """
+        :return: connection id made unique across dongles, as used to identify EMG/IMU data.
+        """
+        if self.connection_id is None:
+            return None
+        return self.connection_offset + self.connection_id
+
     def handle_attribute_value(self, payload):
         """
         When attribute values are not EMG/IMU related, are a Myo attribute being read.
@@ -0,0 +1,301 @@
+import itertools
+import math
+import os
+import random
+import struct
+import threading
+import time
+import tty
+from src.public.myohw import *
+
+
+class MyoSimulator(threading.Thread):
+    """
+    Stand-in for a BLED112 dongle and the Myos around it, on a pseudo-terminal pair. Answers the BGAPI commands used by
+    Bluetooth (scan, direct connection, disconnection, attribute reads/writes) and streams EMG/IMU notifications from
+    every virtual Myo that has been set up, at the given rates. Connect to it with Bluetooth(config, simulator.port).
+    Needs pty support (Linux or OS X).
+    """
+    EMG_HANDLES = (ServiceHandles.EmgData0Characteristic,
+                   ServiceHandles.EmgData1Characteristic,
+                   ServiceHandles.EmgData2Characteristic,
+                   ServiceHandles.EmgData3Characteristic)
+    FIRMWARE_VERSION = b'\x01\x00\x05\x00\xb2\x07\x02\x00'
+    SCAN_INTERVAL = 0.05  # Seconds between advertisements of every free Myo while scanning
+    _serial_numbers = itertools.count()  # Keeps addresses unique across simulators
+
+    # BGAPI error codes
+    WRONG_STATE = 0x0181
+    NOT_CONNECTED = 0x0186
+    TIMEOUT = 0x0208
+    LOCAL_HOST = 0x0216
+
+    def __init__(self, myo_amount=1, emg_rate=200, imu_rate=50, max_connections=3, seed=0, emg_loss=0):
+        """
+        :param myo_amount: amount of virtual Myos
+        :param emg_rate: EMG samples per second of each Myo, two per notification
+        :param imu_rate: IMU samples per second of each Myo
+        :param max_connections: connections supported by the simulated dongle
+        :param seed: seed for the generated signals
+        :param emg_loss: probability of an EMG notification getting lost on air
+        """
+        super().__init__(name="MyoSimulator", daemon=True)
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.emg_period = 2 / emg_rate if emg_rate else None
+        self.imu_period = 1 / imu_rate if imu_rate else None
+        self.max_connections = max_connections
+        self.emg_loss = emg_loss
+        self.random = random.Random(seed)
+        self.myos = []
+        for _ in range(myo_amount):
+            serial_number = next(MyoSimulator._serial_numbers)
+            address = struct.pack('<H', serial_number) + b'\x42\x00\x4d\xe0'
+            self.myos.append(_VirtualMyo(address, "Myo " + str(serial_number + 1), self.random.random() * 2 * math.pi))
+        self.connections = {}
+        self.scanning = False
+        self.started = time.monotonic()
+        self.sent_bytes = 0
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._streamer = threading.Thread(target=self._stream, name="MyoSimulatorStream", daemon=True)
+
+    def start(self):
+        super().start()
+        self._streamer.start()
+
+    def stop(self):
+        """
+        Stop answering and streaming, and close the pseudo-terminal.
+        """
+        self._stop_event.set()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def drop_connection(self, index, reason=TIMEOUT):
+        """
+        Disconnect a virtual Myo as if it went out of range.
+        :param index: index of the virtual Myo
+        :param reason: BGAPI reason sent along the disconnection event
+        """
+        self._disconnect(self.myos[index], reason)
+
+##############################################################################
+#                                  COMMANDS                                  #
+##############################################################################
+
+    def run(self):
+        buffer = bytearray()
+        while not self._stop_event.is_set():
+            try:
+                buffer += os.read(self.master, 4096)
+            except OSError:
+                return
+            while len(buffer) >= 4:
+                length = 4 + buffer[1] + ((buffer[0] & 0x07) << 8)
+                if len(buffer) < length:
+                    break
+                self._handle_command(buffer[2], buffer[3], bytes(buffer[4:length]))
+                del buffer[:length]
+
+    def _handle_command(self, command_class, command, payload):
+        key = (command_class, command)
+        if key == (0, 0):  # system_reset
+            self._send(0x80, 0, 0, struct.pack('<HHHHHBB', 1, 3, 1, 0, 3, 1, 1))
+        elif key == (6, 2):  # gap_discover
+            self.scanning = True
+            self._send(0x00, 6, 2, struct.pack('<H', 0))
+            self._advertise()
+        elif key == (6, 4):  # gap_end_procedure
+            self.scanning = False
+            self._send(0x00, 6, 4, struct.pack('<H', 0))
+        elif key == (6, 3):  # gap_connect_direct
+            self._connect(payload[:6])
+        elif key == (3, 0):  # connection_disconnect
+            myo = self.connections.get(payload[0])
+            self._send(0x00, 3, 0, struct.pack('<BH', payload[0], 0 if myo else self.NOT_CONNECTED))
+            if myo is not None:
+                self._disconnect(myo, self.LOCAL_HOST)
+        elif key == (4, 5):  # attclient_attribute_write
+            connection, atthandle, length = struct.unpack_from('<BHB', payload)
+            myo = self.connections.get(connection)
+            self._send(0x00, 4, 5, struct.pack('<BH', connection, 0 if myo else self.NOT_CONNECTED))
+            if myo is not None:
+                self._send(0x80, 4, 1, struct.pack('<BHH', connection, 0, atthandle))
+                self._write(myo, atthandle, payload[4:4 + length])
+        elif key == (4, 4):  # attclient_read_by_handle
+            connection, atthandle = struct.unpack_from('<BH', payload)
+            myo = self.connections.get(connection)
+            self._send(0x00, 4, 4, struct.pack('<BH', connection, 0 if myo else self.NOT_CONNECTED))
+            if myo is not None:
+                value = self._read(myo, atthandle)
+                self._send(0x80, 4, 5, struct.pack('<BHBB', connection, atthandle, 0, len(value)) + value)
+        else:
+            # Not simulated, answer with a plain success result
+            self._send(0x00, command_class, command, struct.pack('<H', 0))
+
+    def _connect(self, address):
+        free = [c for c in range(self.max_connections) if c not in self.connections]
+        if self.scanning or not free:
+            self._send(0x00, 6, 3, struct.pack('<HB', self.WRONG_STATE, 0))
+            return
+        self._send(0x00, 6, 3, struct.pack('<HB', 0, free[0]))
+        for myo in self.myos:
+            if myo.address == address and myo.connection is None and not myo.asleep:
+                myo.connection = free[0]
+                self.connections[free[0]] = myo
+                self._send(0x80, 3, 0, struct.pack('<BB6sBHHHB', free[0], 5, address, 0, 6, 64, 0, 255))
+        # Unknown or sleeping address: the connection attempt never completes, as with a real dongle
+
+    def _disconnect(self, myo, reason):
+        if myo.connection is None:
+            return
+        connection = myo.connection
+        del self.connections[connection]
+        myo.reset()
+        self._send(0x80, 3, 4, struct.pack('<BH', connection, reason))
+
+    def _write(self, myo, atthandle, value):
+        if atthandle == ServiceHandles.CommandCharacteristic and value:
+            if value[0] == MyoCommand.myohw_command_set_mode and len(value) >= 4:
+                myo.emg_mode, myo.imu_mode = value[2], value[3]
+            elif value[0] == MyoCommand.myohw_command_deep_sleep:
+                myo.asleep = True
+                self._disconnect(myo, self.TIMEOUT)
+        elif atthandle - 1 in self.EMG_HANDLES + (ServiceHandles.IMUDataCharacteristic,):
+            if value[:1] == b'\x01':
+                myo.subscribed.add(atthandle - 1)
+            else:
+                myo.subscribed.discard(atthandle - 1)
+
+    def _read(self, myo, atthandle):
+        if atthandle == ServiceHandles.DeviceName:
+            return myo.name.encode()
+        if atthandle == ServiceHandles.FirmwareVersionCharacteristic:
+            return self.FIRMWARE_VERSION
+        if atthandle == ServiceHandles.BatteryCharacteristic:
+            return bytes([myo.battery_level])
+        return b''
+
+##############################################################################
+#                                   STREAM                                   #
+##############################################################################
+
+    def _stream(self):
+        """
+        Emit every notification and advertisement that is due, then sleep until the next one.
+        """
+        next_emg = next_imu = next_scan = time.monotonic()
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            frames = bytearray()
+            while self.emg_period and next_emg <= now:
+                for myo in list(self.connections.values()):
+                    frames += self._emg_frame(myo, next_emg)
+                next_emg += self.emg_period
+            while self.imu_period and next_imu <= now:
+                for myo in list(self.connections.values()):
+                    frames += self._imu_frame(myo, next_imu)
+                next_imu += self.imu_period
+            if next_scan <= now:
+                if self.scanning:
+                    self._advertise()
+                next_scan = now + self.SCAN_INTERVAL
+            if frames:
+                self._write_all(frames)
+            wake = min(t for t in (next_emg if self.emg_period else None,
+                                   next_imu if self.imu_period else None,
+                                   next_scan) if t is not None)
+            self._stop_event.wait(max(0.0, wake - time.monotonic()))
+
+    def _emg_frame(self, myo, t):
+        """
+        Next EMG notification, two samples of eight channels: noise modulated by a slow contraction envelope.
+        """
+        atthandle = self.EMG_HANDLES[myo.emg_index]
+        myo.emg_index = (myo.emg_index + 1) % len(self.EMG_HANDLES)
+        if not myo.emg_mode or atthandle not in myo.subscribed:
+            return b''
+        if self.emg_loss and self.random.random() < self.emg_loss:
+            return b''
+        envelope = 4 + 60 * max(0.0, math.sin(0.5 * math.pi * (t - self.started) + myo.phase))
+        samples = [max(-128, min(127, int(self.random.gauss(0, envelope * (1 + channel % 3) / 3))))
+                   for _ in range(2) for channel in range(8)]
+        return self._frame(0x80, 4, 5, struct.pack('<BHBB16b', myo.connection, atthandle, 1, 16, *samples))
+
+    def _imu_frame(self, myo, t):
+        """
+        Next IMU notification: the armband slowly turning around the vertical axis, with gravity on the accelerometer.
+        """
+        atthandle = ServiceHandles.IMUDataCharacteristic
+        if myo.imu_mode not in (ImuMode.myohw_imu_mode_send_data,
+                                ImuMode.myohw_imu_mode_send_all,
+                                ImuMode.myohw_imu_mode_send_raw) or atthandle not in myo.subscribed:
+            return b''
+        angle = 0.5 * (t - self.started) + myo.phase
+        noise = self.random.gauss
+        data = struct.pack('<10h',
+                           # Orientation quaternion w, x, y, z (16384 = 1)
+                           int(16384 * math.cos(angle / 2)), 0, 0, int(16384 * math.sin(angle / 2)),
+                           # Accelerometer x, y, z (2048 = 1 g)
+                           int(noise(0, 20)), int(noise(0, 20)), int(2048 + noise(0, 20)),
+                           # Gyroscope x, y, z (16 = 1 deg/s)
+                           int(noise(0, 8)), int(noise(0, 8)), int(16 * math.degrees(0.5) + noise(0, 8)))
+        return self._frame(0x80, 4, 5, struct.pack('<BHBB', myo.connection, atthandle, 1, len(data)) + data)
+
+    def _advertise(self):
+        data = bytes([0x02, 0x01, 0x06, 0x11, 0x07]) + bytes(Final.myo_id)
+        for myo in self.myos:
+            if myo.connection is None and not myo.asleep:
+                self._send(0x80, 6, 0, struct.pack('<bB6sBBB', -60, 0, myo.address, 0, 255, len(data)) + data)
+
+##############################################################################
+#                                   UTILS                                    #
+##############################################################################
+
+    @staticmethod
+    def _frame(message_type, message_class, command, payload):
+        return bytes([message_type | (len(payload) >> 8), len(payload) & 0xFF, message_class, command]) + payload
+
+    def _send(self, message_type, message_class, command, payload):
+        self._write_all(self._frame(message_type, message_class, command, payload))
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        with self._write_lock:
+            while view:
+                try:
+                    written = os.write(self.master, view)
+                except OSError:
+                    return
+                view = view[written:]
+            self.sent_bytes += len(data)
+
+
+class _VirtualMyo:
+    """
+    State of a simulated armband.
+    """
+    def __init__(self, address, name, phase):
+        self.address = address
+        self.name = name
+        self.phase = phase
+        self.battery_level = 80
+        self.asleep = False
+        self.connection = None
+        self.emg_mode = EmgMode.myohw_emg_mode_none
+        self.imu_mode = ImuMode.myohw_imu_mode_none
+        self.subscribed = set()
+        self.emg_index = 0
+
+    def reset(self):
+        """
+        Back to the state of an armband that isn't connected.
+        """
+        self.connection = None
+        self.emg_mode = EmgMode.myohw_emg_mode_none
+        self.imu_mode = ImuMode.myohw_imu_mode_none
+        self.subscribed.clear()
+        self.emg_index = 0
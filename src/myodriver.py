@@ -1,9 +1,29 @@
 import sys
+import threading
 import time
 from src.public.myohw import *
 from src.myo import Myo
 from src.bluetooth import Bluetooth
 from src.data_handler import DataHandler
+from src.frame_recorder import FrameRecorder
+from src.latency_monitor import LatencyMonitor
+from src.metrics import Metrics
+from src.metrics_server import MetricsServer
+
+EMG_HANDLES = frozenset((
+    ServiceHandles.EmgData0Characteristic,
+    ServiceHandles.EmgData1Characteristic,
+    ServiceHandles.EmgData2Characteristic,
+    ServiceHandles.EmgData3Characteristic
+))
+IMU_HANDLES = frozenset((
+    ServiceHandles.IMUDataCharacteristic,
+))
+MYO_INFO_HANDLES = frozenset((
+    ServiceHandles.DeviceName,
+    ServiceHandles.FirmwareVersionCharacteristic,
+    ServiceHandles.BatteryCharacteristic
+))
 
 
 class MyoDriver:
@@ -12,136 +32,277 @@ class MyoDriver:
     """
     def __init__(self, config):
         self.config = config
-        print("OSC Address: " + str(self.config.OSC_ADDRESS))
-        print("OSC Port: " + str(self.config.OSC_PORT))
+        if self.config.OSC_DESTINATIONS:
+            for address, port, channels in DataHandler.osc_destinations(self.config):
+                print("OSC Destination: " + str(address) + ":" + str(port) +
+                      (" (" + ", ".join(sorted(channels)) + ")" if channels is not None else ""))
+        else:
+            print("OSC Address: " + str(self.config.OSC_ADDRESS))
+            print("OSC Port: " + str(self.config.OSC_PORT))
         print()
 
-        self.data_handler = DataHandler(self.config)
-        self.bluetooth = Bluetooth(self.config.MESSAGE_DELAY)
+        self.latency = LatencyMonitor() if self.config.LATENCY_STATS else None
+        self.metrics = Metrics(self)
+        self.data_handler = DataHandler(self.config, self.latency, self.metrics)
+        self.reader_condition = None
+        self.bluetooths = self._create_bluetooths()
+        self.recorder = self._create_recorder()
+        self.metrics_server = self._create_metrics_server()
 
         self.myos = []
 
-        self.myo_to_connect = None
-        self.scanning = False
+        # Dongles with a scan in progress
+        self.scanning = set()
 
         # Add handlers for expected events
         self.set_handlers()
 
     def run(self):
         """
-        Main. Disconnects possible connections and starts as many connections as needed.
+        Main. Disconnects possible connections and starts as many connections as needed. Armbands are scanned,
+        connected and set up concurrently, as far as each dongle allows.
         """
         self.disconnect_all()
-        while len(self.myos) < self.config.MYO_AMOUNT:
-            print(
-                "*** Connecting myo " + str(len(self.myos) + 1) + " out of " + str(self.config.MYO_AMOUNT) + " ***")
-            print()
-            self.add_myo_connection()
-        self.receive()
+        if self.config.MYO_AMOUNT > len(self.bluetooths) * self.config.MAX_CONNECTIONS:
+            print("WARNING: " + str(len(self.bluetooths)) + " dongle(s) can't connect " + str(self.config.MYO_AMOUNT) +
+                  " myos.")
+        started = time.monotonic()
+        while not self._all_streaming():
+            self.receive()
+            self.advance_connections()
+        self._print_startup_time(started)
 
     def receive(self):
-        self.bluetooth.receive()
+        """
+        Handle received events. With several dongles, wait for any of their reader threads. DataHandler is told once
+        everything read was handled, to decode its batch and send its OSC bundle.
+        """
+        timeout = self._receive_timeout()
+        if self.reader_condition is None:
+            self.bluetooths[0].receive(timeout)
+        else:
+            with self.reader_condition:
+                if not any(b.reader.ring_buffer.size for b in self.bluetooths):
+                    self.reader_condition.wait(timeout or 0)
+            for bluetooth in self.bluetooths:
+                bluetooth.drain()
+        self.data_handler.drained()
+
+    def _receive_timeout(self):
+        """
+        :return: max seconds to wait for data: RECEIVE_TIMEOUT, cut short when an OSC bundle is due sooner.
+        """
+        timeout = self.config.RECEIVE_TIMEOUT
+        flush_in = self.data_handler.osc.next_flush_in()
+        if timeout is None or flush_in is None:
+            return timeout
+        return min(timeout, flush_in)
 
+    def _create_bluetooths(self):
+        """
+        Open every dongle configured or found, up to one per expected myo. Each dongle gets its own serial reader
+        thread when there are several of them.
+        """
+        ports = (self.config.SERIAL_PORTS or Bluetooth.detect_ports())[:self.config.MYO_AMOUNT] or [None]
+        if len(ports) > 1:
+            self.reader_condition = threading.Condition()
+        return [self._create_bluetooth(port) for port in ports]
 
-##############################################################################
-#                                  CONNECT                                   #
-##############################################################################
+    def _create_bluetooth(self, port):
+        bluetooth = Bluetooth(self.config, port, self.reader_condition)
+        bluetooth.receive_handler = self.receive
+        return bluetooth
 
-    def add_myo_connection(self):
+    def _create_recorder(self):
         """
-        Procedure for connection with the Myo Armband. Scans, connects, disables sleep and starts EMG stream.
+        :return: started FrameRecorder receiving the frames of every dongle if RECORD_FILE is set, None otherwise.
         """
-        # Discover
-        self._print_status("Scanning")
-        self.bluetooth.gap_discover()
+        if self.config.RECORD_FILE is None:
+            return None
+        recorder = FrameRecorder(self.config.RECORD_FILE)
+        for index, bluetooth in enumerate(self.bluetooths):
+            bluetooth.lib.frame_handler = recorder.create_frame_handler(index)
+        recorder.start()
+        print("Recording to " + str(self.config.RECORD_FILE))
+        print()
+        return recorder
 
-        # Await myo detection and create Myo object.
-        self.scanning = True
-        while self.myo_to_connect is None:
-            self.bluetooth.receive()
+    def close(self):
+        """
+        Stop recording, storing samples and serving metrics, and close every dongle.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            print("Recorded " + str(self.recorder.frames) + " frames to " + str(self.recorder.path))
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.data_handler.close()
+        for bluetooth in self.bluetooths:
+            bluetooth.close()
+
+    def _create_metrics_server(self):
+        """
+        :return: started MetricsServer if METRICS_PORT is set, None otherwise.
+        """
+        if self.config.METRICS_PORT is None:
+            return None
+        server = MetricsServer(self.metrics, self.config.METRICS_PORT)
+        server.start()
+        print("Metrics: http://localhost:" + str(self.config.METRICS_PORT) + "/metrics")
+        print()
+        return server
 
-        # End gap
-        self.bluetooth.end_gap()
+    def _connection_offset(self, bluetooth):
+        """
+        :return: offset making the connection ids of given dongle unique across dongles.
+        """
+        return self.bluetooths.index(bluetooth) * self.config.MAX_CONNECTIONS
 
-        # Add handlers
-        self.bluetooth.add_connection_status_handler(self.create_connection_status_handle(self.myo_to_connect))
-        self.bluetooth.add_disconnected_handler(self.create_disconnect_handle(self.myo_to_connect))
+    def _least_loaded_bluetooth(self):
+        """
+        :return: dongle with the fewest myos assigned.
+        """
+        return min(self.bluetooths, key=lambda b: sum(1 for m in self.myos if m.bluetooth is b))
 
-        # Direct connection. Reconnect implements the retry procedure.
-        self.myos.append(self.myo_to_connect)
-        self.connect_and_retry(self.myo_to_connect, self.config.RETRY_CONNECTION_AFTER, self.config.MAX_RETRIES)
-        self.myo_to_connect = None
 
-    def connect_and_retry(self, myo, timeout=None, max_retries=None):
+##############################################################################
+#                                  CONNECT                                   #
+##############################################################################
+
+    def advance_connections(self):
+        """
+        Move every connection procedure one step forward, without waiting. Each dongle runs one GAP procedure (scan or
+        direct connection) at a time, while myos already connected are set up alongside.
         """
-        Procedure for a reconnection.
-        :param myo: Myo object to connect. Should have its address set
-        :param timeout: Time to wait for response
-        :param max_retries: Max retries before exiting the program
-        :return: True if connection was successful, false otherwise.
+        for bluetooth in self.bluetooths:
+            if bluetooth.ready():
+                self._advance_gap(bluetooth)
+        for myo in self.myos:
+            if myo.state == Myo.CONFIGURING:
+                self._advance_setup(myo)
+
+    def _advance_gap(self, bluetooth):
         """
-        retries = 0
-        # The subroutine will await the response until timeout is met
-        while not self.direct_connect(myo, timeout) and not myo.connected:
-            retries += 1
-            if max_retries is not None and retries > max_retries:
-                print("Max retries reached. Exiting")
-                sys.exit(1)
+        Scan for myos while more are expected, and connect to the ones found, one at a time.
+        """
+        myos = [m for m in self.myos if m.bluetooth is bluetooth]
+
+        # A myo was found (or every expected one was), stop scanning so it can connect
+        if bluetooth in self.scanning:
+            if len(self.myos) >= self.config.MYO_AMOUNT or any(m.state == Myo.DISCOVERED for m in myos):
+                bluetooth.end_gap()
+                self.scanning.discard(bluetooth)
+            return
+
+        # Await connection status, retry after timeout
+        for myo in myos:
+            if myo.state == Myo.CONNECTING:
+                timeout = self.config.RETRY_CONNECTION_AFTER
+                if timeout is not None and time.monotonic() > myo.state_since + timeout:
+                    self._retry_connection(myo)
+                return
+
+        # Connect the next myo found
+        for myo in myos:
+            if myo.state == Myo.DISCOVERED:
+                self._print_status("Connecting to", myo.address)
+                bluetooth.direct_connect(myo.address)
+                myo.set_state(Myo.CONNECTING)
+                return
+
+        # Scan if more myos are expected than the dongles already scanning can find
+        if len(self.myos) + len(self.scanning) < self.config.MYO_AMOUNT and \
+                len(myos) < self.config.MAX_CONNECTIONS:
+            print("*** Scanning for myo " + str(len(self.myos) + len(self.scanning) + 1) + " out of " +
+                  str(self.config.MYO_AMOUNT) + " ***")
             print()
-            print("Reconnection failed for connection " + str(myo.connection_id) + ". Retry " + str(retries) + "...")
-        myo.set_connected(True)
-        return True
+            bluetooth.gap_discover()
+            self.scanning.add(bluetooth)
 
-    def direct_connect(self, myo_to_connect, timeout=None):
+    def _retry_connection(self, myo):
         """
-        Procedure for a direct connection with the device.
-        :param myo_to_connect: Myo object to connect. Should have its address set
-        :param timeout: Time to wait for response
-        :return: True if connection was successful, false otherwise.
+        Cancel a direct connection that timed out, so it's requested again.
         """
-        t0 = time.time()
-        # Direct connection
-        self._print_status("Connecting to", myo_to_connect.address)
-        self.bluetooth.direct_connect(myo_to_connect.address)
-
-        # Await response
-        while myo_to_connect.connection_id is None or not myo_to_connect.connected:
-            if timeout is not None and timeout + t0 < time.time():
-                return False
-            self.receive()
-
-        # Notify successful connection with self.print_status and vibration
-        self._print_status("Connection successful. Setting up...")
-        self._print_status()
-        self.bluetooth.send_vibration_medium(myo_to_connect.connection_id)
+        myo.retries += 1
+        if self.config.MAX_RETRIES is not None and myo.retries > self.config.MAX_RETRIES:
+            print("Max retries reached. Exiting")
+            sys.exit(1)
+        print()
+        print("Connection to " + str(myo.address) + " failed after %.2f s. " % (time.monotonic() - myo.state_since) +
+              "Retry " + str(myo.retries) + "...")
+        myo.bluetooth.end_gap()
+        myo.set_state(Myo.DISCOVERED)
 
-        # Disable sleep
-        self.bluetooth.disable_sleep(myo_to_connect.connection_id)
+    def _advance_setup(self, myo):
+        """
+        Send the next setup write of a connected myo, once the previous one has completed.
+        """
+        if not myo.bluetooth.ready(myo.connection_id):
+            return
+        if myo.setup_writes:
+            atthandle, data = myo.setup_writes.popleft()
+            myo.bluetooth.write_att(myo.connection_id, atthandle, data)
+            return
+        self._set_streaming(myo)
+
+    def _set_streaming(self, myo):
+        """
+        Mark a myo as set up and streaming, recording the latency of its reconnection if it was one.
+        """
+        myo.set_state(Myo.STREAMING)
+        myo.retries = 0
+        print("Myo ready", myo.global_id(), myo.address)
+        if myo.disconnected_at is not None:
+            myo.reconnect_latencies.append(myo.state_since - myo.disconnected_at)
+            myo.disconnected_at = None
+            print("Reconnected after %.2f s" % myo.reconnect_latencies[-1])
+        print()
 
-        # Enable data and subscribe
-        self.bluetooth.enable_data(myo_to_connect.connection_id, self.config)
+    def _all_streaming(self):
+        """
+        :return: True if every expected myo is set up and streaming, False otherwise.
+        """
+        return len(self.myos) >= self.config.MYO_AMOUNT and all(m.state == Myo.STREAMING for m in self.myos)
 
-        print("Myo ready", myo_to_connect.connection_id, myo_to_connect.address)
+    def _print_startup_time(self, started):
+        """
+        Report the time it took from the first scan until every myo was streaming.
+        """
+        print("All " + str(len(self.myos)) + " myos streaming after %.2f s" % (time.monotonic() - started))
         print()
-        return True
 
 
 ##############################################################################
 #                                  HANDLERS                                  #
 ##############################################################################
 
-    def handle_discover(self, _, payload):
+    def create_discover_handle(self, bluetooth):
+        def handle_discover(_, payload):
+            """
+            Handler for ble_evt_gap_scan_response event. Takes at most one new myo per scan, the scan is ended by
+            advance_connections.
+            """
+            if bluetooth not in self.scanning or len(self.myos) >= self.config.MYO_AMOUNT:
+                return
+            if any(m.bluetooth is bluetooth and m.state == Myo.DISCOVERED for m in self.myos):
+                return
+            self._print_status("Device found", payload['sender'])
+            if self._is_new_myo(payload):
+                myo = Myo(payload['sender']).set_bluetooth(bluetooth, self._connection_offset(bluetooth))
+                self._print_status("Myo found", myo.address)
+                self._print_status()
+                bluetooth.add_connection_status_handler(self.create_connection_status_handle(myo))
+                bluetooth.add_disconnected_handler(self.create_disconnect_handle(myo))
+                self.myos.append(myo)
+
+        return handle_discover
+
+    def _is_new_myo(self, payload):
         """
-        Handler for ble_evt_gap_scan_response event.
+        :param payload: ble_evt_gap_scan_response payload
+        :return: True if the scanned device is a Myo that hasn't been paired yet, False otherwise.
         """
-        if self.scanning and not self.myo_to_connect:
-            self._print_status("Device found", payload['sender'])
-            if payload['data'].endswith(bytes(Final.myo_id)):
-                if not self._has_paired_with(payload['sender']):
-                    self.myo_to_connect = Myo(payload['sender'])
-                    self._print_status("Myo found", self.myo_to_connect.address)
-                    self._print_status()
-                    self.scanning = False
+        return payload['data'].endswith(bytes(Final.myo_id)) and not self._has_paired_with(payload['sender'])
 
     def _has_paired_with(self, address):
         """
@@ -171,9 +332,11 @@ class MyoDriver:
             """
             Handler for ble_evt_connection_status event.
             """
-            if myo.connection_id == payload['connection']:
+            if myo.connected and myo.connection_id == payload['connection']:
                 print("Connection " + str(payload['connection']) + " lost.")
                 myo.set_connected(False)
+                myo.disconnected_at = time.monotonic()
+                self.data_handler.reset_emg_sequence(myo.global_id())
                 if payload['reason'] == 574:
                     print("Disconnected. Reason: Connection Failed to be Established.")
                 if payload['reason'] == 534:
@@ -182,12 +345,19 @@ class MyoDriver:
                     print("Disconnected. Reason: Connection Timeout.")
                 else:
                     print("Disconnected:", payload)
-                # Won't return until the connection is established successfully
                 print("Reconnecting...")
-                self.connect_and_retry(myo, self.config.RETRY_CONNECTION_AFTER, self.config.MAX_RETRIES)
+                self.reconnect(myo)
 
         return handle_disconnect
 
+    def reconnect(self, myo):
+        """
+        Reconnect procedure after an unexpected disconnect. Puts the myo back in line for a direct connection, which
+        advance_connections carries out while the other myos keep streaming.
+        """
+        myo.setup_writes.clear()
+        myo.set_state(Myo.DISCOVERED)
+
     def create_connection_status_handle(self, myo):
         def handle_connection_status(_, payload):
             """
@@ -198,54 +368,80 @@ class MyoDriver:
                 myo.set_connected(True)
                 myo.set_id(payload['connection'])
                 self._print_status("Connected with id", myo.connection_id)
+                if myo.state == Myo.CONNECTING:
+                    self._print_status("Connection successful. Setting up...")
+                    self._print_status()
+                    myo.setup_writes.extend(Bluetooth.setup_writes(self.config))
+                    myo.set_state(Myo.CONFIGURING)
 
         return handle_connection_status
 
-    def handle_attribute_value(self, e, payload):
-        """
-        Handler for EMG events, expected as a ble_evt_attclient_attribute_value event with handle 43, 46, 49 or 52.
-        """
-        emg_handles = [
-            ServiceHandles.EmgData0Characteristic,
-            ServiceHandles.EmgData1Characteristic,
-            ServiceHandles.EmgData2Characteristic,
-            ServiceHandles.EmgData3Characteristic
-        ]
-        imu_handles = [
-            ServiceHandles.IMUDataCharacteristic
-        ]
-        myo_info_handles = [
-            ServiceHandles.DeviceName,
-            ServiceHandles.FirmwareVersionCharacteristic,
-            ServiceHandles.BatteryCharacteristic
-        ]
-
-        # Delegate EMG
-        if payload['atthandle'] in emg_handles:
-            self.data_handler.handle_emg(payload)
-
-        # Delegate IMU
-        elif payload['atthandle'] in imu_handles:
-            self.data_handler.handle_imu(payload)
-
-        # TODO: Delegate classifier
-
-        # Delegate myo info
-        elif payload['atthandle'] in myo_info_handles:
-            for myo in self.myos:
-                myo.handle_attribute_value(payload)
+    def handle_attribute_value_fast(self, connection, atthandle, value):
+        """
+        Fast path for ble_evt_attclient_attribute_value, called before any payload dict is built.
+        :return: True if the value was EMG/IMU data and got handled, False to fire the event as usual.
+        """
+        # Delegate EMG/IMU
+        return self.data_handler.handle_attribute_value(connection, atthandle, value)
 
-        # Print otherwise
+    def create_attribute_value_fast_handle(self, bluetooth, offset):
+        if not offset:
+            handle = self.handle_attribute_value_fast
         else:
-            self._print_status(e, payload)
+            def handle(connection, atthandle, value):
+                """
+                Fast path for a dongle other than the first, with its connection ids made unique.
+                """
+                return self.handle_attribute_value_fast(connection + offset, atthandle, value)
+        if self.latency is None:
+            return handle
+
+        lib = bluetooth.lib
+        latency = self.latency
+
+        def handle_attribute_value_timed(connection, atthandle, value):
+            """
+            Fast path stamping every notification for the latency monitor.
+            """
+            latency.dispatched(lib.rx_ns, lib.frame_ns)
+            return handle(connection, atthandle, value)
+
+        return handle_attribute_value_timed
+
+    def create_attribute_value_handle(self, bluetooth, offset):
+        def handle_attribute_value(e, payload):
+            """
+            Handler for ble_evt_attclient_attribute_value events. EMG (handle 43, 46, 49 or 52) and IMU data is usually
+            consumed by handle_attribute_value_fast before reaching this handler.
+            """
+            # Delegate EMG/IMU
+            if self.handle_attribute_value_fast(payload['connection'] + offset, payload['atthandle'], payload['value']):
+                return
+
+            # TODO: Delegate classifier
+
+            # Delegate myo info
+            if payload['atthandle'] in MYO_INFO_HANDLES:
+                for myo in self.myos:
+                    if myo.bluetooth is bluetooth:
+                        myo.handle_attribute_value(payload)
+
+            # Print otherwise
+            else:
+                self._print_status(e, payload)
+
+        return handle_attribute_value
 
     def set_handlers(self):
         """
-        Set handlers for relevant events.
+        Set handlers for relevant events, on every dongle.
         """
-        self.bluetooth.add_scan_response_handler(self.handle_discover)
-        self.bluetooth.add_connect_response_handler(self.handle_connect)
-        self.bluetooth.add_attribute_value_handler(self.handle_attribute_value)
+        for bluetooth in self.bluetooths:
+            offset = self._connection_offset(bluetooth)
+            bluetooth.add_scan_response_handler(self.create_discover_handle(bluetooth))
+            bluetooth.add_connect_response_handler(self.handle_connect)
+            bluetooth.add_attribute_value_handler(self.create_attribute_value_handle(bluetooth, offset))
+            bluetooth.set_attribute_value_fast_handler(self.create_attribute_value_fast_handle(bluetooth, offset))
 
 
 ##############################################################################
@@ -260,11 +456,12 @@ class MyoDriver:
             self._print_status("Getting myo info")
             self._print_status()
             for myo in self.myos:
-                self.bluetooth.read_device_name(myo.connection_id)
-                self.bluetooth.read_firmware_version(myo.connection_id)
-                self.bluetooth.read_battery_level(myo.connection_id)
+                myo.bluetooth.read_device_name(myo.connection_id)
+                myo.bluetooth.read_firmware_version(myo.connection_id)
+                myo.bluetooth.read_battery_level(myo.connection_id)
             while not self._myos_ready():
                 self.receive()
+                self.advance_connections()
             print("Myo list:")
             for myo in self.myos:
                 print(" - " + str(myo))
@@ -274,7 +471,8 @@ class MyoDriver:
         """
         Stop possible scanning and close all connections.
         """
-        self.bluetooth.disconnect_all()
+        for bluetooth in self.bluetooths:
+            bluetooth.disconnect_all()
 
     def deep_sleep_all(self):
         """
@@ -282,9 +480,23 @@ class MyoDriver:
         """
         print("Turning off devices...")
         for m in self.myos:
-            self.bluetooth.deep_sleep(m.connection_id)
+            m.bluetooth.deep_sleep(m.connection_id)
         print("Disconnected.")
 
+    def window(self, myo, kind, ms=None, samples=None):
+        """
+        Latest samples of a myo, from the history kept when HISTORY_SECONDS is set, e.g. window(myo, 'emg', ms=250).
+        :param myo: Myo, or its connection id as sent through OSC
+        :param kind: 'emg', 'quat', 'accel', 'gyro', 'emg_time' or 'imu_time', see SampleHistory
+        :param ms: keep the samples of the last ms milliseconds, up to the newest sample
+        :param samples: keep the last samples, all the history if neither ms or samples is given
+        :return: NumPy view of the samples, oldest first, overwritten as samples keep coming. None if there are none.
+        """
+        if self.data_handler.history is None:
+            raise ValueError("No sample history kept, set HISTORY_SECONDS")
+        connection = myo.global_id() if isinstance(myo, Myo) else myo
+        return self.data_handler.history.window(connection, kind, ms, samples)
+
 
 ##############################################################################
 #                                   UTILS                                    #
@@ -0,0 +1,52 @@
+import struct
+
+
+class OscEncoder:
+    """
+    Precompiled encoder of the OSC messages sent at a given address: the connection id as a string, followed by
+    arguments of fixed types. The padded address, type tags and connection are encoded once per connection into a
+    reusable buffer, and every message only packs its arguments behind them with a single Struct.pack_into.
+    """
+    def __init__(self, address, tags):
+        """
+        :param address: OSC address, e.g. '/myo/emg'
+        :param tags: type tags of the arguments after the connection, 'f' (float32) or 'i' (int32), e.g. 'ffffffff'
+        """
+        self.address = address
+        self.tags = tags
+        self.arguments = struct.Struct('>' + tags)
+        self._buffers = {}
+        self._prefixes = {}
+
+    def encode(self, connection, *values):
+        """
+        :return: the message, in a buffer reused by the next message of this connection. Copy it to keep it.
+        """
+        buffer, offset = self._buffers.get(connection) or self._add_connection(connection)
+        self.arguments.pack_into(buffer, offset, *values)
+        return buffer
+
+    def prefix(self, connection):
+        """
+        :return: encoded address, type tags and connection of the messages of a connection, to which their arguments
+        only need to be appended (big endian).
+        """
+        prefix = self._prefixes.get(connection)
+        if prefix is None:
+            self._add_connection(connection)
+            prefix = self._prefixes[connection]
+        return prefix
+
+    def _add_connection(self, connection):
+        prefix = self._prefixes[connection] = self._pad(self.address) + self._pad(',s' + self.tags) + \
+            self._pad(str(connection))
+        entry = self._buffers[connection] = (bytearray(prefix) + bytearray(self.arguments.size), len(prefix))
+        return entry
+
+    @staticmethod
+    def _pad(string):
+        """
+        :return: OSC string: encoded, null-terminated and padded to a multiple of 4 bytes.
+        """
+        data = string.encode()
+        return data + b'\x00' * (4 - len(data) % 4)
@@ -0,0 +1,164 @@
+import socket
+import struct
+import time
+
+
+class OscOutput:
+    """
+    UDP output of OSC messages to one or several destinations, from a single socket. Each message is encoded once and
+    sent as its own datagram to each of its destinations, or, when bundling, messages are packed into OSC bundles, one
+    per destination, sent once bundle_interval has passed since their first message or once bundle_size messages are
+    waiting. Bundles are timetagged with the time of their first message, and kept below an Ethernet MTU.
+    Notifications are stamped as sent to the LatencyMonitor, if any, once their messages are on the wire.
+    """
+    BUNDLE_HEADER = b'#bundle\x00'
+    MAX_BUNDLE_BYTES = 1472  # Largest UDP payload not fragmented on Ethernet
+    NTP_EPOCH = 2208988800  # Seconds from 1900 (OSC timetags) to 1970 (time.time)
+
+    def __init__(self, destinations, bundle_interval=None, bundle_size=None, latency=None):
+        """
+        :param destinations: list of (address, port) to send messages to
+        :param bundle_interval: max seconds a message waits in a bundle, None to bundle every drain of the serial port
+        :param bundle_size: max messages in a bundle, None for no limit
+        :param latency: LatencyMonitor told by sent() when each notification's messages have been sent, if any
+        Messages are sent right away if both are None.
+        """
+        self.targets = [socket.getaddrinfo(address, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+                        for address, port in destinations]
+        self.all_targets = tuple(range(len(self.targets)))
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.bundling = bundle_interval is not None or bundle_size is not None
+        self.bundle_interval_ns = int(bundle_interval * 1e9) if bundle_interval is not None else None
+        self.bundle_size = bundle_size
+        self.latency = latency
+        self.datagrams = 0
+        self._bundles = [_Bundle(target) for target in self.targets]
+        # Bundles holding messages of the notification being handled, until sent() is called for it
+        self._holding = set()
+
+    def send(self, message, targets=None):
+        """
+        :param message: OscMessage, or anything with its encoding in dgram
+        """
+        self.send_dgram(message.dgram, targets)
+
+    def send_dgram(self, dgram, targets=None):
+        """
+        :param dgram: encoded OSC message, copied if kept for a bundle
+        :param targets: indexes of the destinations to send it to, None for all of them
+        """
+        if targets is None:
+            targets = self.all_targets
+        if not self.bundling:
+            sendto = self.socket.sendto
+            for target in targets:
+                sendto(dgram, self.targets[target])
+            self.datagrams += len(targets)
+            return
+
+        dgram = bytes(dgram)
+        for target in targets:
+            bundle = self._bundles[target]
+            messages = bundle.messages
+            if messages and bundle.size + 4 + len(dgram) > self.MAX_BUNDLE_BYTES:
+                self._flush(bundle)
+            if not messages:
+                bundle.since = time.monotonic_ns()
+                bundle.time = time.time()
+            messages.append(dgram)
+            bundle.size += 4 + len(dgram)
+            self._holding.add(bundle)
+            interval = self.bundle_interval_ns
+            if self.bundle_size is not None and len(messages) >= self.bundle_size:
+                self._flush(bundle)
+            elif interval is not None and time.monotonic_ns() - bundle.since >= interval:
+                self._flush(bundle)
+
+    def sent(self, stamps=None):
+        """
+        Stamp a notification as sent once its messages are: right away, or when the last bundle holding them is sent.
+        :param stamps: stamps of the notification from LatencyMonitor.take(), the notification being handled if None
+        """
+        if not self._holding:
+            self.latency.sent(stamps)
+            return
+        if stamps is None:
+            stamps = self.latency.take()
+        # [stamps, bundles left to send]
+        held = [stamps, len(self._holding)]
+        for bundle in self._holding:
+            bundle.stamps.append(held)
+        self._holding.clear()
+
+    def next_flush_in(self):
+        """
+        :return: seconds until the oldest pending bundle is due, 0 if it already is. None if no bundle is pending or
+        there's no interval, bundles being sent at every drain then.
+        """
+        interval = self.bundle_interval_ns
+        if interval is None:
+            return None
+        pending = [bundle.since for bundle in self._bundles if bundle.messages]
+        if not pending:
+            return None
+        return max(0, min(pending) + interval - time.monotonic_ns()) / 1e9
+
+    def flush_due(self):
+        """
+        Send the pending bundles whose interval is over, or all of them if there's no interval. Called after every
+        drain of the serial port, which waits no longer than next_flush_in(), so no message waits past its interval
+        for a next one to arrive.
+        """
+        interval = self.bundle_interval_ns
+        for bundle in self._bundles:
+            if bundle.messages and (interval is None or time.monotonic_ns() - bundle.since >= interval):
+                self._flush(bundle)
+
+    def flush(self):
+        """
+        Send the pending messages as bundles.
+        """
+        for bundle in self._bundles:
+            self._flush(bundle)
+
+    def close(self):
+        """
+        Send what is pending and close the socket.
+        """
+        self.flush()
+        self.socket.close()
+
+    def _flush(self, bundle):
+        messages = bundle.messages
+        if not messages:
+            return
+        seconds = bundle.time + self.NTP_EPOCH
+        parts = [self.BUNDLE_HEADER, struct.pack('>II', int(seconds), int(seconds % 1 * 4294967296))]
+        for dgram in messages:
+            parts.append(len(dgram).to_bytes(4, 'big'))
+            parts.append(dgram)
+        self.socket.sendto(b''.join(parts), bundle.target)
+        self.datagrams += 1
+        messages.clear()
+        bundle.size = _Bundle.HEADER_BYTES
+        self._holding.discard(bundle)
+        for held in bundle.stamps:
+            held[1] -= 1
+            if not held[1]:
+                self.latency.sent(held[0])
+        bundle.stamps.clear()
+
+
+class _Bundle:
+    """
+    Messages waiting to be sent to a destination as a bundle.
+    """
+    HEADER_BYTES = 16  # Bundle header and timetag
+
+    def __init__(self, target):
+        self.target = target
+        self.messages = []
+        self.size = self.HEADER_BYTES
+        self.since = 0  # time.monotonic_ns() of the first message
+        self.time = 0  # time.time() of the first message, for the timetag
+        self.stamps = []  # Latency stamps of the notifications waiting for this bundle, see OscOutput.sent
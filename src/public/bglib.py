@@ -47,6 +47,11 @@ __version__ = "2013-05-04"
 __email__ = "jeff@rowberg.net"
 
 import struct
+import time
+from collections import deque
+
+# Valid first bytes of a BGAPI frame (BLE/wifi, response/event), as accepted by parse()
+BGAPI_HEADERS = frozenset((0x00, 0x80, 0x08, 0x88))
 
 
 # thanks to Masaaki Shibata for Python event handler code
@@ -613,6 +618,29 @@ class BGLib(object):
     busy = False
     packet_mode = False
     debug = False
+    chunked = False
+
+    # Optional fast path for ble_evt_attclient_attribute_value, called as func(connection, atthandle, value) with value
+    # as a memoryview, before any payload dict is built. Returning True consumes the event, otherwise it's fired.
+    attribute_value_handler = None
+
+    # Optional listener called as func(frame) with every complete frame received, before it's dispatched
+    frame_handler = None
+
+    # Optional time.monotonic_ns() stamps: rx_ns of the serial read being parsed, set by check_activity or by whoever
+    # feeds the parser, and frame_ns of the completion of the frame being dispatched
+    timestamps = False
+    rx_ns = 0
+    frame_ns = 0
+
+    # Counters: bytes parsed, bytes dropped outside of frames and frames dropped for a length not matching their content
+    rx_bytes = 0
+    discarded_bytes = 0
+    bad_frames = 0
+
+    def __init__(self):
+        self.bgapi_rx_chunk = bytearray()
+        self.bgapi_rx_frames = deque()
 
     def send_command(self, ser, packet):
         if self.packet_mode: packet = chr(len(packet) & 0xFF) + packet
@@ -624,11 +652,14 @@ class BGLib(object):
         self.on_tx_command_complete()
 
     def check_activity(self, ser, timeout=0):
+        if self.chunked:
+            return self.check_activity_chunked(ser, timeout)
         if timeout > 0:
             ser.timeout = timeout
             while 1:
                 x = ser.read()
                 if len(x) > 0:
+                    if self.timestamps: self.rx_ns = time.monotonic_ns()
                     self.parse(x)
                 else: # timeout
                     self.busy = False
@@ -637,13 +668,72 @@ class BGLib(object):
                 if not self.busy: # finished
                     break
         else:
-            while ser.inWaiting(): self.parse(ser.read())
+            while ser.inWaiting():
+                x = ser.read()
+                if self.timestamps: self.rx_ns = time.monotonic_ns()
+                self.parse(x)
+        return self.busy
+
+    def check_activity_chunked(self, ser, timeout=0):
+        if timeout > 0:
+            ser.timeout = timeout
+            while 1:
+                x = ser.read(max(1, ser.in_waiting))
+                if len(x) > 0:
+                    if self.timestamps: self.rx_ns = time.monotonic_ns()
+                    self.parse_chunk(x)
+                else: # timeout
+                    self.busy = False
+                    self.on_idle()
+                    self.on_timeout()
+                if not self.busy: # finished
+                    break
+        else:
+            waiting = ser.in_waiting
+            while waiting:
+                x = ser.read(waiting)
+                if self.timestamps: self.rx_ns = time.monotonic_ns()
+                self.parse_chunk(x)
+                waiting = ser.in_waiting
         return self.busy
 
+    def parse_chunk(self, data):
+        """
+        Chunked counterpart of parse(): appends any amount of received bytes to a reusable buffer, slices every
+        complete frame out of it using the header length field and dispatches them in order. Complete frames are
+        queued before dispatching, so handlers may safely call back into the parser.
+        """
+        buf = self.bgapi_rx_chunk
+        buf += data
+        self.rx_bytes += len(data)
+        size = len(buf)
+        start = 0
+        with memoryview(buf) as view:
+            while size - start >= 4:
+                header = buf[start]
+                if header not in BGAPI_HEADERS:
+                    # Not a frame start, drop it like parse() does
+                    self.discarded_bytes += 1
+                    start += 1
+                    continue
+                end = start + 4 + ((header & 0x07) << 8) + buf[start + 1]
+                if end > size:
+                    break
+                self.bgapi_rx_frames.append(bytes(view[start:end]))
+                start = end
+        del buf[:start]
+        if self.timestamps: self.frame_ns = time.monotonic_ns()
+        frames = self.bgapi_rx_frames
+        while frames:
+            self.parse_packet(frames.popleft())
+
     def parse(self, barray):
         b=barray[0]
+        self.rx_bytes += 1
         if len(self.bgapi_rx_buffer) == 0 and (b == 0x00 or b == 0x80 or b == 0x08 or b == 0x88):
             self.bgapi_rx_buffer+=bytes([b])
+        elif len(self.bgapi_rx_buffer) == 0:
+            self.discarded_bytes += 1
         elif len(self.bgapi_rx_buffer) == 1:
             self.bgapi_rx_buffer+=bytes([b])
             self.bgapi_rx_expected_length = 4 + (self.bgapi_rx_buffer[0] & 0x07) + self.bgapi_rx_buffer[1]
@@ -664,663 +754,258 @@ class BGLib(object):
 
         #print'%02X: %d, %d' % (b, len(self.bgapi_rx_buffer), self.bgapi_rx_expected_length)
         if self.bgapi_rx_expected_length > 0 and len(self.bgapi_rx_buffer) == self.bgapi_rx_expected_length:
-            if self.debug: print('<=[ ' + ' '.join(['%02X' % b for b in self.bgapi_rx_buffer ]) + ' ]')
-            packet_type, payload_length, packet_class, packet_command = self.bgapi_rx_buffer[:4]
-            self.bgapi_rx_payload = self.bgapi_rx_buffer[4:]
+            packet = self.bgapi_rx_buffer
             self.bgapi_rx_buffer = b""
-            if packet_type & 0x88 == 0x00:
-                # 0x00 = BLE response packet
-                if packet_class == 0:
-                    if packet_command == 0: # ble_rsp_system_reset
-                        self.ble_rsp_system_reset({  })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # ble_rsp_system_hello
-                        self.ble_rsp_system_hello({  })
-                    elif packet_command == 2: # ble_rsp_system_address_get
-                        address = struct.unpack('<6s', self.bgapi_rx_payload[:6])[0]
-                        address = address
-                        self.ble_rsp_system_address_get({ 'address': address })
-                    elif packet_command == 3: # ble_rsp_system_reg_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_reg_write({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_system_reg_read
-                        address, value = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_system_reg_read({ 'address': address, 'value': value })
-                    elif packet_command == 5: # ble_rsp_system_get_counters
-                        txok, txretry, rxok, rxfail, mbuf = struct.unpack('<BBBBB', self.bgapi_rx_payload[:5])
-                        self.ble_rsp_system_get_counters({ 'txok': txok, 'txretry': txretry, 'rxok': rxok, 'rxfail': rxfail, 'mbuf': mbuf })
-                    elif packet_command == 6: # ble_rsp_system_get_connections
-                        maxconn = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_system_get_connections({ 'maxconn': maxconn })
-                    elif packet_command == 7: # ble_rsp_system_read_memory
-                        address, data_len = struct.unpack('<IB', self.bgapi_rx_payload[:5])
-                        data_data = self.bgapi_rx_payload[5:]
-                        self.ble_rsp_system_read_memory({ 'address': address, 'data': data_data })
-                    elif packet_command == 8: # ble_rsp_system_get_info
-                        major, minor, patch, build, ll_version, protocol_version, hw = struct.unpack('<HHHHHBB', self.bgapi_rx_payload[:12])
-                        self.ble_rsp_system_get_info({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'll_version': ll_version, 'protocol_version': protocol_version, 'hw': hw })
-                    elif packet_command == 9: # ble_rsp_system_endpoint_tx
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_endpoint_tx({ 'result': result })
-                    elif packet_command == 10: # ble_rsp_system_whitelist_append
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_whitelist_append({ 'result': result })
-                    elif packet_command == 11: # ble_rsp_system_whitelist_remove
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_whitelist_remove({ 'result': result })
-                    elif packet_command == 12: # ble_rsp_system_whitelist_clear
-                        self.ble_rsp_system_whitelist_clear({  })
-                    elif packet_command == 13: # ble_rsp_system_endpoint_rx
-                        result, data_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        data_data = self.bgapi_rx_payload[3:]
-                        self.ble_rsp_system_endpoint_rx({ 'result': result, 'data': data_data })
-                    elif packet_command == 14: # ble_rsp_system_endpoint_set_watermarks
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_system_endpoint_set_watermarks({ 'result': result })
-                elif packet_class == 1:
-                    if packet_command == 0: # ble_rsp_flash_ps_defrag
-                        self.ble_rsp_flash_ps_defrag({  })
-                    elif packet_command == 1: # ble_rsp_flash_ps_dump
-                        self.ble_rsp_flash_ps_dump({  })
-                    elif packet_command == 2: # ble_rsp_flash_ps_erase_all
-                        self.ble_rsp_flash_ps_erase_all({  })
-                    elif packet_command == 3: # ble_rsp_flash_ps_save
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_flash_ps_save({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_flash_ps_load
-                        result, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = self.bgapi_rx_payload[3:]
-                        self.ble_rsp_flash_ps_load({ 'result': result, 'value': value_data })
-                    elif packet_command == 5: # ble_rsp_flash_ps_erase
-                        self.ble_rsp_flash_ps_erase({  })
-                    elif packet_command == 6: # ble_rsp_flash_erase_page
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_flash_erase_page({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_flash_write_words
-                        self.ble_rsp_flash_write_words({  })
-                elif packet_class == 2:
-                    if packet_command == 0: # ble_rsp_attributes_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_attributes_write({ 'result': result })
-                    elif packet_command == 1: # ble_rsp_attributes_read
-                        handle, offset, result, value_len = struct.unpack('<HHHB', self.bgapi_rx_payload[:7])
-                        value_data = self.bgapi_rx_payload[7:]
-                        self.ble_rsp_attributes_read({ 'handle': handle, 'offset': offset, 'result': result, 'value': value_data })
-                    elif packet_command == 2: # ble_rsp_attributes_read_type
-                        handle, result, value_len = struct.unpack('<HHB', self.bgapi_rx_payload[:5])
-                        value_data = self.bgapi_rx_payload[5:]
-                        self.ble_rsp_attributes_read_type({ 'handle': handle, 'result': result, 'value': value_data })
-                    elif packet_command == 3: # ble_rsp_attributes_user_read_response
-                        self.ble_rsp_attributes_user_read_response({  })
-                    elif packet_command == 4: # ble_rsp_attributes_user_write_response
-                        self.ble_rsp_attributes_user_write_response({  })
-                elif packet_class == 3:
-                    if packet_command == 0: # ble_rsp_connection_disconnect
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_disconnect({ 'connection': connection, 'result': result })
-                    elif packet_command == 1: # ble_rsp_connection_get_rssi
-                        connection, rssi = struct.unpack('<Bb', self.bgapi_rx_payload[:2])
-                        self.ble_rsp_connection_get_rssi({ 'connection': connection, 'rssi': rssi })
-                    elif packet_command == 2: # ble_rsp_connection_update
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_update({ 'connection': connection, 'result': result })
-                    elif packet_command == 3: # ble_rsp_connection_version_update
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_version_update({ 'connection': connection, 'result': result })
-                    elif packet_command == 4: # ble_rsp_connection_channel_map_get
-                        connection, map_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        map_data = self.bgapi_rx_payload[2:]
-                        self.ble_rsp_connection_channel_map_get({ 'connection': connection, 'map': map_data })
-                    elif packet_command == 5: # ble_rsp_connection_channel_map_set
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_channel_map_set({ 'connection': connection, 'result': result })
-                    elif packet_command == 6: # ble_rsp_connection_features_get
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_connection_features_get({ 'connection': connection, 'result': result })
-                    elif packet_command == 7: # ble_rsp_connection_get_status
-                        connection = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_connection_get_status({ 'connection': connection })
-                    elif packet_command == 8: # ble_rsp_connection_raw_tx
-                        connection = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_connection_raw_tx({ 'connection': connection })
-                elif packet_class == 4:
-                    if packet_command == 0: # ble_rsp_attclient_find_by_type_value
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_find_by_type_value({ 'connection': connection, 'result': result })
-                    elif packet_command == 1: # ble_rsp_attclient_read_by_group_type
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_group_type({ 'connection': connection, 'result': result })
-                    elif packet_command == 2: # ble_rsp_attclient_read_by_type
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_type({ 'connection': connection, 'result': result })
-                    elif packet_command == 3: # ble_rsp_attclient_find_information
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_find_information({ 'connection': connection, 'result': result })
-                    elif packet_command == 4: # ble_rsp_attclient_read_by_handle
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_by_handle({ 'connection': connection, 'result': result })
-                    elif packet_command == 5: # ble_rsp_attclient_attribute_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_attribute_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 6: # ble_rsp_attclient_write_command
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_write_command({ 'connection': connection, 'result': result })
-                    elif packet_command == 7: # ble_rsp_attclient_indicate_confirm
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_attclient_indicate_confirm({ 'result': result })
-                    elif packet_command == 8: # ble_rsp_attclient_read_long
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_long({ 'connection': connection, 'result': result })
-                    elif packet_command == 9: # ble_rsp_attclient_prepare_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_prepare_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 10: # ble_rsp_attclient_execute_write
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_execute_write({ 'connection': connection, 'result': result })
-                    elif packet_command == 11: # ble_rsp_attclient_read_multiple
-                        connection, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_attclient_read_multiple({ 'connection': connection, 'result': result })
-                elif packet_class == 5:
-                    if packet_command == 0: # ble_rsp_sm_encrypt_start
-                        handle, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_sm_encrypt_start({ 'handle': handle, 'result': result })
-                    elif packet_command == 1: # ble_rsp_sm_set_bondable_mode
-                        self.ble_rsp_sm_set_bondable_mode({  })
-                    elif packet_command == 2: # ble_rsp_sm_delete_bonding
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_sm_delete_bonding({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_sm_set_parameters
-                        self.ble_rsp_sm_set_parameters({  })
-                    elif packet_command == 4: # ble_rsp_sm_passkey_entry
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_sm_passkey_entry({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_sm_get_bonds
-                        bonds = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_sm_get_bonds({ 'bonds': bonds })
-                    elif packet_command == 6: # ble_rsp_sm_set_oob_data
-                        self.ble_rsp_sm_set_oob_data({  })
-                elif packet_class == 6:
-                    if packet_command == 0: # ble_rsp_gap_set_privacy_flags
-                        self.ble_rsp_gap_set_privacy_flags({  })
-                    elif packet_command == 1: # ble_rsp_gap_set_mode
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_mode({ 'result': result })
-                    elif packet_command == 2: # ble_rsp_gap_discover
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_discover({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_gap_connect_direct
-                        result, connection_handle = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_gap_connect_direct({ 'result': result, 'connection_handle': connection_handle })
-                    elif packet_command == 4: # ble_rsp_gap_end_procedure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_end_procedure({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_gap_connect_selective
-                        result, connection_handle = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_rsp_gap_connect_selective({ 'result': result, 'connection_handle': connection_handle })
-                    elif packet_command == 6: # ble_rsp_gap_set_filtering
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_filtering({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_gap_set_scan_parameters
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_scan_parameters({ 'result': result })
-                    elif packet_command == 8: # ble_rsp_gap_set_adv_parameters
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_adv_parameters({ 'result': result })
-                    elif packet_command == 9: # ble_rsp_gap_set_adv_data
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_adv_data({ 'result': result })
-                    elif packet_command == 10: # ble_rsp_gap_set_directed_connectable_mode
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_gap_set_directed_connectable_mode({ 'result': result })
-                elif packet_class == 7:
-                    if packet_command == 0: # ble_rsp_hardware_io_port_config_irq
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_irq({ 'result': result })
-                    elif packet_command == 1: # ble_rsp_hardware_set_soft_timer
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_set_soft_timer({ 'result': result })
-                    elif packet_command == 2: # ble_rsp_hardware_adc_read
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_adc_read({ 'result': result })
-                    elif packet_command == 3: # ble_rsp_hardware_io_port_config_direction
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_direction({ 'result': result })
-                    elif packet_command == 4: # ble_rsp_hardware_io_port_config_function
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_function({ 'result': result })
-                    elif packet_command == 5: # ble_rsp_hardware_io_port_config_pull
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_config_pull({ 'result': result })
-                    elif packet_command == 6: # ble_rsp_hardware_io_port_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_io_port_write({ 'result': result })
-                    elif packet_command == 7: # ble_rsp_hardware_io_port_read
-                        result, port, data = struct.unpack('<HBB', self.bgapi_rx_payload[:4])
-                        self.ble_rsp_hardware_io_port_read({ 'result': result, 'port': port, 'data': data })
-                    elif packet_command == 8: # ble_rsp_hardware_spi_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_spi_config({ 'result': result })
-                    elif packet_command == 9: # ble_rsp_hardware_spi_transfer
-                        result, channel, data_len = struct.unpack('<HBB', self.bgapi_rx_payload[:4])
-                        data_data = self.bgapi_rx_payload[4:]
-                        self.ble_rsp_hardware_spi_transfer({ 'result': result, 'channel': channel, 'data': data_data })
-                    elif packet_command == 10: # ble_rsp_hardware_i2c_read
-                        result, data_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        data_data = self.bgapi_rx_payload[3:]
-                        self.ble_rsp_hardware_i2c_read({ 'result': result, 'data': data_data })
-                    elif packet_command == 11: # ble_rsp_hardware_i2c_write
-                        written = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_rsp_hardware_i2c_write({ 'written': written })
-                    elif packet_command == 12: # ble_rsp_hardware_set_txpower
-                        self.ble_rsp_hardware_set_txpower({  })
-                    elif packet_command == 13: # ble_rsp_hardware_timer_comparator
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_hardware_timer_comparator({ 'result': result })
-                elif packet_class == 8:
-                    if packet_command == 0: # ble_rsp_test_phy_tx
-                        self.ble_rsp_test_phy_tx({  })
-                    elif packet_command == 1: # ble_rsp_test_phy_rx
-                        self.ble_rsp_test_phy_rx({  })
-                    elif packet_command == 2: # ble_rsp_test_phy_end
-                        counter = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.ble_rsp_test_phy_end({ 'counter': counter })
-                    elif packet_command == 3: # ble_rsp_test_phy_reset
-                        self.ble_rsp_test_phy_reset({  })
-                    elif packet_command == 4: # ble_rsp_test_get_channel_map
-                        channel_map_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        channel_map_data = self.bgapi_rx_payload[1:]
-                        self.ble_rsp_test_get_channel_map({ 'channel_map': channel_map_data })
-                    elif packet_command == 5: # ble_rsp_test_debug
-                        output_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        output_data = self.bgapi_rx_payload[1:]
-                        self.ble_rsp_test_debug({ 'output': output_data })
-                self.busy = False
-                self.on_idle()
-            elif packet_type & 0x88 == 0x80:
-                # 0x80 = BLE event packet
-                if packet_class == 0:
-                    if packet_command == 0: # ble_evt_system_boot
-                        major, minor, patch, build, ll_version, protocol_version, hw = struct.unpack('<HHHHHBB', self.bgapi_rx_payload[:12])
-                        self.ble_evt_system_boot({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'll_version': ll_version, 'protocol_version': protocol_version, 'hw': hw })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # ble_evt_system_debug
-                        data_len = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        data_data = self.bgapi_rx_payload[1:]
-                        self.ble_evt_system_debug({ 'data': data_data })
-                    elif packet_command == 2: # ble_evt_system_endpoint_watermark_rx
-                        endpoint, data = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_system_endpoint_watermark_rx({ 'endpoint': endpoint, 'data': data })
-                    elif packet_command == 3: # ble_evt_system_endpoint_watermark_tx
-                        endpoint, data = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_system_endpoint_watermark_tx({ 'endpoint': endpoint, 'data': data })
-                    elif packet_command == 4: # ble_evt_system_script_failure
-                        address, reason = struct.unpack('<HH', self.bgapi_rx_payload[:4])
-                        self.ble_evt_system_script_failure({ 'address': address, 'reason': reason })
-                    elif packet_command == 5: # ble_evt_system_no_license_key
-                        self.ble_evt_system_no_license_key({  })
-                elif packet_class == 1:
-                    if packet_command == 0: # ble_evt_flash_ps_key
-                        key, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = self.bgapi_rx_payload[3:]
-                        self.ble_evt_flash_ps_key({ 'key': key, 'value': value_data })
-                elif packet_class == 2:
-                    if packet_command == 0: # ble_evt_attributes_value
-                        connection, reason, handle, offset, value_len = struct.unpack('<BBHHB', self.bgapi_rx_payload[:7])
-                        value_data = self.bgapi_rx_payload[7:]
-                        self.ble_evt_attributes_value({ 'connection': connection, 'reason': reason, 'handle': handle, 'offset': offset, 'value': value_data })
-                    elif packet_command == 1: # ble_evt_attributes_user_read_request
-                        connection, handle, offset, maxsize = struct.unpack('<BHHB', self.bgapi_rx_payload[:6])
-                        self.ble_evt_attributes_user_read_request({ 'connection': connection, 'handle': handle, 'offset': offset, 'maxsize': maxsize })
-                    elif packet_command == 2: # ble_evt_attributes_status
-                        handle, flags = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.ble_evt_attributes_status({ 'handle': handle, 'flags': flags })
-                elif packet_class == 3:
-                    if packet_command == 0: # ble_evt_connection_status
-                        connection, flags, address, address_type, conn_interval, timeout, latency, bonding = struct.unpack('<BB6sBHHHB', self.bgapi_rx_payload[:16])
-                        address = address
-                        self.ble_evt_connection_status({ 'connection': connection, 'flags': flags, 'address': address, 'address_type': address_type, 'conn_interval': conn_interval, 'timeout': timeout, 'latency': latency, 'bonding': bonding })
-                    elif packet_command == 1: # ble_evt_connection_version_ind
-                        connection, vers_nr, comp_id, sub_vers_nr = struct.unpack('<BBHH', self.bgapi_rx_payload[:6])
-                        self.ble_evt_connection_version_ind({ 'connection': connection, 'vers_nr': vers_nr, 'comp_id': comp_id, 'sub_vers_nr': sub_vers_nr })
-                    elif packet_command == 2: # ble_evt_connection_feature_ind
-                        connection, features_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        features_data = self.bgapi_rx_payload[2:]
-                        self.ble_evt_connection_feature_ind({ 'connection': connection, 'features': features_data })
-                    elif packet_command == 3: # ble_evt_connection_raw_rx
-                        connection, data_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        data_data = self.bgapi_rx_payload[2:]
-                        self.ble_evt_connection_raw_rx({ 'connection': connection, 'data': data_data })
-                    elif packet_command == 4: # ble_evt_connection_disconnected
-                        connection, reason = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_connection_disconnected({ 'connection': connection, 'reason': reason })
-                elif packet_class == 4:
-                    if packet_command == 0: # ble_evt_attclient_indicated
-                        connection, attrhandle = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_attclient_indicated({ 'connection': connection, 'attrhandle': attrhandle })
-                    elif packet_command == 1: # ble_evt_attclient_procedure_completed
-                        connection, result, chrhandle = struct.unpack('<BHH', self.bgapi_rx_payload[:5])
-                        self.ble_evt_attclient_procedure_completed({ 'connection': connection, 'result': result, 'chrhandle': chrhandle })
-                    elif packet_command == 2: # ble_evt_attclient_group_found
-                        connection, start, end, uuid_len = struct.unpack('<BHHB', self.bgapi_rx_payload[:6])
-                        uuid_data = self.bgapi_rx_payload[6:]
-                        self.ble_evt_attclient_group_found({ 'connection': connection, 'start': start, 'end': end, 'uuid': uuid_data })
-                    elif packet_command == 3: # ble_evt_attclient_attribute_found
-                        connection, chrdecl, value, properties, uuid_len = struct.unpack('<BHHBB', self.bgapi_rx_payload[:7])
-                        uuid_data = self.bgapi_rx_payload[7:]
-                        self.ble_evt_attclient_attribute_found({ 'connection': connection, 'chrdecl': chrdecl, 'value': value, 'properties': properties, 'uuid': uuid_data })
-                    elif packet_command == 4: # ble_evt_attclient_find_information_found
-                        connection, chrhandle, uuid_len = struct.unpack('<BHB', self.bgapi_rx_payload[:4])
-                        uuid_data = self.bgapi_rx_payload[4:]
-                        self.ble_evt_attclient_find_information_found({ 'connection': connection, 'chrhandle': chrhandle, 'uuid': uuid_data })
-                    elif packet_command == 5: # ble_evt_attclient_attribute_value
-                        connection, atthandle, type, value_len = struct.unpack('<BHBB', self.bgapi_rx_payload[:5])
-                        value_data = self.bgapi_rx_payload[5:]
-                        self.ble_evt_attclient_attribute_value({ 'connection': connection, 'atthandle': atthandle, 'type': type, 'value': value_data })
-                    elif packet_command == 6: # ble_evt_attclient_read_multiple_response
-                        connection, handles_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        handles_data = self.bgapi_rx_payload[2:]
-                        self.ble_evt_attclient_read_multiple_response({ 'connection': connection, 'handles': handles_data })
-                elif packet_class == 5:
-                    if packet_command == 0: # ble_evt_sm_smp_data
-                        handle, packet, data_len = struct.unpack('<BBB', self.bgapi_rx_payload[:3])
-                        data_data = self.bgapi_rx_payload[3:]
-                        self.ble_evt_sm_smp_data({ 'handle': handle, 'packet': packet, 'data': data_data })
-                    elif packet_command == 1: # ble_evt_sm_bonding_fail
-                        handle, result = struct.unpack('<BH', self.bgapi_rx_payload[:3])
-                        self.ble_evt_sm_bonding_fail({ 'handle': handle, 'result': result })
-                    elif packet_command == 2: # ble_evt_sm_passkey_display
-                        handle, passkey = struct.unpack('<BI', self.bgapi_rx_payload[:5])
-                        self.ble_evt_sm_passkey_display({ 'handle': handle, 'passkey': passkey })
-                    elif packet_command == 3: # ble_evt_sm_passkey_request
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_evt_sm_passkey_request({ 'handle': handle })
-                    elif packet_command == 4: # ble_evt_sm_bond_status
-                        bond, keysize, mitm, keys = struct.unpack('<BBBB', self.bgapi_rx_payload[:4])
-                        self.ble_evt_sm_bond_status({ 'bond': bond, 'keysize': keysize, 'mitm': mitm, 'keys': keys })
-                elif packet_class == 6:
-                    if packet_command == 0: # ble_evt_gap_scan_response
-                        rssi, packet_type, sender, address_type, bond, data_len = struct.unpack('<bB6sBBB', self.bgapi_rx_payload[:11])
-                        sender = sender
-                        data_data = self.bgapi_rx_payload[11:]
-                        self.ble_evt_gap_scan_response({ 'rssi': rssi, 'packet_type': packet_type, 'sender': sender, 'address_type': address_type, 'bond': bond, 'data': data_data })
-                    elif packet_command == 1: # ble_evt_gap_mode_changed
-                        discover, connect = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.ble_evt_gap_mode_changed({ 'discover': discover, 'connect': connect })
-                elif packet_class == 7:
-                    if packet_command == 0: # ble_evt_hardware_io_port_status
-                        timestamp, port, irq, state = struct.unpack('<IBBB', self.bgapi_rx_payload[:7])
-                        self.ble_evt_hardware_io_port_status({ 'timestamp': timestamp, 'port': port, 'irq': irq, 'state': state })
-                    elif packet_command == 1: # ble_evt_hardware_soft_timer
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.ble_evt_hardware_soft_timer({ 'handle': handle })
-                    elif packet_command == 2: # ble_evt_hardware_adc_result
-                        input, value = struct.unpack('<Bh', self.bgapi_rx_payload[:3])
-                        self.ble_evt_hardware_adc_result({ 'input': input, 'value': value })
-            elif packet_type & 0x88 == 0x08:
-                # 0x08 = wifi response packet
-                if packet_class == 0:
-                    if packet_command == 0: # wifi_rsp_dfu_reset
-                        self.wifi_rsp_dfu_reset({  })
-                        self.busy = False
-                        self.on_idle()
-                    elif packet_command == 1: # wifi_rsp_dfu_flash_set_address
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_set_address({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_dfu_flash_upload
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_upload({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_dfu_flash_upload_finish
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_dfu_flash_upload_finish({ 'result': result })
-                elif packet_class == 1:
-                    if packet_command == 0: # wifi_rsp_system_sync
-                        self.wifi_rsp_system_sync({  })
-                    elif packet_command == 1: # wifi_rsp_system_reset
-                        self.wifi_rsp_system_reset({  })
-                    elif packet_command == 2: # wifi_rsp_system_hello
-                        self.wifi_rsp_system_hello({  })
-                    elif packet_command == 3: # wifi_rsp_system_set_max_power_saving_state
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_system_set_max_power_saving_state({ 'result': result })
-                elif packet_class == 2:
-                    if packet_command == 0: # wifi_rsp_config_get_mac
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_config_get_mac({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 1: # wifi_rsp_config_set_mac
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_config_set_mac({ 'result': result, 'hw_interface': hw_interface })
-                elif packet_class == 3:
-                    if packet_command == 0: # wifi_rsp_sme_wifi_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_wifi_on({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_sme_wifi_off
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_wifi_off({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_sme_power_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_power_on({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_sme_start_scan
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_start_scan({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_sme_stop_scan
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_stop_scan({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_sme_set_password
-                        status = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_rsp_sme_set_password({ 'status': status })
-                    elif packet_command == 6: # wifi_rsp_sme_connect_bssid
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_connect_bssid({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 7: # wifi_rsp_sme_connect_ssid
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_connect_ssid({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 8: # wifi_rsp_sme_disconnect
-                        result, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_sme_disconnect({ 'result': result, 'hw_interface': hw_interface })
-                    elif packet_command == 9: # wifi_rsp_sme_set_scan_channels
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_sme_set_scan_channels({ 'result': result })
-                elif packet_class == 4:
-                    if packet_command == 0: # wifi_rsp_tcpip_start_tcp_server
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_start_tcp_server({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_rsp_tcpip_tcp_connect
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_tcp_connect({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 2: # wifi_rsp_tcpip_start_udp_server
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_start_udp_server({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 3: # wifi_rsp_tcpip_udp_connect
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_tcpip_udp_connect({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 4: # wifi_rsp_tcpip_configure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_configure({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_tcpip_dns_configure
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_dns_configure({ 'result': result })
-                    elif packet_command == 6: # wifi_rsp_tcpip_dns_gethostbyname
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_tcpip_dns_gethostbyname({ 'result': result })
-                elif packet_class == 5:
-                    if packet_command == 0: # wifi_rsp_endpoint_send
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_send({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_rsp_endpoint_set_streaming
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_streaming({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 2: # wifi_rsp_endpoint_set_active
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_active({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 3: # wifi_rsp_endpoint_set_streaming_destination
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_set_streaming_destination({ 'result': result, 'endpoint': endpoint })
-                    elif packet_command == 4: # wifi_rsp_endpoint_close
-                        result, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_rsp_endpoint_close({ 'result': result, 'endpoint': endpoint })
-                elif packet_class == 6:
-                    if packet_command == 0: # wifi_rsp_hardware_set_soft_timer
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_set_soft_timer({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_hardware_external_interrupt_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_external_interrupt_config({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_hardware_change_notification_config
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_change_notification_config({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_hardware_change_notification_pullup
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_change_notification_pullup({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_hardware_io_port_config_direction
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_config_direction({ 'result': result })
-                    elif packet_command == 5: # wifi_rsp_hardware_io_port_config_open_drain
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_config_open_drain({ 'result': result })
-                    elif packet_command == 6: # wifi_rsp_hardware_io_port_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_io_port_write({ 'result': result })
-                    elif packet_command == 7: # wifi_rsp_hardware_io_port_read
-                        result, port, data = struct.unpack('<HBH', self.bgapi_rx_payload[:5])
-                        self.wifi_rsp_hardware_io_port_read({ 'result': result, 'port': port, 'data': data })
-                    elif packet_command == 8: # wifi_rsp_hardware_output_compare
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_hardware_output_compare({ 'result': result })
-                    elif packet_command == 9: # wifi_rsp_hardware_adc_read
-                        result, input, value = struct.unpack('<HBH', self.bgapi_rx_payload[:5])
-                        self.wifi_rsp_hardware_adc_read({ 'result': result, 'input': input, 'value': value })
-                elif packet_class == 7:
-                    if packet_command == 0: # wifi_rsp_flash_ps_defrag
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_defrag({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_flash_ps_dump
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_dump({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_flash_ps_erase_all
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_erase_all({ 'result': result })
-                    elif packet_command == 3: # wifi_rsp_flash_ps_save
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_save({ 'result': result })
-                    elif packet_command == 4: # wifi_rsp_flash_ps_load
-                        result, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = self.bgapi_rx_payload[3:]
-                        self.wifi_rsp_flash_ps_load({ 'result': result, 'value': value_data })
-                    elif packet_command == 5: # wifi_rsp_flash_ps_erase
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_flash_ps_erase({ 'result': result })
-                elif packet_class == 8:
-                    if packet_command == 0: # wifi_rsp_i2c_start_read
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_start_read({ 'result': result })
-                    elif packet_command == 1: # wifi_rsp_i2c_start_write
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_start_write({ 'result': result })
-                    elif packet_command == 2: # wifi_rsp_i2c_stop
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_rsp_i2c_stop({ 'result': result })
-                self.busy = False
-                self.on_idle()
-            else:
-                # 0x88 = wifi event packet
-                if packet_class == 0:
-                    if packet_command == 0: # wifi_evt_dfu_boot
-                        version = struct.unpack('<I', self.bgapi_rx_payload[:4])[0]
-                        self.wifi_evt_dfu_boot({ 'version': version })
-                        self.busy = False
-                        self.on_idle()
-                elif packet_class == 1:
-                    if packet_command == 0: # wifi_evt_system_boot
-                        major, minor, patch, build, bootloader_version, tcpip_version, hw = struct.unpack('<HHHHHHH', self.bgapi_rx_payload[:14])
-                        self.wifi_evt_system_boot({ 'major': major, 'minor': minor, 'patch': patch, 'build': build, 'bootloader_version': bootloader_version, 'tcpip_version': tcpip_version, 'hw': hw })
-                    elif packet_command == 1: # wifi_evt_system_state
-                        state = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_system_state({ 'state': state })
-                    elif packet_command == 2: # wifi_evt_system_sw_exception
-                        address, type = struct.unpack('<IB', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_system_sw_exception({ 'address': address, 'type': type })
-                    elif packet_command == 3: # wifi_evt_system_power_saving_state
-                        state = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_system_power_saving_state({ 'state': state })
-                elif packet_class == 2:
-                    if packet_command == 0: # wifi_evt_config_mac_address
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_config_mac_address({ 'hw_interface': hw_interface })
-                elif packet_class == 3:
-                    if packet_command == 0: # wifi_evt_sme_wifi_is_on
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_sme_wifi_is_on({ 'result': result })
-                    elif packet_command == 1: # wifi_evt_sme_wifi_is_off
-                        result = struct.unpack('<H', self.bgapi_rx_payload[:2])[0]
-                        self.wifi_evt_sme_wifi_is_off({ 'result': result })
-                    elif packet_command == 2: # wifi_evt_sme_scan_result
-                        channel, rssi, snr, secure, ssid_len = struct.unpack('<bhbBB', self.bgapi_rx_payload[:6])
-                        ssid_data = self.bgapi_rx_payload[6:]
-                        self.wifi_evt_sme_scan_result({ 'channel': channel, 'rssi': rssi, 'snr': snr, 'secure': secure, 'ssid': ssid_data })
-                    elif packet_command == 3: # wifi_evt_sme_scan_result_drop
-                        self.wifi_evt_sme_scan_result_drop({  })
-                    elif packet_command == 4: # wifi_evt_sme_scanned
-                        status = struct.unpack('<b', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_scanned({ 'status': status })
-                    elif packet_command == 5: # wifi_evt_sme_connected
-                        status, hw_interface = struct.unpack('<bB', self.bgapi_rx_payload[:2])
-                        self.wifi_evt_sme_connected({ 'status': status, 'hw_interface': hw_interface })
-                    elif packet_command == 6: # wifi_evt_sme_disconnected
-                        reason, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_sme_disconnected({ 'reason': reason, 'hw_interface': hw_interface })
-                    elif packet_command == 7: # wifi_evt_sme_interface_status
-                        hw_interface, status = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        self.wifi_evt_sme_interface_status({ 'hw_interface': hw_interface, 'status': status })
-                    elif packet_command == 8: # wifi_evt_sme_connect_failed
-                        reason, hw_interface = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_sme_connect_failed({ 'reason': reason, 'hw_interface': hw_interface })
-                    elif packet_command == 9: # wifi_evt_sme_connect_retry
-                        hw_interface = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_sme_connect_retry({ 'hw_interface': hw_interface })
-                elif packet_class == 4:
-                    if packet_command == 0: # wifi_evt_tcpip_configuration
-                        use_dhcp = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_tcpip_configuration({ 'use_dhcp': use_dhcp })
-                    elif packet_command == 1: # wifi_evt_tcpip_dns_configuration
-                        index = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_tcpip_dns_configuration({ 'index': index })
-                    elif packet_command == 2: # wifi_evt_tcpip_endpoint_status
-                        endpoint, local_port, remote_port = struct.unpack('<BHH', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_tcpip_endpoint_status({ 'endpoint': endpoint, 'local_port': local_port, 'remote_port': remote_port })
-                    elif packet_command == 3: # wifi_evt_tcpip_dns_gethostbyname_result
-                        result, name_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        name_data = self.bgapi_rx_payload[3:]
-                        self.wifi_evt_tcpip_dns_gethostbyname_result({ 'result': result, 'name': name_data })
-                elif packet_class == 5:
-                    if packet_command == 0: # wifi_evt_endpoint_syntax_error
-                        endpoint = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_endpoint_syntax_error({ 'endpoint': endpoint })
-                    elif packet_command == 1: # wifi_evt_endpoint_data
-                        endpoint, data_len = struct.unpack('<BB', self.bgapi_rx_payload[:2])
-                        data_data = self.bgapi_rx_payload[2:]
-                        self.wifi_evt_endpoint_data({ 'endpoint': endpoint, 'data': data_data })
-                    elif packet_command == 2: # wifi_evt_endpoint_status
-                        endpoint, type, streaming, destination, active = struct.unpack('<BIBbB', self.bgapi_rx_payload[:8])
-                        self.wifi_evt_endpoint_status({ 'endpoint': endpoint, 'type': type, 'streaming': streaming, 'destination': destination, 'active': active })
-                    elif packet_command == 3: # wifi_evt_endpoint_closing
-                        reason, endpoint = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        self.wifi_evt_endpoint_closing({ 'reason': reason, 'endpoint': endpoint })
-                elif packet_class == 6:
-                    if packet_command == 0: # wifi_evt_hardware_soft_timer
-                        handle = struct.unpack('<B', self.bgapi_rx_payload[:1])[0]
-                        self.wifi_evt_hardware_soft_timer({ 'handle': handle })
-                    elif packet_command == 1: # wifi_evt_hardware_change_notification
-                        timestamp = struct.unpack('<I', self.bgapi_rx_payload[:4])[0]
-                        self.wifi_evt_hardware_change_notification({ 'timestamp': timestamp })
-                    elif packet_command == 2: # wifi_evt_hardware_external_interrupt
-                        irq, timestamp = struct.unpack('<BI', self.bgapi_rx_payload[:5])
-                        self.wifi_evt_hardware_external_interrupt({ 'irq': irq, 'timestamp': timestamp })
-                elif packet_class == 7:
-                    if packet_command == 0: # wifi_evt_flash_ps_key
-                        key, value_len = struct.unpack('<HB', self.bgapi_rx_payload[:3])
-                        value_data = self.bgapi_rx_payload[3:]
-                        self.wifi_evt_flash_ps_key({ 'key': key, 'value': value_data })
+            if self.timestamps: self.frame_ns = time.monotonic_ns()
+            self.parse_packet(packet)
+
+    def parse_packet(self, packet):
+        if self.debug: print('<=[ ' + ' '.join(['%02X' % b for b in packet ]) + ' ]')
+        if self.frame_handler is not None: self.frame_handler(packet)
+        if self.attribute_value_handler is not None and packet[0] == 0x80 and packet[2] == 4 and packet[3] == 5:
+            # ble_evt_attclient_attribute_value: connection, atthandle, type, value_len, value
+            if len(packet) < 9 or packet[8] != len(packet) - 9:
+                self.bad_frames += 1
+                return
+            if self.attribute_value_handler(packet[4], packet[5] | (packet[6] << 8), memoryview(packet)[9:]):
+                return
+        packet_type = packet[0] & 0x88
+        key = (packet_type, packet[2], packet[3])
+        self.bgapi_rx_payload = packet[4:]
+        entry = BGAPI_DISPATCH.get(key)
+        if entry is not None:
+            unpacker, event, fields, array = entry
+            if len(self.bgapi_rx_payload) < unpacker.size:
+                self.bad_frames += 1
+                return
+            args = dict(zip(fields, unpacker.unpack_from(self.bgapi_rx_payload)))
+            if array is not None:
+                args[array] = self.bgapi_rx_payload[unpacker.size:]
+            BGAPIEventHandler(event, self).fire(args)
+        if packet_type & 0x80 == 0x00 or key in BGAPI_BOOT_EVENTS:
+            # Every response, and a boot event, means the module is ready for the next command
+            self.busy = False
+            self.on_idle()
+
+
+# BGAPI packet table, keyed by (type, class, command) where type is the first header byte masked with 0x88.
+# Values are (event name, payload struct format, field names, trailing uint8array field or None). A uint8array payload
+# field is preceded by its length byte, which is unpacked last and left out of the field names.
+BGAPI_PACKETS = {
+    # 0x00 = BLE responses
+    (0x00, 0, 0): ('ble_rsp_system_reset', '<', (), None),
+    (0x00, 0, 1): ('ble_rsp_system_hello', '<', (), None),
+    (0x00, 0, 2): ('ble_rsp_system_address_get', '<6s', ('address',), None),
+    (0x00, 0, 3): ('ble_rsp_system_reg_write', '<H', ('result',), None),
+    (0x00, 0, 4): ('ble_rsp_system_reg_read', '<HB', ('address', 'value'), None),
+    (0x00, 0, 5): ('ble_rsp_system_get_counters', '<BBBBB', ('txok', 'txretry', 'rxok', 'rxfail', 'mbuf'), None),
+    (0x00, 0, 6): ('ble_rsp_system_get_connections', '<B', ('maxconn',), None),
+    (0x00, 0, 7): ('ble_rsp_system_read_memory', '<IB', ('address',), 'data'),
+    (0x00, 0, 8): ('ble_rsp_system_get_info', '<HHHHHBB', ('major', 'minor', 'patch', 'build', 'll_version', 'protocol_version', 'hw'), None),
+    (0x00, 0, 9): ('ble_rsp_system_endpoint_tx', '<H', ('result',), None),
+    (0x00, 0, 10): ('ble_rsp_system_whitelist_append', '<H', ('result',), None),
+    (0x00, 0, 11): ('ble_rsp_system_whitelist_remove', '<H', ('result',), None),
+    (0x00, 0, 12): ('ble_rsp_system_whitelist_clear', '<', (), None),
+    (0x00, 0, 13): ('ble_rsp_system_endpoint_rx', '<HB', ('result',), 'data'),
+    (0x00, 0, 14): ('ble_rsp_system_endpoint_set_watermarks', '<H', ('result',), None),
+    (0x00, 1, 0): ('ble_rsp_flash_ps_defrag', '<', (), None),
+    (0x00, 1, 1): ('ble_rsp_flash_ps_dump', '<', (), None),
+    (0x00, 1, 2): ('ble_rsp_flash_ps_erase_all', '<', (), None),
+    (0x00, 1, 3): ('ble_rsp_flash_ps_save', '<H', ('result',), None),
+    (0x00, 1, 4): ('ble_rsp_flash_ps_load', '<HB', ('result',), 'value'),
+    (0x00, 1, 5): ('ble_rsp_flash_ps_erase', '<', (), None),
+    (0x00, 1, 6): ('ble_rsp_flash_erase_page', '<H', ('result',), None),
+    (0x00, 1, 7): ('ble_rsp_flash_write_words', '<', (), None),
+    (0x00, 2, 0): ('ble_rsp_attributes_write', '<H', ('result',), None),
+    (0x00, 2, 1): ('ble_rsp_attributes_read', '<HHHB', ('handle', 'offset', 'result'), 'value'),
+    (0x00, 2, 2): ('ble_rsp_attributes_read_type', '<HHB', ('handle', 'result'), 'value'),
+    (0x00, 2, 3): ('ble_rsp_attributes_user_read_response', '<', (), None),
+    (0x00, 2, 4): ('ble_rsp_attributes_user_write_response', '<', (), None),
+    (0x00, 3, 0): ('ble_rsp_connection_disconnect', '<BH', ('connection', 'result'), None),
+    (0x00, 3, 1): ('ble_rsp_connection_get_rssi', '<Bb', ('connection', 'rssi'), None),
+    (0x00, 3, 2): ('ble_rsp_connection_update', '<BH', ('connection', 'result'), None),
+    (0x00, 3, 3): ('ble_rsp_connection_version_update', '<BH', ('connection', 'result'), None),
+    (0x00, 3, 4): ('ble_rsp_connection_channel_map_get', '<BB', ('connection',), 'map'),
+    (0x00, 3, 5): ('ble_rsp_connection_channel_map_set', '<BH', ('connection', 'result'), None),
+    (0x00, 3, 6): ('ble_rsp_connection_features_get', '<BH', ('connection', 'result'), None),
+    (0x00, 3, 7): ('ble_rsp_connection_get_status', '<B', ('connection',), None),
+    (0x00, 3, 8): ('ble_rsp_connection_raw_tx', '<B', ('connection',), None),
+    (0x00, 4, 0): ('ble_rsp_attclient_find_by_type_value', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 1): ('ble_rsp_attclient_read_by_group_type', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 2): ('ble_rsp_attclient_read_by_type', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 3): ('ble_rsp_attclient_find_information', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 4): ('ble_rsp_attclient_read_by_handle', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 5): ('ble_rsp_attclient_attribute_write', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 6): ('ble_rsp_attclient_write_command', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 7): ('ble_rsp_attclient_indicate_confirm', '<H', ('result',), None),
+    (0x00, 4, 8): ('ble_rsp_attclient_read_long', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 9): ('ble_rsp_attclient_prepare_write', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 10): ('ble_rsp_attclient_execute_write', '<BH', ('connection', 'result'), None),
+    (0x00, 4, 11): ('ble_rsp_attclient_read_multiple', '<BH', ('connection', 'result'), None),
+    (0x00, 5, 0): ('ble_rsp_sm_encrypt_start', '<BH', ('handle', 'result'), None),
+    (0x00, 5, 1): ('ble_rsp_sm_set_bondable_mode', '<', (), None),
+    (0x00, 5, 2): ('ble_rsp_sm_delete_bonding', '<H', ('result',), None),
+    (0x00, 5, 3): ('ble_rsp_sm_set_parameters', '<', (), None),
+    (0x00, 5, 4): ('ble_rsp_sm_passkey_entry', '<H', ('result',), None),
+    (0x00, 5, 5): ('ble_rsp_sm_get_bonds', '<B', ('bonds',), None),
+    (0x00, 5, 6): ('ble_rsp_sm_set_oob_data', '<', (), None),
+    (0x00, 6, 0): ('ble_rsp_gap_set_privacy_flags', '<', (), None),
+    (0x00, 6, 1): ('ble_rsp_gap_set_mode', '<H', ('result',), None),
+    (0x00, 6, 2): ('ble_rsp_gap_discover', '<H', ('result',), None),
+    (0x00, 6, 3): ('ble_rsp_gap_connect_direct', '<HB', ('result', 'connection_handle'), None),
+    (0x00, 6, 4): ('ble_rsp_gap_end_procedure', '<H', ('result',), None),
+    (0x00, 6, 5): ('ble_rsp_gap_connect_selective', '<HB', ('result', 'connection_handle'), None),
+    (0x00, 6, 6): ('ble_rsp_gap_set_filtering', '<H', ('result',), None),
+    (0x00, 6, 7): ('ble_rsp_gap_set_scan_parameters', '<H', ('result',), None),
+    (0x00, 6, 8): ('ble_rsp_gap_set_adv_parameters', '<H', ('result',), None),
+    (0x00, 6, 9): ('ble_rsp_gap_set_adv_data', '<H', ('result',), None),
+    (0x00, 6, 10): ('ble_rsp_gap_set_directed_connectable_mode', '<H', ('result',), None),
+    (0x00, 7, 0): ('ble_rsp_hardware_io_port_config_irq', '<H', ('result',), None),
+    (0x00, 7, 1): ('ble_rsp_hardware_set_soft_timer', '<H', ('result',), None),
+    (0x00, 7, 2): ('ble_rsp_hardware_adc_read', '<H', ('result',), None),
+    (0x00, 7, 3): ('ble_rsp_hardware_io_port_config_direction', '<H', ('result',), None),
+    (0x00, 7, 4): ('ble_rsp_hardware_io_port_config_function', '<H', ('result',), None),
+    (0x00, 7, 5): ('ble_rsp_hardware_io_port_config_pull', '<H', ('result',), None),
+    (0x00, 7, 6): ('ble_rsp_hardware_io_port_write', '<H', ('result',), None),
+    (0x00, 7, 7): ('ble_rsp_hardware_io_port_read', '<HBB', ('result', 'port', 'data'), None),
+    (0x00, 7, 8): ('ble_rsp_hardware_spi_config', '<H', ('result',), None),
+    (0x00, 7, 9): ('ble_rsp_hardware_spi_transfer', '<HBB', ('result', 'channel'), 'data'),
+    (0x00, 7, 10): ('ble_rsp_hardware_i2c_read', '<HB', ('result',), 'data'),
+    (0x00, 7, 11): ('ble_rsp_hardware_i2c_write', '<B', ('written',), None),
+    (0x00, 7, 12): ('ble_rsp_hardware_set_txpower', '<', (), None),
+    (0x00, 7, 13): ('ble_rsp_hardware_timer_comparator', '<H', ('result',), None),
+    (0x00, 8, 0): ('ble_rsp_test_phy_tx', '<', (), None),
+    (0x00, 8, 1): ('ble_rsp_test_phy_rx', '<', (), None),
+    (0x00, 8, 2): ('ble_rsp_test_phy_end', '<H', ('counter',), None),
+    (0x00, 8, 3): ('ble_rsp_test_phy_reset', '<', (), None),
+    (0x00, 8, 4): ('ble_rsp_test_get_channel_map', '<B', (), 'channel_map'),
+    (0x00, 8, 5): ('ble_rsp_test_debug', '<B', (), 'output'),
+
+    # 0x80 = BLE events
+    (0x80, 0, 0): ('ble_evt_system_boot', '<HHHHHBB', ('major', 'minor', 'patch', 'build', 'll_version', 'protocol_version', 'hw'), None),
+    (0x80, 0, 1): ('ble_evt_system_debug', '<B', (), 'data'),
+    (0x80, 0, 2): ('ble_evt_system_endpoint_watermark_rx', '<BB', ('endpoint', 'data'), None),
+    (0x80, 0, 3): ('ble_evt_system_endpoint_watermark_tx', '<BB', ('endpoint', 'data'), None),
+    (0x80, 0, 4): ('ble_evt_system_script_failure', '<HH', ('address', 'reason'), None),
+    (0x80, 0, 5): ('ble_evt_system_no_license_key', '<', (), None),
+    (0x80, 1, 0): ('ble_evt_flash_ps_key', '<HB', ('key',), 'value'),
+    (0x80, 2, 0): ('ble_evt_attributes_value', '<BBHHB', ('connection', 'reason', 'handle', 'offset'), 'value'),
+    (0x80, 2, 1): ('ble_evt_attributes_user_read_request', '<BHHB', ('connection', 'handle', 'offset', 'maxsize'), None),
+    (0x80, 2, 2): ('ble_evt_attributes_status', '<HB', ('handle', 'flags'), None),
+    (0x80, 3, 0): ('ble_evt_connection_status', '<BB6sBHHHB', ('connection', 'flags', 'address', 'address_type', 'conn_interval', 'timeout', 'latency', 'bonding'), None),
+    (0x80, 3, 1): ('ble_evt_connection_version_ind', '<BBHH', ('connection', 'vers_nr', 'comp_id', 'sub_vers_nr'), None),
+    (0x80, 3, 2): ('ble_evt_connection_feature_ind', '<BB', ('connection',), 'features'),
+    (0x80, 3, 3): ('ble_evt_connection_raw_rx', '<BB', ('connection',), 'data'),
+    (0x80, 3, 4): ('ble_evt_connection_disconnected', '<BH', ('connection', 'reason'), None),
+    (0x80, 4, 0): ('ble_evt_attclient_indicated', '<BH', ('connection', 'attrhandle'), None),
+    (0x80, 4, 1): ('ble_evt_attclient_procedure_completed', '<BHH', ('connection', 'result', 'chrhandle'), None),
+    (0x80, 4, 2): ('ble_evt_attclient_group_found', '<BHHB', ('connection', 'start', 'end'), 'uuid'),
+    (0x80, 4, 3): ('ble_evt_attclient_attribute_found', '<BHHBB', ('connection', 'chrdecl', 'value', 'properties'), 'uuid'),
+    (0x80, 4, 4): ('ble_evt_attclient_find_information_found', '<BHB', ('connection', 'chrhandle'), 'uuid'),
+    (0x80, 4, 5): ('ble_evt_attclient_attribute_value', '<BHBB', ('connection', 'atthandle', 'type'), 'value'),
+    (0x80, 4, 6): ('ble_evt_attclient_read_multiple_response', '<BB', ('connection',), 'handles'),
+    (0x80, 5, 0): ('ble_evt_sm_smp_data', '<BBB', ('handle', 'packet'), 'data'),
+    (0x80, 5, 1): ('ble_evt_sm_bonding_fail', '<BH', ('handle', 'result'), None),
+    (0x80, 5, 2): ('ble_evt_sm_passkey_display', '<BI', ('handle', 'passkey'), None),
+    (0x80, 5, 3): ('ble_evt_sm_passkey_request', '<B', ('handle',), None),
+    (0x80, 5, 4): ('ble_evt_sm_bond_status', '<BBBB', ('bond', 'keysize', 'mitm', 'keys'), None),
+    (0x80, 6, 0): ('ble_evt_gap_scan_response', '<bB6sBBB', ('rssi', 'packet_type', 'sender', 'address_type', 'bond'), 'data'),
+    (0x80, 6, 1): ('ble_evt_gap_mode_changed', '<BB', ('discover', 'connect'), None),
+    (0x80, 7, 0): ('ble_evt_hardware_io_port_status', '<IBBB', ('timestamp', 'port', 'irq', 'state'), None),
+    (0x80, 7, 1): ('ble_evt_hardware_soft_timer', '<B', ('handle',), None),
+    (0x80, 7, 2): ('ble_evt_hardware_adc_result', '<Bh', ('input', 'value'), None),
+
+    # 0x08 = wifi responses
+    (0x08, 0, 0): ('wifi_rsp_dfu_reset', '<', (), None),
+    (0x08, 0, 1): ('wifi_rsp_dfu_flash_set_address', '<H', ('result',), None),
+    (0x08, 0, 2): ('wifi_rsp_dfu_flash_upload', '<H', ('result',), None),
+    (0x08, 0, 3): ('wifi_rsp_dfu_flash_upload_finish', '<H', ('result',), None),
+    (0x08, 1, 0): ('wifi_rsp_system_sync', '<', (), None),
+    (0x08, 1, 1): ('wifi_rsp_system_reset', '<', (), None),
+    (0x08, 1, 2): ('wifi_rsp_system_hello', '<', (), None),
+    (0x08, 1, 3): ('wifi_rsp_system_set_max_power_saving_state', '<H', ('result',), None),
+    (0x08, 2, 0): ('wifi_rsp_config_get_mac', '<HB', ('result', 'hw_interface'), None),
+    (0x08, 2, 1): ('wifi_rsp_config_set_mac', '<HB', ('result', 'hw_interface'), None),
+    (0x08, 3, 0): ('wifi_rsp_sme_wifi_on', '<H', ('result',), None),
+    (0x08, 3, 1): ('wifi_rsp_sme_wifi_off', '<H', ('result',), None),
+    (0x08, 3, 2): ('wifi_rsp_sme_power_on', '<H', ('result',), None),
+    (0x08, 3, 3): ('wifi_rsp_sme_start_scan', '<H', ('result',), None),
+    (0x08, 3, 4): ('wifi_rsp_sme_stop_scan', '<H', ('result',), None),
+    (0x08, 3, 5): ('wifi_rsp_sme_set_password', '<B', ('status',), None),
+    (0x08, 3, 6): ('wifi_rsp_sme_connect_bssid', '<HB', ('result', 'hw_interface'), None),
+    (0x08, 3, 7): ('wifi_rsp_sme_connect_ssid', '<HB', ('result', 'hw_interface'), None),
+    (0x08, 3, 8): ('wifi_rsp_sme_disconnect', '<HB', ('result', 'hw_interface'), None),
+    (0x08, 3, 9): ('wifi_rsp_sme_set_scan_channels', '<H', ('result',), None),
+    (0x08, 4, 0): ('wifi_rsp_tcpip_start_tcp_server', '<HB', ('result', 'endpoint'), None),
+    (0x08, 4, 1): ('wifi_rsp_tcpip_tcp_connect', '<HB', ('result', 'endpoint'), None),
+    (0x08, 4, 2): ('wifi_rsp_tcpip_start_udp_server', '<HB', ('result', 'endpoint'), None),
+    (0x08, 4, 3): ('wifi_rsp_tcpip_udp_connect', '<HB', ('result', 'endpoint'), None),
+    (0x08, 4, 4): ('wifi_rsp_tcpip_configure', '<H', ('result',), None),
+    (0x08, 4, 5): ('wifi_rsp_tcpip_dns_configure', '<H', ('result',), None),
+    (0x08, 4, 6): ('wifi_rsp_tcpip_dns_gethostbyname', '<H', ('result',), None),
+    (0x08, 5, 0): ('wifi_rsp_endpoint_send', '<HB', ('result', 'endpoint'), None),
+    (0x08, 5, 1): ('wifi_rsp_endpoint_set_streaming', '<HB', ('result', 'endpoint'), None),
+    (0x08, 5, 2): ('wifi_rsp_endpoint_set_active', '<HB', ('result', 'endpoint'), None),
+    (0x08, 5, 3): ('wifi_rsp_endpoint_set_streaming_destination', '<HB', ('result', 'endpoint'), None),
+    (0x08, 5, 4): ('wifi_rsp_endpoint_close', '<HB', ('result', 'endpoint'), None),
+    (0x08, 6, 0): ('wifi_rsp_hardware_set_soft_timer', '<H', ('result',), None),
+    (0x08, 6, 1): ('wifi_rsp_hardware_external_interrupt_config', '<H', ('result',), None),
+    (0x08, 6, 2): ('wifi_rsp_hardware_change_notification_config', '<H', ('result',), None),
+    (0x08, 6, 3): ('wifi_rsp_hardware_change_notification_pullup', '<H', ('result',), None),
+    (0x08, 6, 4): ('wifi_rsp_hardware_io_port_config_direction', '<H', ('result',), None),
+    (0x08, 6, 5): ('wifi_rsp_hardware_io_port_config_open_drain', '<H', ('result',), None),
+    (0x08, 6, 6): ('wifi_rsp_hardware_io_port_write', '<H', ('result',), None),
+    (0x08, 6, 7): ('wifi_rsp_hardware_io_port_read', '<HBH', ('result', 'port', 'data'), None),
+    (0x08, 6, 8): ('wifi_rsp_hardware_output_compare', '<H', ('result',), None),
+    (0x08, 6, 9): ('wifi_rsp_hardware_adc_read', '<HBH', ('result', 'input', 'value'), None),
+    (0x08, 7, 0): ('wifi_rsp_flash_ps_defrag', '<H', ('result',), None),
+    (0x08, 7, 1): ('wifi_rsp_flash_ps_dump', '<H', ('result',), None),
+    (0x08, 7, 2): ('wifi_rsp_flash_ps_erase_all', '<H', ('result',), None),
+    (0x08, 7, 3): ('wifi_rsp_flash_ps_save', '<H', ('result',), None),
+    (0x08, 7, 4): ('wifi_rsp_flash_ps_load', '<HB', ('result',), 'value'),
+    (0x08, 7, 5): ('wifi_rsp_flash_ps_erase', '<H', ('result',), None),
+    (0x08, 8, 0): ('wifi_rsp_i2c_start_read', '<H', ('result',), None),
+    (0x08, 8, 1): ('wifi_rsp_i2c_start_write', '<H', ('result',), None),
+    (0x08, 8, 2): ('wifi_rsp_i2c_stop', '<H', ('result',), None),
+
+    # 0x88 = wifi events
+    (0x88, 0, 0): ('wifi_evt_dfu_boot', '<I', ('version',), None),
+    (0x88, 1, 0): ('wifi_evt_system_boot', '<HHHHHHH', ('major', 'minor', 'patch', 'build', 'bootloader_version', 'tcpip_version', 'hw'), None),
+    (0x88, 1, 1): ('wifi_evt_system_state', '<H', ('state',), None),
+    (0x88, 1, 2): ('wifi_evt_system_sw_exception', '<IB', ('address', 'type'), None),
+    (0x88, 1, 3): ('wifi_evt_system_power_saving_state', '<B', ('state',), None),
+    (0x88, 2, 0): ('wifi_evt_config_mac_address', '<B', ('hw_interface',), None),
+    (0x88, 3, 0): ('wifi_evt_sme_wifi_is_on', '<H', ('result',), None),
+    (0x88, 3, 1): ('wifi_evt_sme_wifi_is_off', '<H', ('result',), None),
+    (0x88, 3, 2): ('wifi_evt_sme_scan_result', '<bhbBB', ('channel', 'rssi', 'snr', 'secure'), 'ssid'),
+    (0x88, 3, 3): ('wifi_evt_sme_scan_result_drop', '<', (), None),
+    (0x88, 3, 4): ('wifi_evt_sme_scanned', '<b', ('status',), None),
+    (0x88, 3, 5): ('wifi_evt_sme_connected', '<bB', ('status', 'hw_interface'), None),
+    (0x88, 3, 6): ('wifi_evt_sme_disconnected', '<HB', ('reason', 'hw_interface'), None),
+    (0x88, 3, 7): ('wifi_evt_sme_interface_status', '<BB', ('hw_interface', 'status'), None),
+    (0x88, 3, 8): ('wifi_evt_sme_connect_failed', '<HB', ('reason', 'hw_interface'), None),
+    (0x88, 3, 9): ('wifi_evt_sme_connect_retry', '<B', ('hw_interface',), None),
+    (0x88, 4, 0): ('wifi_evt_tcpip_configuration', '<B', ('use_dhcp',), None),
+    (0x88, 4, 1): ('wifi_evt_tcpip_dns_configuration', '<B', ('index',), None),
+    (0x88, 4, 2): ('wifi_evt_tcpip_endpoint_status', '<BHH', ('endpoint', 'local_port', 'remote_port'), None),
+    (0x88, 4, 3): ('wifi_evt_tcpip_dns_gethostbyname_result', '<HB', ('result',), 'name'),
+    (0x88, 5, 0): ('wifi_evt_endpoint_syntax_error', '<B', ('endpoint',), None),
+    (0x88, 5, 1): ('wifi_evt_endpoint_data', '<BB', ('endpoint',), 'data'),
+    (0x88, 5, 2): ('wifi_evt_endpoint_status', '<BIBbB', ('endpoint', 'type', 'streaming', 'destination', 'active'), None),
+    (0x88, 5, 3): ('wifi_evt_endpoint_closing', '<HB', ('reason', 'endpoint'), None),
+    (0x88, 6, 0): ('wifi_evt_hardware_soft_timer', '<B', ('handle',), None),
+    (0x88, 6, 1): ('wifi_evt_hardware_change_notification', '<I', ('timestamp',), None),
+    (0x88, 6, 2): ('wifi_evt_hardware_external_interrupt', '<BI', ('irq', 'timestamp'), None),
+    (0x88, 7, 0): ('wifi_evt_flash_ps_key', '<HB', ('key',), 'value'),
+}
+
+# Events that signal the module has (re)booted, releasing the busy flag like responses do
+BGAPI_BOOT_EVENTS = frozenset(((0x80, 0, 0), (0x88, 0, 0)))
+
+# Dispatch table built once at import: key -> (precompiled struct.Struct, BGAPIEvent, field names, uint8array field)
+BGAPI_DISPATCH = {
+    key: (struct.Struct(fmt), BGLib.__dict__[name], fields, array)
+    for key, (name, fmt, fields, array) in BGAPI_PACKETS.items()
+}
 
 # ================================================================
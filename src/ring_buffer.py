@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class RingBuffer:
+    """
+    Bounded byte FIFO over a preallocated buffer, shared between a producer and a consumer thread.
+    Keeps track of its high-water mark and of writes dropped because the buffer was full.
+    """
+    def __init__(self, capacity, condition=None):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        self.high_water = 0
+        self.overruns = 0
+        self.dropped_bytes = 0
+        # time.monotonic_ns() of the oldest write not read yet, and of the oldest write handed out by the last read
+        self.first_write_ns = 0
+        self.last_read_ns = 0
+        # May be shared by several buffers, so a single consumer can wait for any of them
+        self.condition = condition if condition is not None else threading.Condition()
+
+    def write(self, data):
+        """
+        Append data to the buffer and wake up the consumer. Data that doesn't fit is dropped as a whole.
+        :param data: bytes to append
+        :return: True if data was stored, False on overrun.
+        """
+        length = len(data)
+        with self.condition:
+            if self.size + length > self.capacity:
+                self.overruns += 1
+                self.dropped_bytes += length
+                return False
+            if not self.size:
+                self.first_write_ns = time.monotonic_ns()
+            end = (self.start + self.size) % self.capacity
+            first = min(length, self.capacity - end)
+            self.buffer[end:end + first] = data[:first]
+            self.buffer[:length - first] = data[first:]
+            self.size += length
+            if self.size > self.high_water:
+                self.high_water = self.size
+            self.condition.notify_all()
+        return True
+
+    def read(self, timeout=None):
+        """
+        Take everything stored in the buffer.
+        :param timeout: max time to wait for data if the buffer is empty, None waits forever
+        :return: buffered bytes, empty if the timeout was met.
+        """
+        with self.condition:
+            if not self.size:
+                self.condition.wait(timeout)
+            first = min(self.size, self.capacity - self.start)
+            data = bytes(self.buffer[self.start:self.start + first]) + bytes(self.buffer[:self.size - first])
+            self.start = (self.start + self.size) % self.capacity
+            self.size = 0
+            self.last_read_ns = self.first_write_ns
+        return data
+
+    def stats(self):
+        """
+        :return: dict with the current fill, high-water mark, overruns and dropped bytes.
+        """
+        with self.condition:
+            return {
+                'size': self.size,
+                'capacity': self.capacity,
+                'high_water': self.high_water,
+                'overruns': self.overruns,
+                'dropped_bytes': self.dropped_bytes
+            }
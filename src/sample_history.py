@@ -0,0 +1,95 @@
+import math
+import time
+import numpy as np
+from src.sample_ring import SampleRing
+
+
+class SampleHistory:
+    """
+    Last seconds of EMG/IMU samples of every connection, in preallocated NumPy rings. Every row is written twice, at
+    its position and one capacity further, so any window is a contiguous slice: queries return views, without copying.
+    Kinds of samples, raw as sent by the armband:
+    * 'emg': int8 [N, 8], 'emg_time': int64 [N], time.monotonic_ns() of every EMG sample
+    * 'quat': int16 [N, 4], 'accel' and 'gyro': int16 [N, 3], 'imu_time': int64 [N]
+    """
+    DEFAULT_SECONDS = 5
+    EMG_RATE = 200
+    IMU_RATE = 50
+    EMG_PERIOD_NS = 1000000000 // EMG_RATE
+    KINDS = {
+        'emg': ('emg', slice(0, 8)),
+        'emg_time': ('emg', None),
+        'quat': ('imu', slice(0, 4)),
+        'accel': ('imu', slice(4, 7)),
+        'gyro': ('imu', slice(7, 10)),
+        'imu_time': ('imu', None)
+    }
+
+    def __init__(self, seconds):
+        """
+        :param seconds: history kept per connection
+        """
+        self.seconds = seconds
+        self.rings = {}
+
+    def emg(self, connection, value):
+        """
+        Add the two samples of an EMG notification.
+        """
+        ring = self.rings.get((connection, 'emg')) or self._add_ring(connection, 'emg')
+        now = time.monotonic_ns()
+        rows = np.frombuffer(value, np.int8, 16).reshape(2, 8)
+        # Kept in order for time windows, when notifications come in closer than a sample period
+        ring.append(rows[0], max(now - self.EMG_PERIOD_NS, ring.last_timestamp))
+        ring.append(rows[1], now)
+
+    def imu(self, connection, value):
+        """
+        Add the sample of an IMU notification.
+        """
+        ring = self.rings.get((connection, 'imu')) or self._add_ring(connection, 'imu')
+        ring.append(np.frombuffer(value, np.int16, 10), time.monotonic_ns())
+
+    def window(self, connection, kind, ms=None, samples=None):
+        """
+        Latest samples of a connection. The view follows the ring: copy it to keep it while samples keep coming.
+        :param kind: 'emg', 'quat', 'accel', 'gyro', 'emg_time' or 'imu_time'
+        :param ms: keep the samples of the last ms milliseconds, up to the newest sample
+        :param samples: keep the last samples, all the history if neither ms or samples is given
+        :return: view of the samples, oldest first. None if the connection sent no such samples yet.
+        """
+        stream, columns = self.KINDS[kind]
+        ring = self.rings.get((connection, stream))
+        if ring is None:
+            return None
+        start, end = ring.bounds(ms, samples)
+        if columns is None:
+            return ring.times[start:end]
+        return ring.values[start:end, columns]
+
+    def close(self):
+        """
+        Nothing to release, the rings stay readable.
+        """
+
+    def _add_ring(self, connection, stream):
+        capacity, dtype, width = self.ring_layout(stream, self.seconds)
+        ring = self.rings[(connection, stream)] = self._create_ring(connection, stream, capacity, dtype, width)
+        return ring
+
+    def _create_ring(self, connection, stream, capacity, dtype, width):
+        """
+        :return: SampleRing to keep the given stream of a connection in.
+        """
+        return SampleRing(capacity, dtype, width)
+
+    @classmethod
+    def ring_layout(cls, stream, seconds):
+        """
+        :param stream: 'emg' or 'imu'
+        :return: (capacity, dtype, width) of the ring keeping given seconds of a stream.
+        """
+        if stream == 'emg':
+            return math.ceil(seconds * cls.EMG_RATE), np.int8, 8
+        return math.ceil(seconds * cls.IMU_RATE), np.int16, 10
+
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class SampleRing:
+    """
+    Ring of sample rows and their timestamps, each written at its position and one capacity further so the latest rows
+    are always a contiguous slice. Its state lives in a header next to the data, so the ring can be laid over a shared
+    buffer and read from another process:
+    * header: int64 [sequence, count, capacity, last timestamp], sequence is odd while a row is being written
+    * times: int64 [2 * capacity]
+    * values: dtype [2 * capacity, width]
+    """
+    HEADER_FIELDS = 4
+
+    def __init__(self, capacity, dtype, width, buffer=None):
+        """
+        :param buffer: buffer of at least size(capacity, dtype, width) bytes holding the ring, allocated if None. A
+        ring already written to keeps its state.
+        """
+        self.capacity = capacity
+        self.width = width
+        if buffer is None:
+            buffer = bytearray(self.size(capacity, dtype, width))
+        header_bytes = 8 * self.HEADER_FIELDS
+        times_bytes = 8 * 2 * capacity
+        self.header = np.frombuffer(buffer, np.int64, self.HEADER_FIELDS)
+        self.times = np.frombuffer(buffer, np.int64, 2 * capacity, header_bytes)
+        self.values = np.frombuffer(buffer, dtype, 2 * capacity * width, header_bytes + times_bytes).reshape(-1, width)
+        if not self.header[2]:
+            self.header[2] = capacity
+
+    @classmethod
+    def size(cls, capacity, dtype, width):
+        """
+        :return: bytes needed by a ring.
+        """
+        return 8 * cls.HEADER_FIELDS + 8 * 2 * capacity + np.dtype(dtype).itemsize * 2 * capacity * width
+
+    @property
+    def count(self):
+        """
+        Rows written since the ring was created.
+        """
+        return int(self.header[1])
+
+    @property
+    def last_timestamp(self):
+        return int(self.header[3])
+
+    def append(self, row, timestamp):
+        header = self.header
+        count = int(header[1])
+        position = count % self.capacity
+        header[0] += 1
+        self.values[position] = row
+        self.values[position + self.capacity] = row
+        self.times[position] = timestamp
+        self.times[position + self.capacity] = timestamp
+        header[3] = timestamp
+        header[1] = count + 1
+        header[0] += 1
+
+    def bounds(self, ms=None, samples=None):
+        """
+        :return: (start, end) of the latest samples in values and times.
+        """
+        count = self.count
+        end = (count - 1) % self.capacity + self.capacity + 1
+        start = end - min(count, self.capacity)
+        if samples is not None:
+            start = max(start, end - samples)
+        if ms is not None and count:
+            since = self.times[end - 1] - int(ms * 1000000)
+            start += int(np.searchsorted(self.times[start:end], since, 'right'))
+        return start, end
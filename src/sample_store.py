@@ -0,0 +1,143 @@
+import os
+import time
+import numpy as np
+
+
+class SampleStore:
+    """
+    Writes decoded EMG/IMU samples to memory-mapped .npy files, one file per connection and column, grown in fixed-size
+    chunks. Files are valid .npy at every chunk and at close, so np.load(path, mmap_mode='r') opens hours of data
+    without parsing anything:
+    * myo<connection>_emg.npy: int8 [N, 8], myo<connection>_emg_time.npy: int64 [N], ns since the epoch
+    * myo<connection>_quat.npy: int16 [N, 4], _accel.npy and _gyro.npy: int16 [N, 3], _imu_time.npy: int64 [N]
+    Values are raw, as sent by the armband (see myohw for their scales). Files of a previous session are never
+    overwritten, a directory already holding them is refused.
+    """
+    EMG_PERIOD_NS = 5000000  # 200 Hz, two samples per notification
+
+    def __init__(self, directory, chunk_rows=65536):
+        """
+        :param directory: directory to write the files to, created if needed
+        :param chunk_rows: rows added to a file every time it's full
+        :raises FileExistsError: if the directory already holds sample files
+        """
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.columns = {}
+        os.makedirs(directory, exist_ok=True)
+        # Files are created on the first sample of each connection, refuse a used directory before streaming instead
+        existing = [f for f in os.listdir(directory) if f.startswith('myo') and f.endswith('.npy')]
+        if existing:
+            raise FileExistsError("Sample files already in " + str(directory) + " (" + ", ".join(sorted(existing)) +
+                                  "), choose another directory")
+
+    def emg(self, connection, value):
+        """
+        Store the two samples of an EMG notification.
+        """
+        columns = self.columns.get((connection, 'emg')) or self._add_columns(connection, 'emg')
+        now = time.time_ns()
+        emg, emg_time = columns
+        emg.append(np.frombuffer(value, np.int8, 16).reshape(2, 8))
+        emg_time.append(np.array((now - self.EMG_PERIOD_NS, now), np.int64))
+
+    def imu(self, connection, value):
+        """
+        Store the sample of an IMU notification.
+        """
+        columns = self.columns.get((connection, 'imu')) or self._add_columns(connection, 'imu')
+        sample = np.frombuffer(value, np.int16, 10)
+        quat, accel, gyro, imu_time = columns
+        quat.append(sample[0:4].reshape(1, 4))
+        accel.append(sample[4:7].reshape(1, 3))
+        gyro.append(sample[7:10].reshape(1, 3))
+        imu_time.append(np.array((time.time_ns(),), np.int64))
+
+    def flush(self):
+        """
+        Update the file headers with the rows written so far, and write them to disk.
+        """
+        for columns in self.columns.values():
+            for column in columns:
+                column.flush()
+
+    def close(self):
+        """
+        Trim every file to the rows written and close it.
+        """
+        for columns in self.columns.values():
+            for column in columns:
+                column.close()
+        self.columns.clear()
+
+    def _add_columns(self, connection, kind):
+        path = os.path.join(self.directory, 'myo' + str(connection) + '_')
+        if kind == 'emg':
+            columns = (_GrowingArray(path + 'emg.npy', np.int8, (8,), self.chunk_rows),
+                       _GrowingArray(path + 'emg_time.npy', np.int64, (), self.chunk_rows))
+        else:
+            columns = (_GrowingArray(path + 'quat.npy', np.int16, (4,), self.chunk_rows),
+                       _GrowingArray(path + 'accel.npy', np.int16, (3,), self.chunk_rows),
+                       _GrowingArray(path + 'gyro.npy', np.int16, (3,), self.chunk_rows),
+                       _GrowingArray(path + 'imu_time.npy', np.int64, (), self.chunk_rows))
+        self.columns[(connection, kind)] = columns
+        return columns
+
+
+class _GrowingArray:
+    """
+    .npy file of rows memory-mapped for appending. Its header is kept at a fixed size, so it can be rewritten with the
+    current amount of rows in place.
+    """
+    HEADER_SIZE = 128
+
+    def __init__(self, path, dtype, row_shape, chunk_rows):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.row_bytes = self.dtype.itemsize * int(np.prod(row_shape))
+        self.chunk_rows = chunk_rows
+        self.length = 0
+        self.capacity = 0
+        self.array = None
+        self.file = open(path, 'x+b')
+        self._grow()
+
+    def append(self, rows):
+        end = self.length + len(rows)
+        if end > self.capacity:
+            self._grow()
+        self.array[self.length:end] = rows
+        self.length = end
+
+    def flush(self):
+        self.array.flush()
+        self._write_header()
+        self.file.flush()
+
+    def close(self):
+        self.array.flush()
+        self.array = None
+        self.file.truncate(self.HEADER_SIZE + self.length * self.row_bytes)
+        self._write_header()
+        self.file.close()
+
+    def _grow(self):
+        if self.array is not None:
+            # Unmapped before resizing, which Windows requires
+            self.array.flush()
+            self.array = None
+        self.capacity += self.chunk_rows
+        self.file.truncate(self.HEADER_SIZE + self.capacity * self.row_bytes)
+        self._write_header()
+        self.array = np.memmap(self.file, self.dtype, 'r+', self.HEADER_SIZE, (self.capacity,) + self.row_shape)
+
+    def _write_header(self):
+        """
+        Version 1.0 .npy header, padded with spaces to HEADER_SIZE.
+        """
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (self.dtype.str,
+                                                                          (self.length,) + self.row_shape)
+        header = header.encode('latin1').ljust(self.HEADER_SIZE - 10 - 1) + b'\n'
+        self.file.seek(0)
+        self.file.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header)
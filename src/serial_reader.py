@@ -0,0 +1,29 @@
+import threading
+
+
+class SerialReader(threading.Thread):
+    """
+    Background thread that drains a serial port into a RingBuffer, so a slow consumer doesn't stall serial reads.
+    """
+    def __init__(self, ser, ring_buffer, read_timeout=0.1):
+        super().__init__(name="SerialReader", daemon=True)
+        self.serial = ser
+        self.ring_buffer = ring_buffer
+        self.read_timeout = read_timeout
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.serial.timeout = self.read_timeout
+        while not self._stop_event.is_set():
+            # Block for the first byte, then take everything else that is waiting
+            data = self.serial.read(max(1, self.serial.in_waiting))
+            if data:
+                self.ring_buffer.write(data)
+
+    def stop(self):
+        """
+        Stop reading and wait for the thread to finish.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
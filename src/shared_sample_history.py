@@ -0,0 +1,50 @@
+from multiprocessing import shared_memory
+from src.sample_history import SampleHistory
+from src.sample_ring import SampleRing
+
+
+class SharedSampleHistory(SampleHistory):
+    """
+    SampleHistory whose rings are published in shared memory, one block per connection and stream, named
+    <name>_<connection>_<stream> ('emg' or 'imu'). Local processes read them with a SharedSampleReader instead of
+    decoding OSC. Every row written bumps the ring's sequence counter twice (odd while writing), so readers can check
+    their copy wasn't torn without any lock.
+    """
+    def __init__(self, seconds, name='mioconnect'):
+        """
+        :param name: prefix of the shared memory block names
+        """
+        super().__init__(seconds)
+        self.name = name
+        self.blocks = []
+
+    @staticmethod
+    def block_name(name, connection, stream):
+        return name + '_' + str(connection) + '_' + stream
+
+    def close(self):
+        """
+        Release and remove every shared memory block.
+        """
+        self.rings.clear()
+        for block in self.blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # Windows still referenced by the application, unmapped once they are gone
+            block.unlink()
+        self.blocks.clear()
+
+    def _create_ring(self, connection, stream, capacity, dtype, width):
+        name = self.block_name(self.name, connection, stream)
+        size = SampleRing.size(capacity, dtype, width)
+        try:
+            block = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a session that didn't close
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            block = shared_memory.SharedMemory(name, create=True, size=size)
+        self.blocks.append(block)
+        return SampleRing(capacity, dtype, width, block.buf)
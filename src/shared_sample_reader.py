@@ -0,0 +1,109 @@
+import os
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from src.sample_history import SampleHistory
+from src.sample_ring import SampleRing
+from src.shared_sample_history import SharedSampleHistory
+
+
+class SharedSampleReader:
+    """
+    Reads the sample history published by a SharedSampleHistory, from any local process. Reads take no lock: a window
+    is copied, and copied again if its ring's sequence counter moved meanwhile.
+    """
+    READ_TIMEOUT = 0.1  # Seconds a window is retried while its ring is being written, e.g. by a publisher that died
+    MAX_BACKOFF = 0.001  # Max seconds slept between retries
+
+    def __init__(self, name='mioconnect'):
+        """
+        :param name: prefix of the shared memory block names, as given to SharedSampleHistory
+        """
+        self.name = name
+        self.rings = {}
+        self.blocks = []
+
+    def window(self, connection, kind, ms=None, samples=None, timeout=READ_TIMEOUT):
+        """
+        Latest samples of a connection, see SampleHistory.window.
+        :param timeout: max seconds to retry while the ring is being written
+        :return: copy of the samples, oldest first. None if the connection isn't published (yet).
+        :raises TimeoutError: if no consistent copy could be made in time, e.g. the publisher died mid-write
+        """
+        stream, columns = SampleHistory.KINDS[kind]
+        ring = self.rings.get((connection, stream)) or self._attach(connection, stream)
+        if ring is None:
+            return None
+        header = ring.header
+        deadline = None
+        backoff = 0
+        while True:
+            sequence = int(header[0])
+            if not sequence & 1:
+                start, end = ring.bounds(ms, samples)
+                if columns is None:
+                    window = ring.times[start:end].copy()
+                else:
+                    window = ring.values[start:end, columns].copy()
+                if int(header[0]) == sequence:
+                    return window
+
+            # Retry right away first, writes take microseconds, then back off until the deadline
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise TimeoutError("Sample ring of connection " + str(connection) + " kept changing for " +
+                                   str(timeout) + " s, is its publisher alive?")
+            time.sleep(backoff)
+            backoff = min(2 * backoff or 1e-5, self.MAX_BACKOFF)
+
+    def count(self, connection, stream):
+        """
+        :param stream: 'emg' or 'imu'
+        :return: samples written to given stream since it was published, to poll for new ones. 0 if not published.
+        """
+        ring = self.rings.get((connection, stream)) or self._attach(connection, stream)
+        return ring.count if ring is not None else 0
+
+    def close(self):
+        """
+        Detach from every shared memory block, leaving them to the publisher.
+        """
+        self.rings.clear()
+        for block in self.blocks:
+            block.close()
+        self.blocks.clear()
+
+    def _attach(self, connection, stream):
+        """
+        :return: SampleRing over the published block of a stream, None if there's no such block.
+        """
+        name = SharedSampleHistory.block_name(self.name, connection, stream)
+        try:
+            block = self._open_block(name)
+        except FileNotFoundError:
+            return None
+        capacity = int(np.frombuffer(block.buf, np.int64, SampleRing.HEADER_FIELDS)[2])
+        if not capacity:
+            # Not laid out yet
+            block.close()
+            return None
+        self.blocks.append(block)
+        _, dtype, width = SampleHistory.ring_layout(stream, 0)
+        ring = self.rings[(connection, stream)] = SampleRing(capacity, dtype, width, block.buf)
+        return ring
+
+    @staticmethod
+    def _open_block(name):
+        """
+        Attach to a shared memory block without taking ownership of it.
+        """
+        try:
+            return shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the block to be removed when this process ends
+            block = shared_memory.SharedMemory(name)
+            if os.name == 'posix':
+                resource_tracker.unregister(block._name, 'shared_memory')
+            return block
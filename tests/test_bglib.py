@@ -0,0 +1,127 @@
+import struct
+import unittest
+from src.public.bglib import BGLib
+from src.public.myohw import *
+
+
+def attribute_value_frame(connection, atthandle, value):
+    """
+    :return: BGAPI frame of a ble_evt_attclient_attribute_value event.
+    """
+    payload = struct.pack('<BHBB', connection, atthandle, 1, len(value)) + value
+    return bytes((0x80, len(payload), 4, 5)) + payload
+
+
+def disconnected_frame(connection, reason):
+    payload = struct.pack('<BH', connection, reason)
+    return bytes((0x80, len(payload), 3, 4)) + payload
+
+
+class ParseChunkTest(unittest.TestCase):
+    def setUp(self):
+        self.lib = BGLib()
+        self.values = []
+        self.lib.attribute_value_handler = self._handle_value
+
+    def _handle_value(self, connection, atthandle, value):
+        self.values.append((connection, atthandle, bytes(value)))
+        return True
+
+    def _stream(self):
+        emg = bytes(range(16))
+        imu = bytes(range(20))
+        return attribute_value_frame(0, ServiceHandles.EmgData0Characteristic, emg) + \
+            attribute_value_frame(1, ServiceHandles.IMUDataCharacteristic, imu) + \
+            attribute_value_frame(2, ServiceHandles.EmgData1Characteristic, emg)
+
+    def test_whole_frames(self):
+        self.lib.parse_chunk(self._stream())
+        self.assertEqual([v[:2] for v in self.values], [(0, ServiceHandles.EmgData0Characteristic),
+                                                         (1, ServiceHandles.IMUDataCharacteristic),
+                                                         (2, ServiceHandles.EmgData1Characteristic)])
+        self.assertEqual(self.values[1][2], bytes(range(20)))
+        self.assertEqual(self.lib.discarded_bytes, 0)
+
+    def test_frames_split_at_every_offset(self):
+        stream = self._stream()
+        expected = None
+        for cut in range(1, len(stream)):
+            self.setUp()
+            self.lib.parse_chunk(stream[:cut])
+            self.lib.parse_chunk(stream[cut:])
+            if expected is None:
+                expected = self.values
+            self.assertEqual(self.values, expected, "cut at " + str(cut))
+        self.assertEqual(len(expected), 3)
+
+    def test_byte_by_byte(self):
+        for b in self._stream():
+            self.lib.parse_chunk(bytes([b]))
+        self.assertEqual(len(self.values), 3)
+        self.assertEqual(len(self.lib.bgapi_rx_chunk), 0)
+
+    def test_incomplete_frame_is_kept(self):
+        frame = attribute_value_frame(0, ServiceHandles.EmgData0Characteristic, bytes(16))
+        self.lib.parse_chunk(frame[:-1])
+        self.assertEqual(self.values, [])
+        self.assertEqual(bytes(self.lib.bgapi_rx_chunk), frame[:-1])
+        self.lib.parse_chunk(frame[-1:])
+        self.assertEqual(len(self.values), 1)
+
+    def test_garbage_before_frame_is_discarded(self):
+        self.lib.parse_chunk(b'\x01\x02\x03' + self._stream())
+        self.assertEqual(self.lib.discarded_bytes, 3)
+        self.assertEqual(len(self.values), 3)
+
+    def test_same_events_as_parse(self):
+        chunked = BGLib()
+        single = BGLib()
+        events = {id(chunked): [], id(single): []}
+        for lib in (chunked, single):
+            lib.ble_evt_connection_disconnected.add(lambda sender, payload: events[id(sender)].append(payload))
+        stream = disconnected_frame(0, 0x0208) + disconnected_frame(2, 0x0216)
+        chunked.parse_chunk(stream)
+        for b in stream:
+            single.parse(bytes([b]))
+        self.assertEqual(events[id(chunked)], [{'connection': 0, 'reason': 0x0208},
+                                               {'connection': 2, 'reason': 0x0216}])
+        self.assertEqual(events[id(chunked)], events[id(single)])
+
+
+class ParsePacketTest(unittest.TestCase):
+    def setUp(self):
+        self.lib = BGLib()
+        self.values = []
+        self.lib.attribute_value_handler = lambda *args: self.values.append(args) or True
+
+    def test_value_length_mismatch_is_a_bad_frame(self):
+        frame = bytearray(attribute_value_frame(0, ServiceHandles.EmgData0Characteristic, bytes(16)))
+        frame[8] = 15  # value_len one short of the value sent
+        self.lib.parse_packet(bytes(frame))
+        self.assertEqual(self.values, [])
+        self.assertEqual(self.lib.bad_frames, 1)
+
+    def test_truncated_attribute_value_is_a_bad_frame(self):
+        self.lib.parse_packet(bytes((0x80, 3, 4, 5, 0, 0x2b, 0)))
+        self.assertEqual(self.values, [])
+        self.assertEqual(self.lib.bad_frames, 1)
+
+    def test_payload_shorter_than_its_fields_is_a_bad_frame(self):
+        fired = []
+        self.lib.ble_evt_connection_disconnected.add(lambda sender, payload: fired.append(payload))
+        self.lib.parse_packet(bytes((0x80, 2, 3, 4, 0, 0x08)))
+        self.assertEqual(fired, [])
+        self.assertEqual(self.lib.bad_frames, 1)
+
+    def test_bad_frame_does_not_stop_the_stream(self):
+        good = attribute_value_frame(1, ServiceHandles.EmgData2Characteristic, bytes(16))
+        bad = bytearray(good)
+        bad[8] = 3
+        self.lib.parse_chunk(bytes(bad) + good)
+        self.assertEqual(self.lib.bad_frames, 1)
+        self.assertEqual([v[:2] for v in self.values], [(1, ServiceHandles.EmgData2Characteristic)])
+
+    def test_response_clears_busy(self):
+        self.lib.busy = True
+        self.lib.parse_packet(bytes((0x00, 3, 3, 0, 0, 0, 0)))  # ble_rsp_connection_disconnect
+        self.assertFalse(self.lib.busy)
@@ -0,0 +1,104 @@
+import socket
+import struct
+import unittest
+from src.config import Config
+from src.data_handler import DataHandler
+from src.public.myohw import *
+
+EMG_HANDLES = (ServiceHandles.EmgData0Characteristic, ServiceHandles.EmgData1Characteristic,
+               ServiceHandles.EmgData2Characteristic, ServiceHandles.EmgData3Characteristic)
+
+
+class EmgLossTest(unittest.TestCase):
+    """
+    Lost EMG notifications detected from gaps in the rotation of the four EMG characteristics.
+    """
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.config = Config()
+        self.config.OSC_DESTINATIONS = [('127.0.0.1', self.receiver.getsockname()[1])]
+        self.data_handler = None
+
+    def tearDown(self):
+        if self.data_handler is not None:
+            self.data_handler.close()
+        self.receiver.close()
+
+    def _handler(self, **config):
+        for name, value in config.items():
+            setattr(self.config, name, value)
+        self.data_handler = DataHandler(self.config)
+        return self.data_handler
+
+    def _send(self, connection, *positions):
+        for position in positions:
+            self.data_handler.handle_attribute_value(connection, EMG_HANDLES[position], bytes(range(16)))
+        self.data_handler.drained()
+
+    def _received(self):
+        """
+        :return: list of (address, datagram) received so far.
+        """
+        messages = []
+        self.receiver.settimeout(0.2)
+        try:
+            while True:
+                dgram = self.receiver.recv(2048)
+                messages.append((dgram.split(b'\x00')[0].decode(), dgram))
+        except socket.timeout:
+            return messages
+
+    def test_full_rotation_is_no_loss(self):
+        handler = self._handler()
+        self._send(0, 0, 1, 2, 3, 0, 1, 2, 3, 0)
+        self.assertEqual(handler.emg_lost, {})
+
+    def test_first_notification_can_be_any_characteristic(self):
+        handler = self._handler()
+        self._send(0, 2, 3, 0)
+        self.assertEqual(handler.emg_lost, {})
+
+    def test_gaps(self):
+        handler = self._handler()
+        self._send(0, 0, 2)
+        self.assertEqual(handler.emg_lost, {0: 1})
+        self._send(0, 1)  # 3 and 0 skipped, across the wrap
+        self.assertEqual(handler.emg_lost, {0: 3})
+        self._send(0, 2, 3, 0)
+        self.assertEqual(handler.emg_lost, {0: 3})
+
+    def test_connections_are_independent(self):
+        handler = self._handler()
+        self._send(0, 0)
+        self._send(1, 3)
+        self._send(0, 1)
+        self._send(1, 0)
+        self.assertEqual(handler.emg_lost, {})
+
+    def test_reset_after_reconnection(self):
+        handler = self._handler()
+        self._send(0, 0, 1)
+        handler.reset_emg_sequence(0)
+        self._send(0, 0, 1)
+        self.assertEqual(handler.emg_lost, {})
+
+    def test_batch_decode(self):
+        handler = self._handler(BATCH_DECODE=True)
+        self._send(0, 0, 1, 3, 0, 2)
+        self.assertEqual(handler.emg_lost, {0: 2})
+
+    def test_marker(self):
+        self._handler(EMG_LOSS_FILL='marker')
+        self._send(3, 0, 3)
+        markers = [dgram for address, dgram in self._received() if address == '/myo/emg/loss']
+        self.assertEqual(len(markers), 1)
+        self.assertIn(b',si\x00', markers[0])
+        self.assertEqual(struct.unpack('>i', markers[0][-4:])[0], 4)  # Two notifications, two samples each
+
+    def test_hold_fills_in_the_lost_samples(self):
+        self._handler(EMG_LOSS_FILL='hold')
+        self._send(0, 0, 2)
+        emg = [dgram for address, dgram in self._received() if address == '/myo/emg']
+        # Two samples per notification, plus the two of the lost one
+        self.assertEqual(len(emg), 6)
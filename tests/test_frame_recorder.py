@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.frame_recorder import FrameRecorder
+from tests.test_bglib import attribute_value_frame, disconnected_frame
+
+
+class FrameRecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _record(self, frames):
+        recorder = FrameRecorder(self.path)
+        handlers = [recorder.create_frame_handler(0), recorder.create_frame_handler(1)]
+        for dongle, frame in frames:
+            handlers[dongle](frame)
+        recorder.close()
+        return recorder
+
+    def test_round_trip(self):
+        frames = [(0, attribute_value_frame(0, 0x2b, bytes(16))), (1, disconnected_frame(2, 0x0208))]
+        recorder = self._record(frames)
+        self.assertEqual(recorder.frames, 2)
+        _, records = FrameRecorder.read(self.path)
+        records = list(records)
+        self.assertEqual([(dongle, frame) for _, dongle, frame in records], frames)
+        self.assertLessEqual(records[0][0], records[1][0])
+
+    def test_cut_short_recording(self):
+        self._record([(0, disconnected_frame(0, 0x0208)), (0, disconnected_frame(1, 0x0208))])
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        _, records = FrameRecorder.read(self.path)
+        self.assertEqual(len(list(records)), 1)
+
+    def test_refuses_to_overwrite(self):
+        self._record([(0, disconnected_frame(0, 0x0208))])
+        size = os.path.getsize(self.path)
+        self.assertRaises(FileExistsError, FrameRecorder, self.path)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_not_a_recording(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a recording at all')
+        self.assertRaises(ValueError, FrameRecorder.read, self.path)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from src.config import Config
+from src.frame_recorder import FrameRecorder
+from src.frame_replayer import FrameReplayer
+from tests.test_bglib import attribute_value_frame, disconnected_frame
+from tests.test_emg_loss import EMG_HANDLES
+
+
+class FrameReplayerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.bin')
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.config = Config()
+        self.config.OSC_DESTINATIONS = [('127.0.0.1', self.receiver.getsockname()[1])]
+        self.replayer = None
+
+    def tearDown(self):
+        if self.replayer is not None:
+            self.replayer.close()
+        self.receiver.close()
+        shutil.rmtree(self.directory)
+
+    def _replayer(self, frames):
+        recorder = FrameRecorder(self.path)
+        handle_frame = recorder.create_frame_handler(0)
+        for frame in frames:
+            handle_frame(frame)
+        recorder.close()
+        self.replayer = FrameReplayer(self.config, self.path, speed=None)
+        return self.replayer
+
+    @staticmethod
+    def _emg(connection, *positions):
+        return [attribute_value_frame(connection, EMG_HANDLES[position], bytes(16)) for position in positions]
+
+    def test_replay(self):
+        replayer = self._replayer(self._emg(0, 0, 1, 2, 3) + self._emg(1, 0, 1))
+        replayer.run()
+        self.assertEqual(replayer.frames, 6)
+        self.assertEqual(replayer.data_handler.emg_lost, {})
+
+    def test_loss_is_replayed(self):
+        replayer = self._replayer(self._emg(0, 0, 2))
+        replayer.run()
+        self.assertEqual(replayer.data_handler.emg_lost, {0: 1})
+
+    def test_disconnect_resets_the_rotation(self):
+        replayer = self._replayer(self._emg(0, 0, 1) + [disconnected_frame(0, 0x0208)] + self._emg(0, 0, 1))
+        replayer.run()
+        self.assertEqual(replayer.data_handler.emg_lost, {})
+
+    def test_loop_seam_is_no_loss(self):
+        # The recording ends mid-rotation, the next pass starts over from its first characteristic
+        replayer = self._replayer(self._emg(0, 0, 1, 2))
+        for _ in range(3):
+            replayer.run()
+        self.assertEqual(replayer.data_handler.emg_lost, {})
+
+    def test_lag_covers_the_last_pass(self):
+        replayer = self._replayer(self._emg(0, 0, 1))
+        replayer.late_ns = 10 ** 12
+        replayer.run()
+        self.assertEqual(replayer.late_ns, 0)
@@ -0,0 +1,59 @@
+import random
+import unittest
+from src.latency_histogram import LatencyHistogram
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_small_values_are_exact(self):
+        for value in range(LatencyHistogram.SUB_BUCKETS):
+            index = LatencyHistogram._index(value, 48)
+            self.assertEqual(index, value)
+            self.assertEqual(LatencyHistogram._upper_bound(index), value)
+
+    def test_value_within_its_bucket_bounds(self):
+        rng = random.Random(0)
+        for _ in range(20000):
+            value = rng.randrange(1 << rng.randrange(1, 48))
+            upper = LatencyHistogram._upper_bound(LatencyHistogram._index(value, 48))
+            self.assertLessEqual(value, upper)
+            # Relative error below 1 / HALF
+            self.assertLess(upper - value, max(1, value / LatencyHistogram.HALF))
+
+    def test_buckets_are_contiguous(self):
+        # Every bucket starts right after the previous one ends
+        previous = -1
+        for index in range(LatencyHistogram.SUB_BUCKETS, len(LatencyHistogram().counts) - 1):
+            upper = LatencyHistogram._upper_bound(index)
+            lower = LatencyHistogram._upper_bound(index - 1) + 1
+            self.assertEqual(LatencyHistogram._index(lower, 48), index)
+            self.assertEqual(LatencyHistogram._index(upper, 48), index)
+            self.assertGreater(upper, previous)
+            previous = upper
+
+    def test_powers_of_two_split_in_half_buckets(self):
+        start = LatencyHistogram._index(1 << 20, 48)
+        end = LatencyHistogram._index(1 << 21, 48)
+        self.assertEqual(end - start, LatencyHistogram.HALF)
+
+    def test_values_past_max_share_the_last_bucket(self):
+        histogram = LatencyHistogram(max_bits=20)
+        histogram.record(1 << 30)
+        self.assertEqual(histogram.counts[-1], 1)
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 1001):
+            histogram.record(value * 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 500000, delta=500000 / LatencyHistogram.HALF)
+        self.assertAlmostEqual(histogram.percentile(99), 990000, delta=990000 / LatencyHistogram.HALF)
+        self.assertEqual(histogram.percentile(100), 1000000)
+        self.assertEqual(histogram.summary()['count'], 1000)
+
+    def test_negative_values_count_as_zero(self):
+        histogram = LatencyHistogram()
+        histogram.record(-5)
+        self.assertEqual(histogram.min, 0)
+        self.assertEqual(histogram.counts[0], 1)
+
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().percentile(50))
@@ -0,0 +1,32 @@
+import unittest
+from pythonosc import osc_message_builder
+from src.osc_encoder import OscEncoder
+
+
+class OscEncoderTest(unittest.TestCase):
+    def _built(self, address, connection, arguments):
+        builder = osc_message_builder.OscMessageBuilder(address)
+        builder.add_arg(str(connection), 's')
+        for value, tag in arguments:
+            builder.add_arg(value, tag)
+        return builder.build().dgram
+
+    def test_same_bytes_as_python_osc(self):
+        for address, tags, values in (('/myo/emg', 'ffffffff', (0.5, -1.0, 0.25, 0.0, 1.0, -0.5, 0.125, 0.75)),
+                                      ('/myo/emg_raw', 'iiiiiiii', (-128, 127, 0, 1, -1, 5, 6, 7)),
+                                      ('/a', 'f', (3.5,)),
+                                      ('/myo/emg/loss', 'i', (4,))):
+            encoder = OscEncoder(address, tags)
+            for connection in (0, 3, 12):
+                self.assertEqual(bytes(encoder.encode(connection, *values)),
+                                 self._built(address, connection, zip(values, tags)), address)
+
+    def test_prefix_and_packed_arguments(self):
+        encoder = OscEncoder('/myo/gyro', 'f')
+        self.assertEqual(encoder.prefix(1) + encoder.arguments.pack(2.0), bytes(encoder.encode(1, 2.0)))
+
+    def test_buffer_reused_per_connection(self):
+        encoder = OscEncoder('/x', 'i')
+        first = encoder.encode(0, 1)
+        self.assertIs(encoder.encode(0, 2), first)
+        self.assertIsNot(encoder.encode(1, 2), first)
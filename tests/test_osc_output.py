@@ -0,0 +1,83 @@
+import socket
+import time
+import unittest
+from src.latency_monitor import LatencyMonitor
+from src.osc_encoder import OscEncoder
+from src.osc_output import OscOutput
+
+
+class OscOutputTest(unittest.TestCase):
+    INTERVAL = 0.02
+
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.receiver.settimeout(0.5)
+        self.destination = ('127.0.0.1', self.receiver.getsockname()[1])
+        self.message = bytes(OscEncoder('/myo/gyro', 'f').encode(0, 1.0))
+        self.outputs = []
+
+    def tearDown(self):
+        for output in self.outputs:
+            output.close()
+        self.receiver.close()
+
+    def _output(self, *args, **kwargs):
+        output = OscOutput([self.destination], *args, **kwargs)
+        self.outputs.append(output)
+        return output
+
+    def test_unbundled(self):
+        output = self._output()
+        output.send_dgram(self.message)
+        self.assertEqual(self.receiver.recv(2048), self.message)
+        self.assertIsNone(output.next_flush_in())
+
+    def test_next_flush_in_bounded_by_the_interval(self):
+        output = self._output(self.INTERVAL)
+        self.assertIsNone(output.next_flush_in())
+        output.send_dgram(self.message)
+        flush_in = output.next_flush_in()
+        self.assertLessEqual(flush_in, self.INTERVAL)
+        self.assertGreater(flush_in, 0)
+        # Messages added later don't push the deadline back
+        time.sleep(self.INTERVAL / 2)
+        output.send_dgram(self.message)
+        self.assertLessEqual(output.next_flush_in(), flush_in - self.INTERVAL / 4)
+
+    def test_bundle_sent_once_due(self):
+        output = self._output(self.INTERVAL)
+        started = time.monotonic()
+        output.send_dgram(self.message)
+        output.flush_due()
+        self.receiver.settimeout(0)
+        self.assertRaises(BlockingIOError, self.receiver.recv, 2048)
+        time.sleep(output.next_flush_in())
+        self.assertEqual(output.next_flush_in(), 0)
+        output.flush_due()
+        age = time.monotonic() - started
+        self.receiver.settimeout(0.5)
+        bundle = self.receiver.recv(2048)
+        self.assertTrue(bundle.startswith(OscOutput.BUNDLE_HEADER))
+        self.assertTrue(bundle.endswith(len(self.message).to_bytes(4, 'big') + self.message))
+        self.assertLess(age, 2 * self.INTERVAL)
+        self.assertIsNone(output.next_flush_in())
+
+    def test_bundle_size(self):
+        output = self._output(None, 3)
+        for _ in range(3):
+            output.send_dgram(self.message)
+        self.assertEqual(output.datagrams, 1)
+
+    def test_latency_stamped_when_bundle_sent(self):
+        latency = LatencyMonitor()
+        output = self._output(self.INTERVAL, latency=latency)
+        latency.dispatched(time.monotonic_ns(), 0)
+        output.send_dgram(self.message)
+        output.sent()
+        self.assertEqual(latency.histograms['dispatch_to_send'].count, 0)
+        time.sleep(self.INTERVAL)
+        output.flush_due()
+        histogram = latency.histograms['read_to_send']
+        self.assertEqual(histogram.count, 1)
+        self.assertGreaterEqual(histogram.max, self.INTERVAL * 1e9)
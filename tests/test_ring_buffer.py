@@ -0,0 +1,38 @@
+import threading
+import unittest
+from src.ring_buffer import RingBuffer
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_fifo_across_the_wrap(self):
+        buffer = RingBuffer(8)
+        self.assertTrue(buffer.write(b'abcde'))
+        self.assertEqual(buffer.read(0), b'abcde')
+        self.assertTrue(buffer.write(b'fghijk'))  # Wraps around the end
+        self.assertEqual(buffer.read(0), b'fghijk')
+
+    def test_overrun_drops_the_whole_write(self):
+        buffer = RingBuffer(8)
+        buffer.write(b'abcdef')
+        self.assertFalse(buffer.write(b'ghi'))
+        self.assertEqual(buffer.read(0), b'abcdef')
+        stats = buffer.stats()
+        self.assertEqual((stats['overruns'], stats['dropped_bytes'], stats['high_water']), (1, 3, 6))
+
+    def test_read_times_out_empty(self):
+        self.assertEqual(RingBuffer(8).read(0.01), b'')
+
+    def test_read_wakes_up_on_write(self):
+        buffer = RingBuffer(8)
+        timer = threading.Timer(0.05, buffer.write, (b'xy',))
+        timer.start()
+        self.assertEqual(buffer.read(5), b'xy')
+        timer.join()
+
+    def test_shared_condition(self):
+        condition = threading.Condition()
+        first, second = RingBuffer(8, condition), RingBuffer(8, condition)
+        second.write(b'z')
+        with condition:
+            self.assertFalse(first.size)
+            self.assertTrue(second.size)
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from src.sample_history import SampleHistory
+from src.sample_ring import SampleRing
+
+
+class SampleRingTest(unittest.TestCase):
+    def _ring(self, capacity, rows):
+        ring = SampleRing(capacity, np.int16, 2)
+        for i in range(rows):
+            ring.append((i, -i), 1000000 * i)
+        return ring
+
+    def test_empty(self):
+        ring = self._ring(4, 0)
+        start, end = ring.bounds()
+        self.assertEqual(start, end)
+        self.assertEqual(ring.bounds(ms=10), ring.bounds())
+
+    def test_partly_filled(self):
+        ring = self._ring(4, 3)
+        start, end = ring.bounds()
+        self.assertEqual(ring.values[start:end, 0].tolist(), [0, 1, 2])
+
+    def test_wrapped_window_is_contiguous(self):
+        ring = self._ring(4, 10)
+        start, end = ring.bounds()
+        self.assertEqual(end - start, 4)
+        self.assertEqual(ring.values[start:end, 0].tolist(), [6, 7, 8, 9])
+        self.assertEqual(ring.times[start:end].tolist(), [6000000, 7000000, 8000000, 9000000])
+
+    def test_samples(self):
+        ring = self._ring(4, 10)
+        start, end = ring.bounds(samples=2)
+        self.assertEqual(ring.values[start:end, 0].tolist(), [8, 9])
+        start, end = ring.bounds(samples=10)
+        self.assertEqual(end - start, 4)
+
+    def test_ms(self):
+        ring = self._ring(8, 10)  # one row per ms
+        start, end = ring.bounds(ms=2)
+        # Rows newer than 2 ms before the newest one
+        self.assertEqual(ring.values[start:end, 0].tolist(), [8, 9])
+        start, end = ring.bounds(ms=100)
+        self.assertEqual(end - start, 8)
+
+    def test_ms_and_samples_take_the_smallest(self):
+        ring = self._ring(8, 10)
+        self.assertEqual(ring.bounds(ms=5, samples=2), ring.bounds(samples=2))
+        self.assertEqual(ring.bounds(ms=1, samples=5), ring.bounds(ms=1))
+
+    def test_sequence_even_after_writes(self):
+        ring = self._ring(4, 5)
+        self.assertEqual(int(ring.header[0]), 10)
+        self.assertEqual(ring.count, 5)
+
+    def test_state_kept_over_the_same_buffer(self):
+        buffer = bytearray(SampleRing.size(4, np.int16, 2))
+        ring = SampleRing(4, np.int16, 2, buffer)
+        ring.append((1, 2), 5)
+        other = SampleRing(4, np.int16, 2, buffer)
+        self.assertEqual(other.count, 1)
+        start, end = other.bounds()
+        self.assertEqual(other.values[start:end].tolist(), [[1, 2]])
+
+
+class SampleHistoryTest(unittest.TestCase):
+    def test_emg_window(self):
+        history = SampleHistory(1)
+        for i in range(150):
+            history.emg(0, bytes([i % 128] * 8 + [(i + 1) % 128] * 8))
+        window = history.window(0, 'emg')
+        self.assertEqual(window.shape, (200, 8))
+        # Last notification: 21, 22, the one before: 20, 21
+        self.assertEqual(history.window(0, 'emg', samples=3)[:, 0].tolist(), [21, 21, 22])
+        times = history.window(0, 'emg_time')
+        self.assertTrue(np.all(np.diff(times) >= 0))
+
+    def test_imu_columns(self):
+        history = SampleHistory(1)
+        history.imu(2, np.arange(10, dtype=np.int16).tobytes())
+        self.assertEqual(history.window(2, 'quat').tolist(), [[0, 1, 2, 3]])
+        self.assertEqual(history.window(2, 'accel').tolist(), [[4, 5, 6]])
+        self.assertEqual(history.window(2, 'gyro').tolist(), [[7, 8, 9]])
+
+    def test_unknown_connection(self):
+        self.assertIsNone(SampleHistory(1).window(0, 'emg'))